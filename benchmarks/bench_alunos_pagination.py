@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+"""
+Paginação da listagem de alunos: skip/limit (OFFSET) contra cursor (nome, id).
+
+Mede a mesma página em profundidades crescentes. Com OFFSET o banco percorre e
+descarta todas as linhas anteriores, então o tempo cresce com a profundidade;
+com o cursor, a consulta começa direto no índice ix_alunos_nome_id. Também
+mostra o custo do include_total (contagem fria e servida do cache).
+
+Uso: python -m benchmarks.bench_alunos_pagination [--alunos 20000] [--repeat 20]
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+from benchmarks.common import init_schema, setup_temp_database, shutdown
+
+setup_temp_database()
+
+import httpx  # noqa: E402
+
+import main  # noqa: E402
+from src.database import SessionLocal  # noqa: E402
+from src.models.aluno import Aluno  # noqa: E402
+from src.routes import alunos_fastapi  # noqa: E402
+
+init_schema()
+
+
+def seed(total_alunos):
+    db = SessionLocal()
+    try:
+        db.add_all([Aluno(nome=f"Aluno {i % 997:04d} {i:06d}", cpf=f"{i:011d}") for i in range(total_alunos)])
+        db.commit()
+    finally:
+        db.close()
+
+
+async def median_ms(client, params, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        response = await client.get("/api/v1/alunos", params=params)
+        timings.append((time.perf_counter() - start) * 1000)
+        assert response.status_code == 200, response.text
+    return statistics.median(timings), response.json()
+
+
+async def cursor_at(client, depth, limit):
+    """Cursor da página que começa em `depth` (o próprio cursor da página anterior)."""
+    if depth == 0:
+        return None
+    _, data = await median_ms(client, {"skip": depth - limit, "limit": limit}, 1)
+    return data["next_cursor"]
+
+
+async def run(total_alunos, repeat, limit=20):
+    seed(total_alunos)
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app), base_url="http://bench") as client:
+        print(f"{'profundidade':>12} {'skip/limit':>12} {'cursor':>10}")
+        for depth in (0, total_alunos // 10, total_alunos // 2, total_alunos - limit):
+            offset_ms, offset_page = await median_ms(client, {"skip": depth, "limit": limit}, repeat)
+            cursor = await cursor_at(client, depth, limit)
+            cursor_ms, cursor_page = await median_ms(client, {"cursor": cursor, "limit": limit} if cursor else {"limit": limit}, repeat)
+            same = [a["id"] for a in offset_page["alunos"]] == [a["id"] for a in cursor_page["alunos"]]
+            print(f"{depth:>12} {offset_ms:>10.1f}ms {cursor_ms:>8.1f}ms{'' if same else '  (páginas diferentes!)'}")
+
+        alunos_fastapi.invalidate_total_cache()
+        cold_ms, _ = await median_ms(client, {"limit": limit, "include_total": "true"}, 1)
+        cached_ms, _ = await median_ms(client, {"limit": limit, "include_total": "true"}, repeat)
+        plain_ms, _ = await median_ms(client, {"limit": limit}, repeat)
+        print(f"\ninclude_total: frio {cold_ms:.1f}ms, cache {cached_ms:.1f}ms, sem total {plain_ms:.1f}ms")
+
+
+async def main_async(args):
+    try:
+        await run(args.alunos, args.repeat)
+    finally:
+        await shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--alunos", type=int, default=20000)
+    parser.add_argument("--repeat", type=int, default=20)
+    asyncio.run(main_async(parser.parse_args()))
@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+"""
+Compara throughput das sessões síncrona (get_db) e assíncrona (get_async_db)
+com 200 clientes simultâneos.
+
+1. Um app mínimo com duas rotas que fazem exatamente a mesma consulta
+   (página de alunos com matrículas), uma `def` + Session e outra
+   `async def` + AsyncSession. Isola o custo do caminho de acesso ao banco.
+2. As rotas reais já portadas: /api/v1/alunos e /api/v1/mensalidades.
+
+Uso: python -m benchmarks.bench_async_db [--clients 200] [--requests 2000]
+"""
+import argparse
+import asyncio
+import random
+import time
+from datetime import date, datetime, timedelta
+
+from benchmarks.common import init_schema, setup_temp_database, shutdown, summarize, timed_get
+
+setup_temp_database()
+
+import httpx  # noqa: E402
+from fastapi import Depends, FastAPI  # noqa: E402
+from sqlalchemy import select  # noqa: E402
+from sqlalchemy.ext.asyncio import AsyncSession  # noqa: E402
+from sqlalchemy.orm import Session, selectinload  # noqa: E402
+
+import main  # noqa: E402
+from src.database import SessionLocal, get_async_db, get_db  # noqa: E402
+from src.models.aluno import Aluno  # noqa: E402
+from src.models.matricula import Matricula  # noqa: E402
+from src.models.mensalidade import Mensalidade  # noqa: E402
+from src.models.plano import Plano  # noqa: E402
+from src.models.turma import Turma  # noqa: E402
+
+init_schema()
+
+
+def seed(total_alunos=500):
+    db = SessionLocal()
+    try:
+        plano = Plano(nome="Mensal", valor=120.0, periodo_meses=1)
+        turma = Turma(nome="Jiu-Jitsu Adulto", modalidade="Jiu-Jitsu", horario="19:00", dias_semana="Seg/Qua")
+        db.add_all([plano, turma])
+        db.flush()
+        for i in range(total_alunos):
+            aluno = Aluno(nome=f"Aluno {i:05d}", cpf=f"{i:011d}")
+            db.add(aluno)
+            db.flush()
+            # Como nas matrículas criadas pela API: data sem hora (MatriculaRead.data_matricula é date)
+            matricula = Matricula(
+                aluno_id=aluno.id, turma_id=turma.id, plano_id=plano.id, ativa=random.random() > 0.3,
+                data_matricula=datetime.combine(date.today(), datetime.min.time())
+            )
+            db.add(matricula)
+            db.flush()
+            for mes in range(3):
+                db.add(Mensalidade(
+                    aluno_id=aluno.id, plano_id=plano.id, matricula_id=matricula.id, valor=120.0,
+                    data_vencimento=date.today() - timedelta(days=30 * mes),
+                    status="pago" if mes else "pendente"
+                ))
+        db.commit()
+    finally:
+        db.close()
+
+
+bench_app = FastAPI()
+
+
+@bench_app.get("/sync")
+def sync_page(db: Session = Depends(get_db)):
+    alunos = db.scalars(select(Aluno).options(selectinload(Aluno.matriculas)).order_by(Aluno.nome).limit(20)).all()
+    return [a.id for a in alunos]
+
+
+@bench_app.get("/async")
+async def async_page(db: AsyncSession = Depends(get_async_db)):
+    result = await db.scalars(select(Aluno).options(selectinload(Aluno.matriculas)).order_by(Aluno.nome).limit(20))
+    return [a.id for a in result.all()]
+
+
+async def hammer(app, url, clients, total_requests, label):
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+        semaphore = asyncio.Semaphore(clients)
+
+        async def one():
+            async with semaphore:
+                return await timed_get(client, url)
+
+        start = time.perf_counter()
+        results = await asyncio.gather(*[one() for _ in range(total_requests)])
+        elapsed = time.perf_counter() - start
+    summarize(label, [r[0] for r in results], elapsed)
+    erros = sum(1 for _, code in results if code != 200)
+    if erros:
+        print(f"  ! {erros} respostas diferentes de 200")
+
+
+async def run(clients, total_requests):
+    seed()
+    try:
+        await hammer(bench_app, "/sync", clients, total_requests, f"sync  Session c={clients}")
+        await hammer(bench_app, "/async", clients, total_requests, f"async AsyncSession c={clients}")
+        await hammer(main.app, "/api/v1/alunos", clients, total_requests, f"/api/v1/alunos c={clients}")
+        await hammer(main.app, "/api/v1/mensalidades", clients, total_requests, f"/api/v1/mensalidades c={clients}")
+    finally:
+        await shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--clients", type=int, default=200)
+    parser.add_argument("--requests", type=int, default=2000)
+    args = parser.parse_args()
+    asyncio.run(run(args.clients, args.requests))
@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+"""
+Teste de carga da dependência de autenticação (auth.get_current_user).
+
+Mede p50/p99 de GET /api/v1/portal/me com níveis crescentes de concorrência.
+Se a resolução do usuário bloquear o event loop, o p99 cresce linearmente com
+a concorrência; com a consulta no threadpool ele deve ficar estável.
+
+Uso: python -m benchmarks.bench_auth_portal [--requests 400]
+"""
+import argparse
+import asyncio
+import time
+
+from benchmarks.common import init_schema, setup_temp_database, shutdown, summarize, timed_get
+
+setup_temp_database()
+
+import httpx  # noqa: E402
+
+import main  # noqa: E402
+from src import auth  # noqa: E402
+from src.database import SessionLocal  # noqa: E402
+from src.models.aluno import Aluno  # noqa: E402
+from src.models.usuario import Usuario  # noqa: E402
+
+init_schema()
+
+
+def seed_aluno():
+    db = SessionLocal()
+    try:
+        usuario = Usuario(
+            username="bench_aluno", email="bench@academia.com", nome="Aluno Benchmark",
+            hashed_password=auth.get_password_hash("bench123"), role="aluno"
+        )
+        db.add(usuario)
+        db.add(Aluno(nome="Aluno Benchmark", cpf="00000000000", usuario=usuario))
+        db.commit()
+        return auth.create_access_token(data={"sub": usuario.username, "role": usuario.role})
+    finally:
+        db.close()
+
+
+async def run(total_requests):
+    token = seed_aluno()
+    headers = {"Authorization": f"Bearer {token}"}
+    transport = httpx.ASGITransport(app=main.app)
+    try:
+        await _run_levels(transport, headers, total_requests)
+    finally:
+        await shutdown()
+
+
+async def _run_levels(transport, headers, total_requests):
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for concurrency in (1, 10, 50, 100):
+            semaphore = asyncio.Semaphore(concurrency)
+
+            async def one():
+                async with semaphore:
+                    return await timed_get(client, "/api/v1/portal/me", headers=headers)
+
+            start = time.perf_counter()
+            results = await asyncio.gather(*[one() for _ in range(total_requests)])
+            elapsed = time.perf_counter() - start
+            erros = sum(1 for _, code in results if code != 200)
+            summarize(f"/portal/me concorrencia={concurrency}", [r[0] for r in results], elapsed)
+            if erros:
+                print(f"  ! {erros} respostas diferentes de 200")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=400)
+    args = parser.parse_args()
+    asyncio.run(run(args.requests))
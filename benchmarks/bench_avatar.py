@@ -0,0 +1,144 @@
+# -*- coding: utf-8 -*-
+"""
+Processamento de fotos de perfil: pipeline antigo (decodifica a foto inteira e
+reduz com LANCZOS para um JPEG de 250px) contra src.image_utils (draft do
+JPEG, EXIF, 64/128/250 em WebP + JPEG).
+
+O corpus é gerado na hora (fotos de celular de 12 e 24 MP com orientação EXIF,
+PNG com transparência, print de tela, foto pequena); --corpus DIR acrescenta
+fotos reais (*.jpg, *.jpeg, *.png, *.webp).
+
+Colunas: tempo mediano por foto, megapixels efetivamente decodificados e
+tamanho da saída de 250px. O tempo por foto do pipeline novo inclui as 6
+saídas. No fim, CPU gasta no processo "da API" por foto com o pool de
+processos contra rodando no próprio processo.
+
+Uso: python -m benchmarks.bench_avatar [--repeat 5] [--corpus DIR]
+"""
+import argparse
+import io
+import statistics
+import time
+from pathlib import Path
+
+from PIL import Image, ImageOps
+
+from src import image_utils
+
+
+def _synthetic(size, mode="RGB", orientation=None, fmt="JPEG"):
+    # Gradientes + ruído leve: comprime como uma foto (~2-4 MB a cada 12 MP em JPEG 90)
+    gradient = Image.linear_gradient("L").resize(size)
+    radial = Image.radial_gradient("L").resize(size)
+    base = Image.merge("RGB", (gradient, radial, gradient.transpose(Image.Transpose.ROTATE_90).resize(size)))
+    base = Image.blend(base, Image.effect_noise(size, 12).convert("RGB"), 0.25)
+    if mode == "RGBA":
+        base = base.convert("RGBA")
+        base.putalpha(Image.radial_gradient("L").resize(size))
+    buffer = io.BytesIO()
+    kwargs = {"quality": 90} if fmt == "JPEG" else {}
+    if orientation:
+        exif = Image.Exif()
+        exif[0x0112] = orientation
+        kwargs["exif"] = exif.tobytes()
+    base.save(buffer, format=fmt, **kwargs)
+    return buffer.getvalue()
+
+
+def build_corpus(extra_dir=None):
+    corpus = [
+        ("celular 12MP (EXIF 6)", _synthetic((4032, 3024), orientation=6)),
+        ("celular 24MP", _synthetic((6000, 4000))),
+        ("PNG transparente 2000px", _synthetic((2000, 2000), mode="RGBA", fmt="PNG")),
+        ("print de tela PNG", _synthetic((1170, 2532), fmt="PNG")),
+        ("pequena 400x300", _synthetic((400, 300))),
+    ]
+    if extra_dir:
+        for path in sorted(Path(extra_dir).iterdir()):
+            if path.suffix.lower() in (".jpg", ".jpeg", ".png", ".webp"):
+                corpus.append((path.name[:24], path.read_bytes()))
+    return corpus
+
+
+def pipeline_antigo(data):
+    """O process_avatar_image de antes: sem EXIF, sem limite de pixels, um JPEG."""
+    img = Image.open(io.BytesIO(data))
+    if img.mode in ("P", "RGBA"):
+        img = img.convert("RGB")
+    img.thumbnail((250, 250), Image.Resampling.LANCZOS)
+    out = io.BytesIO()
+    img.save(out, format="JPEG", quality=70, optimize=True)
+    return len(out.getvalue())
+
+
+def decoded_size_antigo(data):
+    img = Image.open(io.BytesIO(data))
+    if img.format == "JPEG":
+        # O thumbnail (reducing_gap=2.0) já pedia draft do dobro do tamanho final
+        img.draft(None, (500, 500))
+    return img.size
+
+
+def pipeline_novo(data):
+    variants = image_utils._render_variants(data, image_utils.AVATAR_SIZES, image_utils.AVATAR_MAX_PIXELS,
+                                            image_utils.AVATAR_WEBP_QUALITY, image_utils.AVATAR_JPEG_QUALITY)
+    return variants
+
+
+def decoded_size_novo(data):
+    img = Image.open(io.BytesIO(data))
+    if img.format == "JPEG":
+        img.draft("RGB", (max(image_utils.AVATAR_SIZES),) * 2)
+    return ImageOps.exif_transpose(img).size
+
+
+def median_ms(fn, data, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn(data)
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings), result
+
+
+def parent_cpu_ms(corpus, workers):
+    """CPU do processo atual por foto (o que sobraria para as rotas do worker da API)."""
+    image_utils.AVATAR_PROCESS_WORKERS = workers
+    image_utils.render_avatar_variants(corpus[0][1])  # sobe o pool fora da medição
+    start_cpu, start_wall = time.process_time(), time.perf_counter()
+    for _, data in corpus:
+        image_utils.render_avatar_variants(data)
+    cpu = (time.process_time() - start_cpu) * 1000 / len(corpus)
+    wall = (time.perf_counter() - start_wall) * 1000 / len(corpus)
+    image_utils.shutdown_pool()
+    return cpu, wall
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--corpus", help="diretório com fotos reais para incluir")
+    args = parser.parse_args()
+    corpus = build_corpus(args.corpus)
+
+    print(f"{'foto':<26} {'KiB':>6} | {'antigo':>8} {'MP dec':>6} {'250 jpg':>8} | "
+          f"{'novo':>8} {'MP dec':>6} {'250 webp':>8} {'250 jpg':>8}")
+    for label, data in corpus:
+        old_ms, old_bytes = median_ms(pipeline_antigo, data, args.repeat)
+        old_decoded = decoded_size_antigo(data)
+        new_ms, variants = median_ms(pipeline_novo, data, args.repeat)
+        new_decoded = decoded_size_novo(data)
+        largest = max(image_utils.AVATAR_SIZES)
+        print(f"{label:<26} {len(data) / 1024:>6.0f} | {old_ms:>6.1f}ms {old_decoded[0] * old_decoded[1] / 1e6:>6.1f} "
+              f"{old_bytes / 1024:>6.1f}K | {new_ms:>6.1f}ms {new_decoded[0] * new_decoded[1] / 1e6:>6.1f} "
+              f"{len(variants[(largest, 'webp')]) / 1024:>7.1f}K {len(variants[(largest, 'jpeg')]) / 1024:>7.1f}K")
+
+    print(f"\nCPU no processo da API por foto ({len(corpus)} fotos):")
+    for label, workers in (("no próprio processo", 0), (f"pool ({max(1, image_utils.AVATAR_PROCESS_WORKERS)} proc.)",
+                                                          max(1, image_utils.AVATAR_PROCESS_WORKERS))):
+        cpu, wall = parent_cpu_ms(corpus, workers)
+        print(f"  {label:<22} cpu={cpu:7.1f}ms  tempo={wall:7.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
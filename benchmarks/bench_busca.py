@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+"""
+Busca por nome: ILIKE '%termo%' (varredura da tabela) contra src.search
+(FTS5 no SQLite), com os termos que a busca do PWA envia a cada tecla.
+
+Também mostra o que o ILIKE não encontra (sem acento / com erro de digitação).
+
+Uso: python -m benchmarks.bench_busca [--alunos 50000] [--repeat 20]
+"""
+import argparse
+import random
+import statistics
+import time
+
+from benchmarks.common import init_schema, setup_temp_database
+
+setup_temp_database()
+
+from sqlalchemy import func, select  # noqa: E402
+
+from benchmarks.seed import NOMES, SOBRENOMES  # noqa: E402
+from src import search  # noqa: E402
+from src.database import SessionLocal, engine  # noqa: E402
+from src.models.aluno import Aluno  # noqa: E402
+
+init_schema()
+
+TERMOS = ("joa", "joão", "joao", "joao silv", "fernanda", "fernada", "ferreira lima")
+
+
+def seed(total_alunos):
+    rng = random.Random(7)
+    db = SessionLocal()
+    try:
+        db.add_all([
+            Aluno(nome=f"{rng.choice(NOMES)} {rng.choice(SOBRENOMES)} {rng.choice(SOBRENOMES)}", cpf=f"{i:011d}")
+            for i in range(total_alunos)
+        ])
+        db.commit()
+    finally:
+        db.close()
+
+
+def measure(criterion, repeat):
+    query = select(func.count()).select_from(Aluno).where(criterion)
+    timings = []
+    with engine.connect() as conn:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            found = conn.scalar(query)
+            timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings), found
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--alunos", type=int, default=50000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+    seed(args.alunos)
+
+    print(f"{'termo':<16} {'ilike':>10} {'achados':>8} {'search':>10} {'achados':>8}")
+    for termo in TERMOS:
+        ilike_ms, ilike_found = measure(Aluno.nome.ilike(f"%{termo}%"), args.repeat)
+        search_ms, search_found = measure(search.matches(Aluno, termo), args.repeat)
+        print(f"{termo:<16} {ilike_ms:>8.1f}ms {ilike_found:>8} {search_ms:>8.1f}ms {search_found:>8}")
+
+
+if __name__ == "__main__":
+    main()
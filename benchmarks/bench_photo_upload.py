@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+"""
+Salvar aluno com foto: upload na própria requisição (como antes) contra a fila
+de src.storage.
+
+O S3 é o coletor falso de benchmarks.otlp_stub (PUT local, sem latência de
+rede), então a diferença medida é só o processamento da imagem + upload saindo
+do caminho da resposta. --backend local usa o LocalStorage (sem HTTP).
+
+Também mede o custo de criar um cliente boto3 por requisição (código antigo)
+contra reaproveitar o cliente do processo.
+
+Todas as fotos vão para o mesmo aluno: na fila, uma foto que chega antes de a
+anterior terminar a substitui (a anterior aparece como descartada).
+
+Uso: python -m benchmarks.bench_photo_upload [--requests 30] [--backend s3|local]
+"""
+import argparse
+import asyncio
+import io
+import os
+import statistics
+import tempfile
+import time
+
+from benchmarks.common import init_schema, setup_temp_database, shutdown
+from benchmarks.otlp_stub import CollectorStub
+
+setup_temp_database()
+stub = CollectorStub().start()
+os.environ.update({
+    "S3_ENDPOINT_URL": stub.endpoint, "AWS_ACCESS_KEY_ID": "bench", "AWS_SECRET_ACCESS_KEY": "bench",
+    "S3_BUCKET_NAME": "fotos", "PUBLIC_BUCKET_URL": "http://fotos.local", "AWS_MAX_ATTEMPTS": "1",
+})
+
+import httpx  # noqa: E402
+from PIL import Image  # noqa: E402
+
+import main  # noqa: E402
+from benchmarks.seed import seed_database  # noqa: E402
+from src import storage  # noqa: E402
+
+init_schema()
+
+
+def _photo():
+    # Foto de celular típica: 3000x4000 com ruído (não comprime a quase nada)
+    buffer = io.BytesIO()
+    Image.effect_noise((3000, 4000), 64).convert("RGB").save(buffer, format="JPEG", quality=90)
+    return buffer.getvalue()
+
+
+async def run_round(client, headers, aluno_id, photo, total, inline):
+    storage.STORAGE_UPLOAD_MAX_QUEUE = 0 if inline else 100
+    latencies = []
+    start_round = time.perf_counter()
+    for i in range(total):
+        start = time.perf_counter()
+        response = await client.put(f"/api/v1/alunos/{aluno_id}", headers=headers, data={"observacoes": f"bench {i}"},
+                                    files={"foto": ("foto.jpg", photo, "image/jpeg")})
+        latencies.append((time.perf_counter() - start) * 1000)
+        assert response.status_code == 200, response.text
+    storage.drain()
+    elapsed = time.perf_counter() - start_round
+    response = await client.get(f"/api/v1/alunos/{aluno_id}", headers=headers)
+    assert response.json()["foto"], "foto não foi gravada"
+    return statistics.median(latencies), max(latencies), elapsed
+
+
+def client_creation_ms(repeat=20):
+    import boto3
+
+    start = time.perf_counter()
+    for _ in range(repeat):
+        boto3.client("s3", endpoint_url=stub.endpoint, aws_access_key_id="bench",
+                     aws_secret_access_key="bench", region_name="auto")
+    per_request = (time.perf_counter() - start) * 1000 / repeat
+    storage.get_storage().client  # noqa: B018 (cria o cliente compartilhado)
+    start = time.perf_counter()
+    for _ in range(repeat):
+        storage.get_storage().client  # noqa: B018
+    shared = (time.perf_counter() - start) * 1000 / repeat
+    return per_request, shared
+
+
+async def run(args):
+    if args.backend == "local":
+        storage.set_storage(storage.LocalStorage(tempfile.mkdtemp(prefix="academia_uploads_"), "http://bench/uploads"))
+    ids = seed_database(total_alunos=5)
+    headers = {"Authorization": f"Bearer {ids['admin_token']}"}
+    photo = _photo()
+    print(f"foto: {len(photo) / 1024:.0f} KiB, backend: {storage.get_storage().name}")
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app), base_url="http://bench") as client:
+        print(f"{'modo':<20} {'p50':>9} {'max':>9} {'total c/ fila':>14}")
+        for label, inline in (("na requisição", True), ("fila (storage)", False)):
+            p50, worst, elapsed = await run_round(client, headers, ids["aluno_id"], photo, args.requests, inline)
+            print(f"{label:<20} {p50:>7.1f}ms {worst:>7.1f}ms {elapsed:>12.2f}s")
+    if args.backend == "s3":
+        per_request, shared = client_creation_ms()
+        print(f"\ncliente boto3: novo por requisição {per_request:.1f}ms, compartilhado {shared:.3f}ms")
+    m = storage.get_metrics()
+    print(f"\nfila: enviadas={m['submitted_total']} na requisição={m['inline_total']} "
+          f"gravadas={m['completed_total']} descartadas={m['superseded_total']} falhas={m['failed_total']}")
+
+
+async def main_async(args):
+    try:
+        await run(args)
+    finally:
+        await shutdown()
+        stub.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=30)
+    parser.add_argument("--backend", choices=("s3", "local"), default="s3")
+    asyncio.run(main_async(parser.parse_args()))
@@ -0,0 +1,228 @@
+# -*- coding: utf-8 -*-
+"""
+Concorrência de escrita no SQLite: perfil antigo x perfil de produção.
+
+Simula o pico que gerava "database is locked": várias threads confirmando
+pagamentos como o webhook do Mercado Pago (lê a mensalidade, marca como paga,
+lança a receita no financeiro, commit) enquanto outras threads fazem as
+leituras pesadas do painel (somatórios sobre mensalidades/financeiro).
+
+Cada perfil roda em processos separados (o perfil é lido no import de
+src.database), com o mesmo banco semeado; --processes simula vários workers do
+uvicorn/gunicorn no mesmo arquivo. O script imprime erros de lock, throughput de
+escrita e latência das leituras.
+
+No fim, cada perfil roda também o caso de duas sessões gravando na mesma thread
+(a segunda grava enquanto a primeira ainda não fez commit): a segunda escrita
+nunca pode esperar pela primeira, então o esperado é falhar na hora, sem
+consumir o busy_timeout.
+
+Uso:
+    python -m benchmarks.bench_sqlite_writes --writers 16 --readers 8 --processes 2 --seconds 10
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+from benchmarks.common import setup_temp_database
+
+ROOT = Path(__file__).resolve().parent.parent
+
+PROFILES = {
+    # Comportamento anterior: journal DELETE, timeout padrão do sqlite3, sem fila de escrita
+    "antigo (journal DELETE)": {"SQLITE_PROFILE": "off"},
+    "produção (WAL + escritor serializado)": {"SQLITE_PROFILE": "production"},
+}
+
+
+def worker_main(writers, readers, seconds):
+    """Executado no processo filho: roda a carga e imprime o resultado em JSON."""
+    import threading
+    import time
+    from concurrent.futures import ThreadPoolExecutor
+    from datetime import date
+
+    from sqlalchemy import func
+    from sqlalchemy.exc import OperationalError
+
+    import manage  # noqa: F401  (registra todos os modelos no mapper)
+    from src.database import SessionLocal, engine
+    from src.models.financeiro import Financeiro
+    from src.models.mensalidade import Mensalidade
+
+    from benchmarks.common import percentile
+
+    with engine.connect() as conn:
+        journal_mode = conn.exec_driver_sql("PRAGMA journal_mode").scalar()
+
+    deadline = time.perf_counter() + seconds
+    lock = threading.Lock()
+    result = {"journal_mode": journal_mode, "writes_ok": 0, "locked_errors": 0, "other_errors": 0,
+              "reads_ok": 0, "read_latencies": [], "write_latencies": []}
+
+    def confirm_payments(worker_id):
+        offset = worker_id
+        while time.perf_counter() < deadline:
+            db = SessionLocal()
+            start = time.perf_counter()
+            try:
+                mensalidade = db.query(Mensalidade).order_by(Mensalidade.id).offset(offset % 1000).first()
+                offset += writers
+                mensalidade.status = "pago"
+                mensalidade.data_pagamento = date.today()
+                db.add(Financeiro(tipo="receita", categoria="Mensalidade", valor=mensalidade.valor,
+                                  descricao=f"Mensalidade {mensalidade.id} (bench)", status="confirmado"))
+                db.commit()
+                with lock:
+                    result["writes_ok"] += 1
+                    result["write_latencies"].append(time.perf_counter() - start)
+            except OperationalError as e:
+                db.rollback()
+                with lock:
+                    result["locked_errors" if "locked" in str(e) else "other_errors"] += 1
+            finally:
+                db.close()
+
+    def dashboard_reads(_):
+        while time.perf_counter() < deadline:
+            db = SessionLocal()
+            start = time.perf_counter()
+            try:
+                db.query(func.sum(Mensalidade.valor)).filter(Mensalidade.status == "pendente").scalar()
+                db.query(Financeiro.tipo, func.sum(Financeiro.valor)).group_by(Financeiro.tipo).all()
+                with lock:
+                    result["reads_ok"] += 1
+                    result["read_latencies"].append(time.perf_counter() - start)
+            except OperationalError as e:
+                with lock:
+                    result["locked_errors" if "locked" in str(e) else "other_errors"] += 1
+            finally:
+                db.close()
+
+    with ThreadPoolExecutor(max_workers=writers + readers) as executor:
+        futures = [executor.submit(confirm_payments, i) for i in range(writers)]
+        futures += [executor.submit(dashboard_reads, i) for i in range(readers)]
+        for future in futures:
+            future.result()
+
+    read_ms = [l * 1000 for l in result.pop("read_latencies")]
+    write_ms = [l * 1000 for l in result.pop("write_latencies")]
+    result.update({
+        "writes_per_s": result["writes_ok"] / seconds,
+        "write_p99_ms": percentile(write_ms, 99),
+        "read_p50_ms": percentile(read_ms, 50),
+        "read_p99_ms": percentile(read_ms, 99),
+    })
+    print(json.dumps(result))
+
+
+def same_thread_main():
+    """Executado no processo filho: duas sessões gravando na mesma thread, a primeira sem commit."""
+    import time
+
+    from sqlalchemy.exc import OperationalError
+
+    import manage  # noqa: F401  (registra todos os modelos no mapper)
+    from src.database import SessionLocal
+    from src.models.financeiro import Financeiro
+
+    def lancamento(descricao):
+        return Financeiro(tipo="receita", categoria="Mensalidade", valor=10.0, descricao=descricao, status="confirmado")
+
+    first, second = SessionLocal(), SessionLocal()
+    try:
+        first.add(lancamento("primeira sessão (bench)"))
+        first.flush()
+        start = time.perf_counter()
+        try:
+            second.add(lancamento("segunda sessão (bench)"))
+            second.commit()
+            outcome = "ok"
+        except OperationalError as e:
+            second.rollback()
+            outcome = str(e.orig)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        first.commit()
+    finally:
+        first.close()
+        second.close()
+    print(json.dumps({"outcome": outcome, "elapsed_ms": elapsed_ms}))
+
+
+def main_cli():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--writers", type=int, default=16)
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--processes", type=int, default=2, help="processos (workers) por perfil")
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--same-thread-worker", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        worker_main(args.writers, args.readers, args.seconds)
+        return 0
+    if args.same_thread_worker:
+        same_thread_main()
+        return 0
+
+    db_path = setup_temp_database()
+    # Uma conexão por thread: a espera medida é a do SQLite, não a do checkout do pool
+    env = dict(os.environ, DB_POOL_SIZE=str(args.writers + args.readers), DB_MAX_OVERFLOW="0")
+    seed_code = "import manage; manage.init_db(); from benchmarks.seed import seed_database; seed_database()"
+    subprocess.run([sys.executable, "-c", seed_code], cwd=ROOT, env=dict(env, SQLITE_PROFILE="off"),
+                   check=True, capture_output=True)
+    pristine = Path(db_path).read_bytes()
+
+    print(f"{args.processes} processo(s) x ({args.writers} escritores + {args.readers} leitores) por {args.seconds:.0f}s\n")
+    for label, profile_env in PROFILES.items():
+        # Cada perfil começa do mesmo banco (sem -wal/-shm de rodadas anteriores)
+        for suffix in ("-wal", "-shm"):
+            Path(db_path + suffix).unlink(missing_ok=True)
+        Path(db_path).write_bytes(pristine)
+
+        procs = [
+            subprocess.Popen(
+                [sys.executable, "-m", "benchmarks.bench_sqlite_writes", "--worker",
+                 "--writers", str(args.writers), "--readers", str(args.readers), "--seconds", str(args.seconds)],
+                cwd=ROOT, env=dict(env, **profile_env), stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True,
+            )
+            for _ in range(args.processes)
+        ]
+        outputs = [proc.communicate() for proc in procs]
+        failed = [err for proc, (_, err) in zip(procs, outputs) if proc.returncode != 0]
+        if failed:
+            print(f"{label}: falhou\n{failed[0][-2000:]}")
+            continue
+        parts = [json.loads(out.strip().splitlines()[-1]) for out, _ in outputs]
+        r = {
+            "journal_mode": parts[0]["journal_mode"],
+            "writes_per_s": sum(p["writes_per_s"] for p in parts),
+            "locked_errors": sum(p["locked_errors"] for p in parts),
+            "other_errors": sum(p["other_errors"] for p in parts),
+            # Pior processo (aproximação conservadora do percentil global)
+            "write_p99_ms": max(p["write_p99_ms"] for p in parts),
+            "read_p50_ms": max(p["read_p50_ms"] for p in parts),
+            "read_p99_ms": max(p["read_p99_ms"] for p in parts),
+        }
+        print(f"{label:<40} journal={r['journal_mode']:<7} escritas/s={r['writes_per_s']:7.1f} "
+              f"'database is locked'={r['locked_errors']:<5} outros erros={r['other_errors']:<3} "
+              f"escrita p99={r['write_p99_ms']:7.1f}ms leitura p50={r['read_p50_ms']:6.1f}ms p99={r['read_p99_ms']:7.1f}ms")
+
+    print("\nDuas sessões gravando na mesma thread (a primeira ainda sem commit):")
+    for label, profile_env in PROFILES.items():
+        proc = subprocess.run([sys.executable, "-m", "benchmarks.bench_sqlite_writes", "--same-thread-worker"],
+                              cwd=ROOT, env=dict(env, **profile_env), capture_output=True, text=True)
+        if proc.returncode != 0:
+            print(f"{label}: falhou\n{proc.stderr[-2000:]}")
+            continue
+        r = json.loads(proc.stdout.strip().splitlines()[-1])
+        print(f"{label:<40} segunda escrita em {r['elapsed_ms']:7.1f}ms: {r['outcome'][:110]}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark do tempo de boot de um worker: `import main` + lifespan + primeira requisição.
+
+Cada rodada é um interpretador Python novo (como um worker do uvicorn/gunicorn
+subindo ou acordando depois do sleep do Render), apontando para um banco já
+preparado com `manage.py bootstrap`. Também lista quais SDKs pesados foram
+carregados no import — o esperado é nenhum.
+
+Uso:
+    python -m benchmarks.bench_startup --runs 7
+    python -m benchmarks.bench_startup --history benchmarks/startup_history.jsonl   # acumula o histórico
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from datetime import datetime
+from pathlib import Path
+
+from benchmarks.common import setup_temp_database
+
+ROOT = Path(__file__).resolve().parent.parent
+HEAVY_MODULES = ["boto3", "botocore", "mercadopago", "authlib", "PIL"]
+
+# Roda no processo filho; imprime uma linha JSON com as medidas
+CHILD_CODE = r"""
+import asyncio, json, sys, time
+t0 = time.perf_counter()
+import main
+t_import = time.perf_counter() - t0
+
+import httpx
+
+async def first_request():
+    transport = httpx.ASGITransport(app=main.app)
+    async with main.app.router.lifespan_context(main.app):
+        t1 = time.perf_counter()
+        async with httpx.AsyncClient(transport=transport, base_url="http://startup") as client:
+            response = await client.get("/api/v1/planos")
+        return time.perf_counter() - t1, response.status_code
+
+t_first, status = asyncio.run(first_request())
+print(json.dumps({
+    "import_s": t_import,
+    "first_request_s": t_first,
+    "status": status,
+    "heavy_modules": [m for m in HEAVY if m in sys.modules],
+}))
+"""
+
+
+def run_once(env):
+    code = f"HEAVY = {HEAVY_MODULES!r}\n" + CHILD_CODE
+    result = subprocess.run([sys.executable, "-c", code], cwd=ROOT, env=env, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr[-2000:])
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                              capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def main_cli():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--history", help="arquivo JSONL onde acrescentar o resultado desta rodada")
+    args = parser.parse_args()
+
+    setup_temp_database()
+    env = dict(os.environ)
+    # Banco pronto antes das medições: o boot do worker não deve criar nada
+    subprocess.run([sys.executable, "manage.py", "bootstrap"], cwd=ROOT, env=env, check=True, capture_output=True)
+    samples = [run_once(env) for _ in range(args.runs)]
+
+    import_ms = [s["import_s"] * 1000 for s in samples]
+    first_ms = [s["first_request_s"] * 1000 for s in samples]
+    heavy = sorted({m for s in samples for m in s["heavy_modules"]})
+    summary = {
+        "timestamp": datetime.utcnow().isoformat(timespec="seconds") + "Z",
+        "revision": git_revision(),
+        "python": sys.version.split()[0],
+        "runs": args.runs,
+        "import_ms_median": round(statistics.median(import_ms), 1),
+        "import_ms_max": round(max(import_ms), 1),
+        "first_request_ms_median": round(statistics.median(first_ms), 1),
+        "first_request_ms_max": round(max(first_ms), 1),
+        "heavy_modules_loaded": heavy,
+        "first_request_status": sorted({s["status"] for s in samples}),
+    }
+    print(f"import main             mediana={summary['import_ms_median']:8.1f}ms  max={summary['import_ms_max']:8.1f}ms")
+    print(f"primeira requisição     mediana={summary['first_request_ms_median']:8.1f}ms  max={summary['first_request_ms_max']:8.1f}ms")
+    print(f"SDKs carregados no boot: {', '.join(heavy) if heavy else 'nenhum'}")
+
+    if args.history:
+        with open(args.history, "a", encoding="utf-8") as history:
+            history.write(json.dumps(summary, ensure_ascii=False) + "\n")
+        print(f"Resultado acrescentado em {args.history}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
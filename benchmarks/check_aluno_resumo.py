@@ -0,0 +1,187 @@
+# -*- coding: utf-8 -*-
+"""
+Confere a tabela aluno_resumo e mede o filtro de status da listagem de alunos.
+
+1. Depois do seed (mantida só pelos eventos de flush), o conteúdo precisa ser
+   idêntico ao de um rebuild completo.
+2. Pagamento, trancar/reativar e excluir matrícula, criar mensalidade e
+   excluir aluno pela API: o resumo do aluno acompanha cada escrita.
+3. Filtros status=ativo/inativo/inadimplente: resumo indexado contra as
+   subconsultas em matriculas/mensalidades usadas antes.
+
+Uso: python -m benchmarks.check_aluno_resumo [--alunos 5000] [--repeat 20]
+"""
+import argparse
+import asyncio
+import statistics
+import time
+from datetime import date, timedelta
+
+from benchmarks.common import init_schema, setup_temp_database, shutdown
+
+setup_temp_database()
+
+import httpx  # noqa: E402
+from sqlalchemy import func, select  # noqa: E402
+
+import main  # noqa: E402
+from benchmarks.seed import seed_database  # noqa: E402
+from src import aluno_resumo  # noqa: E402
+from src.database import engine  # noqa: E402
+from src.models.aluno import Aluno  # noqa: E402
+from src.models.aluno_resumo import AlunoResumo  # noqa: E402
+from src.models.matricula import Matricula  # noqa: E402
+from src.models.mensalidade import Mensalidade  # noqa: E402
+
+init_schema()
+
+COLUNAS = ("aluno_id", "ativo", "matriculas_ativas", "valor_pendente", "pendente_desde", "ultimo_pagamento")
+
+
+def snapshot(aluno_id=None):
+    query = select(*(getattr(AlunoResumo, c) for c in COLUNAS)).order_by(AlunoResumo.aluno_id)
+    if aluno_id is not None:
+        query = query.where(AlunoResumo.aluno_id == aluno_id)
+    with engine.connect() as conn:
+        return [tuple(row) for row in conn.execute(query)]
+
+
+def esperado(aluno_id):
+    """O que um recálculo do zero produziria para o aluno (sem gravar)."""
+    with engine.connect() as conn:
+        rows = aluno_resumo._calcular(conn, [aluno_id])
+    return [tuple(row[c] for c in COLUNAS) for row in rows]
+
+
+def conferir(rotulo, aluno_id):
+    atual, correto = snapshot(aluno_id), esperado(aluno_id)
+    print(f"{'ok ' if atual == correto else 'ERRO'} {rotulo}: {atual}")
+    assert atual == correto, f"{rotulo}: esperado {correto}"
+
+
+def primeira(query):
+    with engine.connect() as conn:
+        return conn.execute(query.limit(1)).first()
+
+
+async def checar_escritas(client):
+    incremental = snapshot()
+    with engine.begin() as conn:
+        aluno_resumo.rebuild(conn)
+    assert snapshot() == incremental, "resumo incremental difere do rebuild"
+    print(f"ok  seed: {len(incremental)} linhas idênticas ao rebuild")
+
+    mensalidade = primeira(select(Mensalidade.id, Mensalidade.aluno_id).where(Mensalidade.status == "pendente"))
+    response = await client.post(f"/api/v1/mensalidades/processar_pagamento/{mensalidade.id}")
+    assert response.status_code == 200, response.text
+    conferir("pagamento", mensalidade.aluno_id)
+
+    matricula = primeira(select(Matricula.id, Matricula.aluno_id, Matricula.plano_id).where(Matricula.ativa == True))  # noqa: E712
+    for rotulo in ("trancar matrícula", "reativar matrícula"):
+        response = await client.post(f"/api/v1/matriculas/{matricula.id}/toggle-status")
+        assert response.status_code == 200, response.text
+        conferir(rotulo, matricula.aluno_id)
+
+    response = await client.post("/api/v1/mensalidades", json={
+        "aluno_id": matricula.aluno_id, "plano_id": matricula.plano_id, "matricula_id": matricula.id,
+        "valor": 99.0, "data_vencimento": (date.today() - timedelta(days=400)).isoformat(),
+    })
+    assert response.status_code in (200, 201), response.text
+    conferir("mensalidade vencida criada", matricula.aluno_id)
+
+    response = await client.delete(f"/api/v1/matriculas/{matricula.id}")
+    assert response.status_code == 204, response.text
+    conferir("excluir matrícula", matricula.aluno_id)
+
+    response = await client.get(f"/api/v1/alunos/{matricula.aluno_id}/status-detalhado")
+    assert response.status_code == 200, response.text
+    print(f"    status-detalhado: {response.json()}")
+
+    # Mensalidades não aceitam aluno_id nulo: saem antes do aluno
+    with engine.connect() as conn:
+        restantes = conn.scalars(select(Mensalidade.id).where(Mensalidade.aluno_id == matricula.aluno_id)).all()
+    for mensalidade_id in restantes:
+        response = await client.delete(f"/api/v1/mensalidades/{mensalidade_id}")
+        assert response.status_code == 204, response.text
+    response = await client.delete(f"/api/v1/alunos/{matricula.aluno_id}")
+    assert response.status_code == 204, response.text
+    assert snapshot(matricula.aluno_id) == [], "resumo de aluno excluído continua na tabela"
+    print("ok  excluir aluno: linha removida")
+
+
+def filtro_antigo(status):
+    ativos = select(Matricula.aluno_id).where(Matricula.ativa == True).distinct()  # noqa: E712
+    if status == "ativo":
+        return Aluno.id.in_(ativos)
+    if status == "inativo":
+        return Aluno.id.notin_(ativos)
+    vencidas = select(Mensalidade.aluno_id).where(
+        Mensalidade.status.in_(aluno_resumo.MENSALIDADE_EM_ABERTO), Mensalidade.data_vencimento < date.today()
+    )
+    return Aluno.id.in_(vencidas)
+
+
+def medir_antigo(status, repeat, limit=20):
+    query = select(Aluno.id).where(filtro_antigo(status)).order_by(Aluno.nome, Aluno.id).limit(limit)
+    count = select(func.count()).select_from(Aluno).where(filtro_antigo(status))
+    timings = []
+    with engine.connect() as conn:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            conn.execute(query).all()
+            total = conn.scalar(count)
+            timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings), total
+
+
+def medir_resumo(status, repeat, limit=20):
+    from src.routes import alunos_fastapi
+
+    filtro = {
+        "ativo": AlunoResumo.ativo == True,  # noqa: E712
+        "inativo": func.coalesce(AlunoResumo.ativo, False) == False,  # noqa: E712
+        "inadimplente": AlunoResumo.pendente_desde < date.today(),
+    }[status]
+    base = select(Aluno.id).outerjoin(AlunoResumo, AlunoResumo.aluno_id == Aluno.id).where(filtro)
+    query = base.order_by(Aluno.nome, Aluno.id).limit(limit)
+    count = select(func.count()).select_from(base.subquery())
+    timings = []
+    with engine.connect() as conn:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            conn.execute(query).all()
+            total = conn.scalar(count)
+            timings.append((time.perf_counter() - start) * 1000)
+    alunos_fastapi.invalidate_total_cache()
+    return statistics.median(timings), total
+
+
+async def run(total_alunos, repeat):
+    ids = seed_database(total_alunos=total_alunos)
+    headers = {"Authorization": f"Bearer {ids['admin_token']}"}
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app), base_url="http://bench",
+                                 headers=headers) as client:
+        await checar_escritas(client)
+
+        print(f"\n{'status':<14} {'subconsulta':>12} {'resumo':>10} {'total':>8}")
+        for status in ("ativo", "inativo", "inadimplente"):
+            antigo_ms, antigo_total = medir_antigo(status, repeat)
+            resumo_ms, resumo_total = medir_resumo(status, repeat)
+            response = await client.get("/api/v1/alunos", params={"status": status, "include_total": "true"})
+            assert response.status_code == 200, response.text
+            assert antigo_total == resumo_total == response.json()["total"], (antigo_total, resumo_total)
+            print(f"{status:<14} {antigo_ms:>10.1f}ms {resumo_ms:>8.1f}ms {resumo_total:>8}")
+
+
+async def main_async(args):
+    try:
+        await run(args.alunos, args.repeat)
+    finally:
+        await shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--alunos", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=20)
+    asyncio.run(main_async(parser.parse_args()))
@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+"""
+Verificação local do roteamento para a réplica de leitura com dois arquivos SQLite.
+
+O "primário" é o banco temporário dos benchmarks e a "réplica" é uma cópia dele
+aberta em modo somente leitura. Como a cópia não é atualizada, ela se comporta
+como uma réplica atrasada, o que deixa visível para onde cada leitura foi:
+
+1. leituras de quem não escreveu vão para a réplica (não veem a escrita);
+2. logo após POST /mensalidades/processar_pagamento, o mesmo cliente lê do
+   primário (cookie e, sem cookie, pelo mesmo header Authorization);
+3. passado READ_YOUR_WRITES_SECONDS, o cliente volta para a réplica;
+4. com a réplica fora do ar, as leituras caem para o primário.
+
+Uso:
+    python -m benchmarks.check_read_replica
+"""
+import asyncio
+import os
+import sqlite3
+import sys
+
+from benchmarks.common import init_schema, setup_temp_database, shutdown
+
+primary_path = setup_temp_database()
+replica_path = primary_path.replace("bench.db", "replica.db")
+os.environ["DATABASE_READ_URL"] = f"sqlite:///file:{replica_path}?mode=ro&uri=true"
+os.environ["READ_YOUR_WRITES_SECONDS"] = "1"
+
+import httpx  # noqa: E402
+
+import main  # noqa: E402
+from src import database  # noqa: E402
+from benchmarks.seed import seed_database  # noqa: E402
+
+init_schema()
+
+
+async def pagas(client, headers):
+    response = await client.get("/api/v1/mensalidades", params={"status": "pago", "limit": 1}, headers=headers)
+    assert response.status_code == 200, response.text
+    return response.json()["total"]
+
+
+def check(label, condition):
+    print(f"[{'ok' if condition else 'FALHOU'}] {label}")
+    return bool(condition)
+
+
+async def run():
+    try:
+        return await _run_checks()
+    finally:
+        await shutdown()
+
+
+async def _run_checks():
+    ids = seed_database(total_alunos=30)
+    # Réplica "congelada" neste ponto (backup API: inclui o que ainda está no -wal do primário)
+    with sqlite3.connect(primary_path) as source, sqlite3.connect(replica_path) as target:
+        source.backup(target)
+    headers = {"Authorization": f"Bearer {ids['admin_token']}"}
+    transport = httpx.ASGITransport(app=main.app)
+    results = []
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://replica") as writer, \
+            httpx.AsyncClient(transport=transport, base_url="http://replica") as other:
+        antes = await pagas(other, headers)
+
+        pendente = (await writer.get("/api/v1/mensalidades", params={"status": "pendente", "limit": 1},
+                                     headers=headers)).json()["mensalidades"][0]
+        response = await writer.post(f"/api/v1/mensalidades/processar_pagamento/{pendente['id']}", headers=headers)
+        assert response.status_code == 200, response.text
+
+        results.append(check("quem escreveu lê do primário (cookie rw_primary)", await pagas(writer, headers) == antes + 1))
+        results.append(check("mesmo token, sem cookie, também lê do primário", await pagas(other, headers) == antes + 1))
+        results.append(check("outro cliente lê da réplica (ainda sem a escrita)", await pagas(other, {}) == antes))
+
+        await asyncio.sleep(1.5)
+        writer.cookies.clear()
+        results.append(check("após a janela de read-your-writes, volta para a réplica", await pagas(writer, headers) == antes))
+
+        # Réplica fora do ar: arquivo some e as conexões abertas são descartadas
+        os.replace(replica_path, replica_path + ".off")
+        database.read_engine.dispose()
+        if database.get_async_read_engine_if_created() is not None:
+            await database.get_async_read_engine_if_created().dispose()
+        results.append(check("réplica fora do ar: leitura cai para o primário", await pagas(other, {}) == antes + 1))
+        results.append(check("réplica marcada como indisponível", not database.replica_available()))
+
+        sync_response = await other.get(f"/api/v1/planos/{ids['plano_id']}")
+        results.append(check("rota síncrona (get_read_db) também cai para o primário", sync_response.status_code == 200))
+
+    return all(results)
+
+
+if __name__ == "__main__":
+    sys.exit(0 if asyncio.run(run()) else 1)
@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+"""
+Verificação local do tracing (src.tracing) com o coletor OTLP falso.
+
+O coletor de benchmarks.otlp_stub recebe os spans e também faz o papel do S3
+(S3_ENDPOINT_URL aponta para ele), então o fluxo de cadastro de aluno com foto
+aparece inteiro no trace:
+
+1. o `traceparent` recebido é continuado (mesmo trace id, X-Trace-Id na resposta);
+2. os comandos SQL viram spans db.query filhos do span da requisição;
+3. POST /alunos com foto tem os spans avatar.process e s3.upload (o upload roda
+   na fila de src.storage depois da resposta, mas continua no mesmo trace);
+4. imprime a quebra do cadastro por etapa.
+
+Uso:
+    python -m benchmarks.check_tracing
+"""
+import asyncio
+import io
+import os
+import sys
+import time
+
+from benchmarks.common import init_schema, setup_temp_database, shutdown
+from benchmarks.otlp_stub import CollectorStub
+
+setup_temp_database()
+stub = CollectorStub().start()
+os.environ["TRACING_EXPORTER"] = "otlp"
+os.environ["TRACING_OTLP_ENDPOINT"] = f"{stub.endpoint}/v1/traces"
+os.environ.update({
+    "S3_ENDPOINT_URL": stub.endpoint, "AWS_ACCESS_KEY_ID": "bench", "AWS_SECRET_ACCESS_KEY": "bench",
+    "S3_BUCKET_NAME": "fotos", "PUBLIC_BUCKET_URL": "http://fotos.local", "AWS_MAX_ATTEMPTS": "1",
+})
+
+import httpx  # noqa: E402
+from PIL import Image  # noqa: E402
+
+import main  # noqa: E402
+from src import storage, tracing  # noqa: E402
+from benchmarks.seed import seed_database  # noqa: E402
+
+init_schema()
+
+TRACE_ID = "4bf92f3577b34da6a3ce929d0e0e4736"
+PARENT_ID = "00f067aa0ba902b7"
+
+
+def check(label, condition):
+    print(f"[{'ok' if condition else 'FALHOU'}] {label}")
+    return bool(condition)
+
+
+def wait_for_spans(trace_id, predicate, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while True:
+        tracing.flush()
+        spans = stub.trace(trace_id)
+        if predicate(spans) or time.monotonic() > deadline:
+            return spans
+        time.sleep(0.05)
+
+
+def _png():
+    buffer = io.BytesIO()
+    Image.new("RGB", (800, 600), (200, 30, 30)).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+async def run():
+    try:
+        return await _run_checks()
+    finally:
+        await shutdown()
+        stub.stop()
+
+
+async def _run_checks():
+    ids = seed_database(total_alunos=20)
+    headers = {"Authorization": f"Bearer {ids['admin_token']}"}
+    results = []
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app), base_url="http://trace") as client:
+        response = await client.get("/api/v1/alunos", params={"limit": 5},
+                                    headers={**headers, "traceparent": f"00-{TRACE_ID}-{PARENT_ID}-01"})
+        assert response.status_code == 200, response.text
+        results.append(check("traceparent continuado (X-Trace-Id igual)", response.headers.get("x-trace-id") == TRACE_ID))
+
+        spans = wait_for_spans(TRACE_ID, lambda spans: any(s["kind"] == 2 for s in spans))
+        root = next((s for s in spans if s["kind"] == 2), None)
+        results.append(check("span raiz com o pai do traceparent e a rota",
+                             root is not None and root.get("parentSpanId") == PARENT_ID
+                             and root["name"] == "GET /api/v1/alunos"))
+        queries = [s for s in spans if s["name"] == "db.query"]
+        results.append(check(f"{len(queries)} spans db.query filhos da requisição",
+                             queries and root and all(s["parentSpanId"] == root["spanId"] for s in queries)))
+
+        response = await client.post(
+            "/api/v1/alunos", headers=headers,
+            data={"username": "trace.aluno", "nome": "Aluno Trace", "cpf": "123.456.789-09",
+                  "email": "trace.aluno@academia.com"},
+            files={"foto": ("foto.png", _png(), "image/png")},
+        )
+        assert response.status_code == 201, response.text
+        trace_id = response.headers.get("x-trace-id", "")
+        aluno_id = response.json()["id"]
+        results.append(check("upload da foto terminou na fila", storage.drain(timeout=10)))
+        results.append(check("trace novo quando não há traceparent", len(trace_id) == 32 and trace_id != TRACE_ID))
+
+        names = {"avatar.process", "s3.upload"}
+        spans = wait_for_spans(trace_id, lambda spans: names <= {s["name"] for s in spans}
+                               and any(s["kind"] == 2 for s in spans))
+        by_name = {s["name"]: s for s in spans}
+        results.append(check("spans avatar.process e s3.upload no cadastro com foto", names <= set(by_name)))
+        results.append(check("upload para o S3 terminou sem erro",
+                             by_name.get("s3.upload", {}).get("status", {}).get("code") == 1))
+        response = await client.get(f"/api/v1/alunos/{aluno_id}", headers=headers)
+        results.append(check("foto gravada com a URL pública", (response.json().get("foto") or "").startswith("http://fotos.local/")))
+
+    print("\nEtapas do POST /api/v1/alunos com foto:")
+    origin = min(int(s["startTimeUnixNano"]) for s in spans)
+    for s in sorted(spans, key=lambda s: int(s["startTimeUnixNano"])):
+        start_ms = (int(s["startTimeUnixNano"]) - origin) / 1e6
+        duration_ms = (int(s["endTimeUnixNano"]) - int(s["startTimeUnixNano"])) / 1e6
+        print(f"  +{start_ms:8.1f}ms {duration_ms:8.1f}ms  {s['name']}")
+    return all(results)
+
+
+if __name__ == "__main__":
+    sys.exit(0 if asyncio.run(run()) else 1)
@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+"""
+Utilitários compartilhados pelos scripts de benchmark.
+
+Cada script cria um banco SQLite temporário, importa o `main.app` apontando
+para ele, cria o esquema (init_schema) e dispara requisições concorrentes via httpx (sem subir o uvicorn).
+Uso: python -m benchmarks.<nome_do_script>
+"""
+import os
+import statistics
+import tempfile
+import time
+
+
+def setup_temp_database():
+    """Aponta DATABASE_URL para um SQLite temporário. Deve ser chamado ANTES de importar o app."""
+    tmp_dir = tempfile.mkdtemp(prefix="academia_bench_")
+    db_path = os.path.join(tmp_dir, "bench.db")
+    os.environ["DATABASE_URL"] = f"sqlite:///{db_path}"
+    return db_path
+
+
+def init_schema():
+    """Cria tabelas e aplica migrações no banco temporário (importar o main não faz mais isso)."""
+    import manage
+    manage.init_db()
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def summarize(label, latencies, elapsed):
+    """Imprime p50/p95/p99 (ms) e throughput de uma rodada."""
+    latencies_ms = [l * 1000 for l in latencies]
+    print(
+        f"{label:<32} n={len(latencies_ms):<5} "
+        f"p50={percentile(latencies_ms, 50):7.1f}ms "
+        f"p95={percentile(latencies_ms, 95):7.1f}ms "
+        f"p99={percentile(latencies_ms, 99):7.1f}ms "
+        f"media={statistics.mean(latencies_ms) if latencies_ms else 0:7.1f}ms "
+        f"req/s={len(latencies_ms) / elapsed if elapsed else 0:7.1f}"
+    )
+
+
+async def shutdown():
+    """Fecha o pool async no fim do benchmark (o ASGITransport não dispara o shutdown do app)."""
+    from src.database import dispose_async_engine
+    await dispose_async_engine()
+
+
+async def timed_get(client, url, headers=None):
+    start = time.perf_counter()
+    response = await client.get(url, headers=headers)
+    return time.perf_counter() - start, response.status_code
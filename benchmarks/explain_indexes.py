@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+"""
+Confere, via EXPLAIN, que as consultas quentes usam os índices da migração 001.
+
+Simula um banco antigo (tabelas criadas sem os índices novos), aplica as
+migrações com src.migrations.run_migrations, popula com benchmarks/seed.py e
+roda EXPLAIN QUERY PLAN (SQLite) / EXPLAIN (PostgreSQL) em cada consulta.
+Falha (exit code 1) se alguma delas não usar o índice esperado.
+
+Uso:
+    python -m benchmarks.explain_indexes
+"""
+import sys
+from datetime import date, datetime, timedelta
+
+from benchmarks.common import setup_temp_database
+
+setup_temp_database()
+
+from sqlalchemy import select, text  # noqa: E402
+
+from src.database import Base, SessionLocal, engine  # noqa: E402
+from src.migrations import MIGRATIONS_TABLE, run_migrations  # noqa: E402
+from src.models import aluno, evento, plano, produto, categoria, professor, turma, usuario, refresh_token  # noqa: E402,F401
+from src.models.financeiro import Financeiro  # noqa: E402
+from src.models.historico_matricula import HistoricoMatricula  # noqa: E402
+from src.models.inscricao import Inscricao  # noqa: E402
+from src.models.matricula import Matricula  # noqa: E402
+from src.models.mensalidade import Mensalidade  # noqa: E402
+from benchmarks.seed import seed_database  # noqa: E402
+
+NEW_INDEXES = [
+    "ix_mensalidades_status_vencimento", "ix_mensalidades_matricula_vencimento", "ix_mensalidades_aluno_id",
+    "ix_financeiro_tipo_data", "ix_matriculas_aluno_ativa", "ix_matriculas_turma_id",
+    "uq_inscricoes_evento_aluno", "ix_historico_matriculas_matricula_id",
+]
+
+hoje = date.today()
+
+# (descrição, consulta, índice esperado no plano)
+HOT_QUERIES = [
+    ("mensalidades pendentes vencidas (dashboard/balanço)",
+     select(Mensalidade.id).where(Mensalidade.status == "pendente", Mensalidade.data_vencimento <= hoje),
+     "ix_mensalidades_status_vencimento"),
+    ("fatura existente da matrícula no mês (generate_monthly_bills)",
+     select(Mensalidade.id).where(Mensalidade.matricula_id == 1, Mensalidade.data_vencimento == hoje),
+     "ix_mensalidades_matricula_vencimento"),
+    ("mensalidades do aluno (portal / pendências)",
+     select(Mensalidade.id).where(Mensalidade.aluno_id == 1),
+     "ix_mensalidades_aluno_id"),
+    ("receitas do período (balanço financeiro)",
+     select(Financeiro.valor).where(Financeiro.tipo == "receita",
+                                    Financeiro.data >= datetime.utcnow() - timedelta(days=30)),
+     "ix_financeiro_tipo_data"),
+    ("matrículas ativas do aluno",
+     select(Matricula.id).where(Matricula.aluno_id == 1, Matricula.ativa == True),  # noqa: E712
+     "ix_matriculas_aluno_ativa"),
+    ("matrículas da turma",
+     select(Matricula.id).where(Matricula.turma_id == 1),
+     "ix_matriculas_turma_id"),
+    ("inscrições do evento",
+     select(Inscricao.id).where(Inscricao.evento_id == 1),
+     "uq_inscricoes_evento_aluno"),
+    ("inscrição do aluno no evento (checagem de duplicidade)",
+     select(Inscricao.id).where(Inscricao.evento_id == 1, Inscricao.aluno_id == 1),
+     "uq_inscricoes_evento_aluno"),
+    ("histórico da matrícula",
+     select(HistoricoMatricula.id).where(HistoricoMatricula.matricula_id == 1),
+     "ix_historico_matriculas_matricula_id"),
+]
+
+
+def simulate_legacy_schema():
+    """Cria as tabelas e remove os índices novos, como em um banco anterior à migração."""
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        for name in NEW_INDEXES:
+            conn.execute(text(f"DROP INDEX IF EXISTS {name}"))
+        conn.execute(text(f"DROP TABLE IF EXISTS {MIGRATIONS_TABLE}"))
+
+
+def explain(conn, statement):
+    compiled = statement.compile(dialect=engine.dialect, compile_kwargs={"literal_binds": True})
+    if engine.dialect.name == "sqlite":
+        return "\n".join(str(row[-1]) for row in conn.execute(text(f"EXPLAIN QUERY PLAN {compiled}")))
+    return "\n".join(str(row[0]) for row in conn.execute(text(f"EXPLAIN {compiled}")))
+
+
+def main():
+    simulate_legacy_schema()
+    applied = run_migrations(engine)
+    print(f"Migrações aplicadas: {applied}")
+    seed_database()
+
+    failures = 0
+    with engine.connect() as conn:
+        # Estatísticas atualizadas, como em produção
+        conn.execute(text("ANALYZE"))
+        if engine.dialect.name == "postgresql":
+            # Com poucas linhas o PostgreSQL prefere seq scan; aqui só importa se o índice é utilizável
+            conn.execute(text("SET enable_seqscan = off"))
+        for description, statement, expected_index in HOT_QUERIES:
+            plan = explain(conn, statement)
+            ok = expected_index in plan
+            failures += not ok
+            print(f"[{'ok' if ok else 'FALHOU'}] {description}: espera {expected_index}")
+            if not ok:
+                print("        " + plan.replace("\n", "\n        "))
+
+    # Rodar de novo não deve aplicar nada
+    assert run_migrations(engine) == [], "migrações reaplicadas"
+    print("\nTodas as consultas usam os índices esperados." if not failures else f"\n{failures} consulta(s) sem índice.")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
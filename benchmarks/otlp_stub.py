@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+"""
+Coletor OTLP/HTTP mínimo para testar o tracing localmente (sem Jaeger/Tempo).
+
+Recebe POST /v1/traces (JSON, como exportado por src.tracing com
+TRACING_EXPORTER=otlp) e imprime uma linha por span. Também responde 200 a
+PUT/DELETE em qualquer outro caminho, o que basta para servir de S3_ENDPOINT_URL
+falso nas verificações (upload_fileobj de arquivos pequenos é um PutObject).
+
+Uso:
+    python -m benchmarks.otlp_stub --port 4318
+    TRACING_EXPORTER=otlp TRACING_OTLP_ENDPOINT=http://localhost:4318/v1/traces uvicorn main:app
+"""
+import argparse
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class CollectorStub:
+    def __init__(self, host="127.0.0.1", port=0, echo=False):
+        self.spans = []
+        self.echo = echo
+        self._lock = threading.Lock()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            # HTTP/1.1 responde ao "Expect: 100-continue" do boto3 (senão o PUT espera 1s)
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def _body(self):
+                return self.rfile.read(int(self.headers.get("Content-Length") or 0))
+
+            def _reply(self, code=200, body=b"", headers=()):
+                self.send_response(code)
+                for name, value in headers:
+                    self.send_header(name, value)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_POST(self):
+                if self.path != "/v1/traces":
+                    self._reply(404)
+                    return
+                stub.receive(json.loads(self._body()))
+                self._reply(200, b"{}", [("Content-Type", "application/json")])
+
+            def do_PUT(self):
+                self._body()
+                self._reply(200, headers=[("ETag", '"stub"')])
+
+            def do_DELETE(self):
+                self._reply(204)
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.port = self.server.server_address[1]
+        self._thread = threading.Thread(target=self.server.serve_forever, name="otlp-stub", daemon=True)
+
+    @property
+    def endpoint(self):
+        return f"http://127.0.0.1:{self.port}"
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+
+    def receive(self, payload):
+        received = []
+        for resource_spans in payload.get("resourceSpans", []):
+            for scope_spans in resource_spans.get("scopeSpans", []):
+                received.extend(scope_spans.get("spans", []))
+        with self._lock:
+            self.spans.extend(received)
+        if self.echo:
+            for span in received:
+                duration_ms = (int(span["endTimeUnixNano"]) - int(span["startTimeUnixNano"])) / 1e6
+                print(f"{span['traceId']} {span.get('parentSpanId', '-'):>16} {duration_ms:9.1f}ms  {span['name']}")
+
+    def trace(self, trace_id):
+        with self._lock:
+            return [span for span in self.spans if span["traceId"] == trace_id]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=4318)
+    args = parser.parse_args()
+    stub = CollectorStub(args.host, args.port, echo=True)
+    print(f"Coletor OTLP em http://{args.host}:{stub.port}/v1/traces (Ctrl+C para sair)")
+    try:
+        stub.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,597 @@
+# -*- coding: utf-8 -*-
+"""
+Trava de regressão de consultas SQL por endpoint.
+
+Sobe o `main.app` contra um SQLite temporário com massa realista
+(benchmarks/seed.py), chama todos os endpoints GET da API (e o /metrics) e as
+rotas POST/PUT/DELETE com os payloads de MUTATIONS, e registra, por endpoint, o
+número de consultas SQL (lido do header Server-Timing) e a mediana do tempo de
+resposta. O resultado é comparado com o baseline versionado em
+benchmarks/query_budget_baseline.json.
+
+Cada chamada de escrita recebe um objeto novo, criado antes pela própria API
+(fora da medição): um DELETE apaga um registro criado só para ele, um POST usa
+nomes únicos. No baseline, as rotas de escrita aparecem como "MÉTODO /caminho/{param}".
+
+Falha (exit code 1) quando:
+- um endpoint passa a executar MAIS consultas que no baseline (ex.: um
+  relacionamento lazy novo em src/schemas transformando uma lista em N+1);
+- a mediana de tempo piora mais que --max-slowdown (padrão 50%) E mais que
+  --min-slowdown-ms (padrão 25 ms), para não reprovar por ruído de máquina;
+- o status HTTP muda (ex.: o payload de um cenário deixou de ser aceito e a
+  rota passou a responder 422 sem tocar no banco).
+
+Rota de escrita nova sem cenário em MUTATIONS é listada ao rodar ("sem cenário").
+
+Uso:
+    python -m benchmarks.query_budget            # compara com o baseline
+    python -m benchmarks.query_budget --update   # regrava o baseline (após revisar!)
+
+Obs.: usa um arquivo SQLite temporário em vez de ':memory:', porque cada conexão
+de um SQLite em memória enxerga um banco diferente (threadpool e engine async).
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import re
+import statistics
+import sys
+import time
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+from benchmarks.common import init_schema, setup_temp_database, shutdown
+
+setup_temp_database()
+
+import httpx  # noqa: E402
+
+import main  # noqa: E402
+from benchmarks.seed import seed_database  # noqa: E402
+from src import auth  # noqa: E402
+from src.database import SessionLocal  # noqa: E402
+
+init_schema()
+
+BASELINE_PATH = Path(__file__).with_name("query_budget_baseline.json")
+
+# Endpoints que dependem de serviços externos (Google, Mercado Pago) ou não fazem sentido aqui
+SKIP_PATHS = {
+    "/api/v1/auth/login/google",
+    "/api/v1/auth/callback/google",
+    "/api/v1/pagamentos/pix/{item_type}/{item_id}",
+    "/api/v1/pagamentos/mercadopago/webhook",
+    # Exige um snapshot do tracemalloc (base=); o custo do snapshot entra pelo POST /memory/snapshots
+    "/api/v1/_internal/memory/diff",
+}
+
+# GETs fora de /api/v1 que também entram na trava
+EXTRA_GET_PATHS = ["/metrics"]
+
+MUTATING_METHODS = {"POST", "PUT", "DELETE"}
+
+_QUERIES_RE = re.compile(r'db;dur=[\d.]+;desc="(\d+) queries"')
+
+
+def discover_get_endpoints(ids):
+    """Todos os GET de /api/v1 com os parâmetros de caminho preenchidos com ids do seed."""
+    path_params = {
+        "aluno_id": ids["aluno_id"],
+        "professor_id": ids["professor_id"],
+        "turma_id": ids["turma_id"],
+        "plano_id": ids["plano_id"],
+        "evento_id": ids["evento_id"],
+        "user_id": ids["usuario_aluno_id"],
+        "transacao_id": 1,
+        "produto_id": 1,
+        "item_type": "mensalidade",
+        "item_id": 1,
+    }
+    endpoints = []
+    for route in main.app.routes:
+        methods = getattr(route, "methods", None) or set()
+        if "GET" not in methods or not route.path.startswith("/api/v1") or route.path in SKIP_PATHS:
+            continue
+        try:
+            url = route.path.format(**path_params)
+        except KeyError as missing:
+            print(f"  (ignorado {route.path}: sem valor para {missing})")
+            continue
+        if url not in endpoints:
+            endpoints.append(url)
+    return endpoints + EXTRA_GET_PATHS
+
+
+def queries_from_headers(response):
+    match = _QUERIES_RE.search(response.headers.get("server-timing", ""))
+    return int(match.group(1)) if match else 0
+
+
+async def measure(client, runs, prepare):
+    """
+    Mede `runs` chamadas montadas por prepare(i) -> (método, url, kwargs do httpx).
+    A chamada i=0 só aquece caches (principal do token, calibração do bcrypt, imports tardios).
+    """
+    timings = []
+    queries = 0
+    status_code = None
+    for i in range(runs + 1):
+        method, url, kwargs = await prepare(i)
+        start = time.perf_counter()
+        response = await client.request(method, url, **kwargs)
+        elapsed = time.perf_counter() - start
+        if i == 0:
+            continue
+        timings.append(elapsed)
+        queries = queries_from_headers(response)
+        status_code = response.status_code
+    return {"status": status_code, "queries": queries, "median_ms": round(statistics.median(timings) * 1000, 2)}
+
+
+# --- ROTAS DE ESCRITA ---
+
+# (método, caminho da rota) -> (perfil do token, cenário); a ordem do registro é a ordem de execução
+MUTATIONS = {}
+
+
+def mutation(method, path, role="admin"):
+    """Registra o cenário de uma rota de escrita: async cenario(ctx, i) -> (url, kwargs do httpx)."""
+    def register(scenario):
+        MUTATIONS[(method, path)] = (role, scenario)
+        return scenario
+    return register
+
+
+class BudgetContext:
+    """Cliente, ids do seed e atalhos para criar pela API (fora da medição) os objetos de cada cenário."""
+
+    def __init__(self, client, ids):
+        self.client = client
+        self.ids = ids
+        self.headers = {
+            "admin": {"Authorization": f"Bearer {ids['admin_token']}"},
+            "aluno": {"Authorization": f"Bearer {ids['aluno_token']}"},
+        }
+        self._serial = itertools.count(1)
+
+    def serial(self) -> int:
+        """Número único para nomes, usernames e códigos (colunas com UNIQUE)."""
+        return next(self._serial)
+
+    async def create(self, url, **kwargs) -> int:
+        response = await self.client.post(url, headers=self.headers["admin"], **kwargs)
+        response.raise_for_status()
+        return response.json()["id"]
+
+    async def new_refresh_token(self) -> str:
+        db = SessionLocal()
+        try:
+            return auth.create_refresh_token(db, self.ids["usuario_aluno_id"])
+        finally:
+            db.close()
+
+    async def new_login_code(self) -> str:
+        db = SessionLocal()
+        try:
+            return auth.create_login_code(db, self.ids["usuario_aluno_id"])
+        finally:
+            db.close()
+
+
+def _aluno_form(ctx):
+    n = ctx.serial()
+    return {"username": f"budget_aluno{n}", "nome": f"Aluno Budget {n}", "cpf": f"8{n:010d}",
+            "email": f"budget_aluno{n}@email.com", "data_nascimento": "2001-05-10"}
+
+
+def _turma_json(ctx):
+    return {"nome": f"Turma Budget {ctx.serial()}", "modalidade": "Jiu-Jitsu", "horario": "20:00",
+            "dias_semana": "Ter/Qui", "professor_id": ctx.ids["professor_id"], "capacidade_maxima": 30}
+
+
+def _evento_json(ctx):
+    return {"nome": f"Evento Budget {ctx.serial()}", "tipo": "seminario", "local": "Tatame",
+            "data_evento": (datetime.utcnow() + timedelta(days=30)).isoformat(), "valor_inscricao": 50.0,
+            "capacidade": 100}
+
+
+def _transacao_json(ctx):
+    return {"tipo": "despesa", "categoria": "Energia", "valor": 120.5, "descricao": f"Conta Budget {ctx.serial()}"}
+
+
+async def _matricula_json(ctx):
+    # Turma nova a cada vez: o aluno não pode ter duas matrículas ativas na mesma turma
+    turma_id = await ctx.create("/api/v1/turmas", json=_turma_json(ctx))
+    return {"aluno_id": ctx.ids["aluno_id"], "turma_id": turma_id, "plano_id": ctx.ids["plano_id"],
+            "data_matricula": date.today().isoformat()}
+
+
+def _plano_json(ctx):
+    return {"nome": f"Plano Budget {ctx.serial()}", "valor": 99.9, "periodo_meses": 1}
+
+
+def _mensalidade_json(ctx):
+    return {"aluno_id": ctx.ids["aluno_id"], "plano_id": ctx.ids["plano_id"], "valor": 150.0,
+            "data_vencimento": (date.today() + timedelta(days=10)).isoformat(), "status": "pendente"}
+
+
+def _produto_json(ctx):
+    n = ctx.serial()
+    return {"codigo": f"B{n:05d}", "nome": f"Produto Budget {n}", "preco_custo": 10.0, "preco_venda": 25.0,
+            "quantidade_estoque": 5}
+
+
+def _usuario_json(ctx):
+    n = ctx.serial()
+    return {"username": f"budget_user{n}", "email": f"budget_user{n}@academia.com", "nome": f"Usuário Budget {n}",
+            "role": "atendente", "password": "budget123"}
+
+
+async def _new_inscricao(ctx):
+    evento_id = await ctx.create("/api/v1/eventos", json=_evento_json(ctx))
+    return await ctx.create("/api/v1/inscricoes", json={"aluno_id": ctx.ids["aluno_id"], "evento_id": evento_id})
+
+
+@mutation("POST", "/api/v1/auth/token", role=None)
+async def _login(ctx, i):
+    return "/api/v1/auth/token", {"data": {"username": "admin", "password": "bench123"}}
+
+
+@mutation("POST", "/api/v1/auth/refresh", role=None)
+async def _refresh(ctx, i):
+    return "/api/v1/auth/refresh", {"json": {"refresh_token": await ctx.new_refresh_token()}}
+
+
+@mutation("POST", "/api/v1/auth/exchange", role=None)
+async def _exchange(ctx, i):
+    return "/api/v1/auth/exchange", {"json": {"code": await ctx.new_login_code()}}
+
+
+@mutation("POST", "/api/v1/auth/logout", role=None)
+async def _logout(ctx, i):
+    return "/api/v1/auth/logout", {"json": {"refresh_token": await ctx.new_refresh_token()}}
+
+
+@mutation("POST", "/api/v1/alunos")
+async def _create_aluno(ctx, i):
+    return "/api/v1/alunos", {"data": _aluno_form(ctx)}
+
+
+@mutation("PUT", "/api/v1/alunos/{aluno_id}")
+async def _update_aluno(ctx, i):
+    return f"/api/v1/alunos/{ctx.ids['aluno_id']}", {"data": {"observacoes": f"Atualizado {i}"}}
+
+
+@mutation("DELETE", "/api/v1/alunos/{aluno_id}")
+async def _delete_aluno(ctx, i):
+    return f"/api/v1/alunos/{await ctx.create('/api/v1/alunos', data=_aluno_form(ctx))}", {}
+
+
+@mutation("POST", "/api/v1/professores")
+async def _create_professor(ctx, i):
+    return "/api/v1/professores", {"data": {"nome": f"Professor Budget {ctx.serial()}", "especialidade": "Boxe"}}
+
+
+@mutation("PUT", "/api/v1/professores/{professor_id}")
+async def _update_professor(ctx, i):
+    return f"/api/v1/professores/{ctx.ids['professor_id']}", {"data": {"observacoes": f"Atualizado {i}"}}
+
+
+@mutation("DELETE", "/api/v1/professores/{professor_id}")
+async def _delete_professor(ctx, i):
+    professor_id = await ctx.create("/api/v1/professores", data={"nome": f"Professor Budget {ctx.serial()}"})
+    return f"/api/v1/professores/{professor_id}", {}
+
+
+@mutation("POST", "/api/v1/turmas")
+async def _create_turma(ctx, i):
+    return "/api/v1/turmas", {"json": _turma_json(ctx)}
+
+
+@mutation("PUT", "/api/v1/turmas/{turma_id}")
+async def _update_turma(ctx, i):
+    return f"/api/v1/turmas/{ctx.ids['turma_id']}", {"json": {"observacoes": f"Atualizado {i}"}}
+
+
+@mutation("DELETE", "/api/v1/turmas/{turma_id}")
+async def _delete_turma(ctx, i):
+    return f"/api/v1/turmas/{await ctx.create('/api/v1/turmas', json=_turma_json(ctx))}", {}
+
+
+@mutation("POST", "/api/v1/eventos")
+async def _create_evento(ctx, i):
+    return "/api/v1/eventos", {"json": _evento_json(ctx)}
+
+
+@mutation("PUT", "/api/v1/eventos/{evento_id}")
+async def _update_evento(ctx, i):
+    return f"/api/v1/eventos/{ctx.ids['evento_id']}", {"json": {"descricao": f"Atualizado {i}"}}
+
+
+@mutation("DELETE", "/api/v1/eventos/{evento_id}")
+async def _delete_evento(ctx, i):
+    return f"/api/v1/eventos/{await ctx.create('/api/v1/eventos', json=_evento_json(ctx))}", {}
+
+
+@mutation("POST", "/api/v1/financeiro/transacoes")
+async def _create_transacao(ctx, i):
+    return "/api/v1/financeiro/transacoes", {"json": _transacao_json(ctx)}
+
+
+@mutation("PUT", "/api/v1/financeiro/transacoes/{transacao_id}")
+async def _update_transacao(ctx, i):
+    return "/api/v1/financeiro/transacoes/1", {"json": {"observacoes": f"Atualizado {i}"}}
+
+
+@mutation("DELETE", "/api/v1/financeiro/transacoes/{transacao_id}")
+async def _delete_transacao(ctx, i):
+    transacao_id = await ctx.create("/api/v1/financeiro/transacoes", json=_transacao_json(ctx))
+    return f"/api/v1/financeiro/transacoes/{transacao_id}", {}
+
+
+@mutation("POST", "/api/v1/matriculas")
+async def _create_matricula(ctx, i):
+    return "/api/v1/matriculas", {"json": await _matricula_json(ctx)}
+
+
+@mutation("PUT", "/api/v1/matriculas/{matricula_id}")
+async def _update_matricula(ctx, i):
+    return "/api/v1/matriculas/1", {"json": {"ativa": True}}
+
+
+@mutation("POST", "/api/v1/matriculas/{matricula_id}/toggle-status")
+async def _toggle_matricula(ctx, i):
+    matricula_id = await ctx.create("/api/v1/matriculas", json=await _matricula_json(ctx))
+    return f"/api/v1/matriculas/{matricula_id}/toggle-status", {}
+
+
+@mutation("DELETE", "/api/v1/matriculas/{matricula_id}")
+async def _delete_matricula(ctx, i):
+    matricula_id = await ctx.create("/api/v1/matriculas", json=await _matricula_json(ctx))
+    return f"/api/v1/matriculas/{matricula_id}", {}
+
+
+@mutation("POST", "/api/v1/planos")
+async def _create_plano(ctx, i):
+    return "/api/v1/planos", {"json": _plano_json(ctx)}
+
+
+@mutation("PUT", "/api/v1/planos/{plano_id}")
+async def _update_plano(ctx, i):
+    return f"/api/v1/planos/{ctx.ids['plano_id']}", {"json": {"descricao": f"Atualizado {i}"}}
+
+
+@mutation("DELETE", "/api/v1/planos/{plano_id}")
+async def _delete_plano(ctx, i):
+    return f"/api/v1/planos/{await ctx.create('/api/v1/planos', json=_plano_json(ctx))}", {}
+
+
+@mutation("POST", "/api/v1/mensalidades")
+async def _create_mensalidade(ctx, i):
+    return "/api/v1/mensalidades", {"json": _mensalidade_json(ctx)}
+
+
+@mutation("POST", "/api/v1/mensalidades/processar_pagamento/{mensalidade_id}")
+async def _pagar_mensalidade(ctx, i):
+    mensalidade_id = await ctx.create("/api/v1/mensalidades", json=_mensalidade_json(ctx))
+    return f"/api/v1/mensalidades/processar_pagamento/{mensalidade_id}", {}
+
+
+@mutation("POST", "/api/v1/portal-professor/mensalidades/{id}/receber-dinheiro")
+async def _receber_mensalidade(ctx, i):
+    mensalidade_id = await ctx.create("/api/v1/mensalidades", json=_mensalidade_json(ctx))
+    return f"/api/v1/portal-professor/mensalidades/{mensalidade_id}/receber-dinheiro", {}
+
+
+@mutation("DELETE", "/api/v1/mensalidades/{mensalidade_id}")
+async def _delete_mensalidade(ctx, i):
+    mensalidade_id = await ctx.create("/api/v1/mensalidades", json=_mensalidade_json(ctx))
+    return f"/api/v1/mensalidades/{mensalidade_id}", {}
+
+
+@mutation("POST", "/api/v1/produtos")
+async def _create_produto(ctx, i):
+    return "/api/v1/produtos", {"json": _produto_json(ctx)}
+
+
+@mutation("PUT", "/api/v1/produtos/{produto_id}")
+async def _update_produto(ctx, i):
+    return "/api/v1/produtos/1", {"json": {"quantidade_estoque": 10 + i}}
+
+
+@mutation("DELETE", "/api/v1/produtos/{produto_id}")
+async def _delete_produto(ctx, i):
+    return f"/api/v1/produtos/{await ctx.create('/api/v1/produtos', json=_produto_json(ctx))}", {}
+
+
+@mutation("POST", "/api/v1/categorias")
+async def _create_categoria(ctx, i):
+    return "/api/v1/categorias", {"json": {"nome": f"Categoria Budget {ctx.serial()}", "tipo": "despesa"}}
+
+
+@mutation("POST", "/api/v1/inscricoes")
+async def _create_inscricao(ctx, i):
+    evento_id = await ctx.create("/api/v1/eventos", json=_evento_json(ctx))
+    return "/api/v1/inscricoes", {"json": {"aluno_id": ctx.ids["aluno_id"], "evento_id": evento_id}}
+
+
+@mutation("POST", "/api/v1/inscricoes/{inscricao_id}/confirmar-pagamento-manual")
+async def _confirmar_inscricao(ctx, i):
+    return f"/api/v1/inscricoes/{await _new_inscricao(ctx)}/confirmar-pagamento-manual", {}
+
+
+@mutation("POST", "/api/v1/inscricoes/{inscricao_id}/cancelar")
+async def _cancelar_inscricao(ctx, i):
+    return f"/api/v1/inscricoes/{await _new_inscricao(ctx)}/cancelar", {}
+
+
+@mutation("DELETE", "/api/v1/inscricoes/{inscricao_id}")
+async def _delete_inscricao(ctx, i):
+    return f"/api/v1/inscricoes/{await _new_inscricao(ctx)}", {}
+
+
+@mutation("POST", "/api/v1/usuarios")
+async def _create_usuario(ctx, i):
+    return "/api/v1/usuarios", {"json": _usuario_json(ctx)}
+
+
+@mutation("PUT", "/api/v1/usuarios/{user_id}")
+async def _update_usuario(ctx, i):
+    return f"/api/v1/usuarios/{ctx.ids['usuario_aluno_id']}", {"json": {"nome": f"Aluno Portal {i}"}}
+
+
+@mutation("DELETE", "/api/v1/usuarios/{user_id}")
+async def _delete_usuario(ctx, i):
+    return f"/api/v1/usuarios/{await ctx.create('/api/v1/usuarios', json=_usuario_json(ctx))}", {}
+
+
+@mutation("POST", "/api/v1/portal/register", role=None)
+async def _portal_register(ctx, i):
+    n = ctx.serial()
+    return "/api/v1/portal/register", {"json": {"nome": f"Cadastro Budget {n}", "username": f"budget_portal{n}",
+                                                "email": f"budget_portal{n}@email.com", "password": "budget123"}}
+
+
+@mutation("PUT", "/api/v1/portal/me", role="aluno")
+async def _portal_update(ctx, i):
+    return "/api/v1/portal/me", {"data": {"nome": "Aluno Portal Budget", "observacoes": f"Atualizado {i}"}}
+
+
+@mutation("POST", "/api/v1/portal/eventos/{evento_id}/inscrever", role="aluno")
+async def _portal_inscrever(ctx, i):
+    evento_id = await ctx.create("/api/v1/eventos", json=_evento_json(ctx))
+    return f"/api/v1/portal/eventos/{evento_id}/inscrever", {}
+
+
+@mutation("PUT", "/api/v1/portal/me/update-password", role="aluno")
+async def _portal_password(ctx, i):
+    # Alterna entre duas senhas: cada troca parte da senha que a anterior gravou
+    senhas = ("bench123", "bench1234")
+    return "/api/v1/portal/me/update-password", {"json": {"current_password": senhas[i % 2],
+                                                          "new_password": senhas[(i + 1) % 2]}}
+
+
+@mutation("DELETE", "/api/v1/_internal/slow-queries")
+async def _reset_slow_queries(ctx, i):
+    return "/api/v1/_internal/slow-queries", {}
+
+
+# O tracemalloc deixa todas as rotas mais lentas: os cenários dele vêm por último e terminam com ele desligado
+@mutation("POST", "/api/v1/_internal/memory/tracemalloc/start")
+async def _start_tracemalloc(ctx, i):
+    return "/api/v1/_internal/memory/tracemalloc/start", {}
+
+
+@mutation("POST", "/api/v1/_internal/memory/snapshots")
+async def _take_snapshot(ctx, i):
+    return "/api/v1/_internal/memory/snapshots", {"params": {"label": f"budget{i}"}}
+
+
+@mutation("POST", "/api/v1/_internal/memory/tracemalloc/stop")
+async def _stop_tracemalloc(ctx, i):
+    await ctx.client.post("/api/v1/_internal/memory/tracemalloc/start", headers=ctx.headers["admin"])
+    return "/api/v1/_internal/memory/tracemalloc/stop", {}
+
+
+def missing_mutations() -> list:
+    """Rotas de escrita de /api/v1 sem cenário em MUTATIONS (nem entrada em SKIP_PATHS)."""
+    missing = []
+    for route in main.app.routes:
+        path = getattr(route, "path", "")
+        if not path.startswith("/api/v1") or path in SKIP_PATHS:
+            continue
+        for method in sorted((getattr(route, "methods", None) or set()) & MUTATING_METHODS):
+            if (method, path) not in MUTATIONS:
+                missing.append(f"{method} {path}")
+    return missing
+
+
+def _print_result(key, result):
+    print(f"{key:<55} status={result['status']} queries={result['queries']:<4} mediana={result['median_ms']:8.2f}ms")
+
+
+async def collect(runs):
+    ids = seed_database()
+    results = {}
+    transport = httpx.ASGITransport(app=main.app)
+    try:
+        async with httpx.AsyncClient(transport=transport, base_url="http://budget", timeout=120) as client:
+            ctx = BudgetContext(client, ids)
+            for url in discover_get_endpoints(ids):
+                # O portal do aluno exige role 'aluno'; o resto usa o administrador
+                headers = ctx.headers["aluno" if url.startswith("/api/v1/portal/") else "admin"]
+
+                async def prepare(i, url=url, headers=headers):
+                    return "GET", url, {"headers": headers}
+
+                results[url] = await measure(client, runs, prepare)
+                _print_result(url, results[url])
+
+            for (method, path), (role, scenario) in MUTATIONS.items():
+                async def prepare(i, method=method, role=role, scenario=scenario):
+                    url, kwargs = await scenario(ctx, i)
+                    if role is not None:
+                        kwargs.setdefault("headers", ctx.headers[role])
+                    return method, url, kwargs
+
+                key = f"{method} {path}"
+                results[key] = await measure(client, runs, prepare)
+                _print_result(key, results[key])
+    finally:
+        await shutdown()
+    return results
+
+
+def compare(results, baseline, max_slowdown, min_slowdown_ms):
+    failures = []
+    for url, current in results.items():
+        previous = baseline.get(url)
+        if previous is None:
+            print(f"  novo endpoint sem baseline: {url} (rode com --update após revisar)")
+            continue
+        if current["status"] != previous["status"]:
+            failures.append(f"{url}: status {previous['status']} -> {current['status']}")
+        if current["queries"] > previous["queries"]:
+            failures.append(f"{url}: consultas {previous['queries']} -> {current['queries']}")
+        slowdown_ms = current["median_ms"] - previous["median_ms"]
+        if slowdown_ms > min_slowdown_ms and current["median_ms"] > previous["median_ms"] * (1 + max_slowdown):
+            failures.append(f"{url}: mediana {previous['median_ms']}ms -> {current['median_ms']}ms")
+        if current["queries"] < previous["queries"]:
+            print(f"  melhorou: {url} consultas {previous['queries']} -> {current['queries']} (atualize o baseline)")
+    return failures
+
+
+def main_cli():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--update", action="store_true", help="regrava o baseline com os valores atuais")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--max-slowdown", type=float, default=0.5)
+    parser.add_argument("--min-slowdown-ms", type=float, default=25.0)
+    args = parser.parse_args()
+
+    results = asyncio.run(collect(args.runs))
+    for route in missing_mutations():
+        print(f"  rota de escrita sem cenário: {route} (adicione em MUTATIONS ou SKIP_PATHS)")
+
+    if args.update:
+        BASELINE_PATH.write_text(json.dumps(results, indent=2, sort_keys=True, ensure_ascii=False) + "\n", encoding="utf-8")
+        print(f"Baseline gravado em {BASELINE_PATH}")
+        return 0
+
+    if not BASELINE_PATH.exists():
+        print("Baseline inexistente. Rode com --update para criá-lo.")
+        return 1
+    baseline = json.loads(BASELINE_PATH.read_text(encoding="utf-8"))
+    failures = compare(results, baseline, args.max_slowdown, args.min_slowdown_ms)
+    if failures:
+        print("\nREGRESSÕES:")
+        for failure in failures:
+            print(f"  - {failure}")
+        return 1
+    print("\nNenhuma regressão de consultas/latência.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
@@ -0,0 +1,137 @@
+# -*- coding: utf-8 -*-
+"""
+Massa de dados realista para os benchmarks (volumes de uma academia média).
+
+Todas as datas de matrícula são "só data" (meia-noite), como as criadas pela API.
+"""
+import random
+from datetime import date, datetime, timedelta
+
+from src import auth
+from src.database import SessionLocal
+from src.models.aluno import Aluno
+from src.models.categoria import Categoria
+from src.models.evento import Evento
+from src.models.financeiro import Financeiro
+from src.models.historico_matricula import HistoricoMatricula
+from src.models.inscricao import Inscricao
+from src.models.matricula import Matricula
+from src.models.mensalidade import Mensalidade
+from src.models.plano import Plano
+from src.models.produto import Produto
+from src.models.professor import Professor
+from src.models.turma import Turma
+from src.models.usuario import Usuario
+
+NOMES = ["João", "Maria", "José", "Ana", "Antônio", "Francisca", "Carlos", "Paula", "Lucas", "Fernanda",
+         "Rafael", "Juliana", "Pedro", "Beatriz", "Gabriel", "Letícia", "Mateus", "Camila", "Thiago", "Larissa"]
+SOBRENOMES = ["Silva", "Santos", "Oliveira", "Souza", "Rodrigues", "Ferreira", "Alves", "Pereira", "Lima", "Gomes",
+              "Costa", "Ribeiro", "Martins", "Carvalho", "Araújo", "Melo", "Barbosa", "Cardoso", "Rocha", "Dias"]
+
+
+def _midnight(d):
+    return datetime.combine(d, datetime.min.time())
+
+
+def seed_database(total_alunos=300, meses_mensalidades=6, total_eventos=10, total_transacoes=600, seed=42):
+    """
+    Popula o banco apontado por DATABASE_URL. Retorna um dicionário com ids úteis
+    e os tokens de um administrador e de um aluno.
+    """
+    rng = random.Random(seed)
+    db = SessionLocal()
+    try:
+        senha_hash = auth.get_password_hash("bench123")
+        admin = db.query(Usuario).filter(Usuario.username == "admin").first()
+        if admin is None:
+            admin = Usuario(username="admin", email="admin@suaacademia.com", nome="Admin do Sistema",
+                            hashed_password=senha_hash, role="administrador")
+            db.add(admin)
+
+        professores = [
+            Professor(nome=f"Professor {i}", cpf=f"9{i:010d}", email=f"prof{i}@academia.com", especialidade="Jiu-Jitsu")
+            for i in range(5)
+        ]
+        planos = [Plano(nome=nome, valor=valor, periodo_meses=meses)
+                  for nome, valor, meses in (("Mensal", 150.0, 1), ("Trimestral", 400.0, 3), ("Anual", 1400.0, 12))]
+        db.add_all(professores + planos)
+        db.flush()
+
+        turmas = [
+            Turma(nome=f"Turma {modalidade} {horario}", modalidade=modalidade, horario=horario,
+                  dias_semana="Seg/Qua/Sex", professor_id=professores[i % len(professores)].id, capacidade_maxima=30)
+            for i, (modalidade, horario) in enumerate(
+                [(m, h) for m in ("Jiu-Jitsu", "Muay Thai", "Boxe", "Judô") for h in ("07:00", "19:00")]
+            )
+        ]
+        db.add_all(turmas)
+        db.add_all([Categoria(nome=nome, tipo=tipo) for nome, tipo in
+                    (("Mensalidade", "receita"), ("Evento", "receita"), ("Aluguel", "despesa"), ("Energia", "despesa"))])
+        db.add_all([Produto(codigo=f"P{i:04d}", nome=f"Produto {i}", preco_custo=20.0, preco_venda=45.0,
+                            quantidade_estoque=rng.randint(0, 50)) for i in range(30)])
+        db.flush()
+
+        hoje = date.today()
+        alunos = []
+        for i in range(total_alunos):
+            nome = f"{rng.choice(NOMES)} {rng.choice(SOBRENOMES)} {rng.choice(SOBRENOMES)}"
+            usuario = Usuario(username=f"aluno{i}", email=f"aluno{i}@email.com", nome=nome,
+                              hashed_password=senha_hash, role="aluno")
+            aluno = Aluno(nome=nome, cpf=f"{i:011d}", email=f"aluno{i}@email.com", telefone="(21) 99999-0000",
+                          data_nascimento=date(1990 + i % 20, 1 + i % 12, 1 + i % 28), usuario=usuario,
+                          data_cadastro=_midnight(hoje - timedelta(days=rng.randint(0, 365))))
+            db.add(aluno)
+            alunos.append(aluno)
+        db.flush()
+
+        for aluno in alunos:
+            for _ in range(rng.choice((1, 1, 1, 2))):
+                plano = rng.choice(planos)
+                matricula = Matricula(aluno_id=aluno.id, turma_id=rng.choice(turmas).id, plano_id=plano.id,
+                                      ativa=rng.random() > 0.25,
+                                      data_matricula=_midnight(hoje - timedelta(days=30 * meses_mensalidades)))
+                db.add(matricula)
+                db.flush()
+                if not matricula.ativa:
+                    db.add(HistoricoMatricula(matricula_id=matricula.id, descricao="Matrícula trancada"))
+                for mes in range(meses_mensalidades):
+                    vencimento = hoje - timedelta(days=30 * mes)
+                    pago = mes > 0 and rng.random() > 0.1
+                    db.add(Mensalidade(aluno_id=aluno.id, plano_id=plano.id, matricula_id=matricula.id,
+                                       valor=plano.valor, data_vencimento=vencimento,
+                                       data_pagamento=vencimento if pago else None,
+                                       status="pago" if pago else "pendente"))
+
+        eventos = [
+            Evento(nome=f"Evento {i}", tipo="campeonato", local="Ginásio",
+                   data_evento=_midnight(hoje + timedelta(days=15 * (i - total_eventos // 2))),
+                   valor_inscricao=0.0 if i % 3 == 0 else 80.0, capacidade=100)
+            for i in range(total_eventos)
+        ]
+        db.add_all(eventos)
+        db.flush()
+        for evento in eventos:
+            for aluno in rng.sample(alunos, min(len(alunos), 20)):
+                db.add(Inscricao(aluno_id=aluno.id, evento_id=evento.id,
+                                 status="pago" if evento.valor_inscricao == 0 else "pendente"))
+
+        for i in range(total_transacoes):
+            tipo = "receita" if rng.random() > 0.3 else "despesa"
+            db.add(Financeiro(tipo=tipo, categoria="Mensalidade" if tipo == "receita" else "Aluguel",
+                              valor=round(rng.uniform(50, 2000), 2), descricao=f"Transação {i}", status="confirmado",
+                              data=datetime.utcnow() - timedelta(hours=rng.randint(0, 24 * 90))))
+        db.commit()
+
+        aluno_portal = alunos[0]
+        return {
+            "aluno_id": aluno_portal.id,
+            "usuario_aluno_id": aluno_portal.usuario_id,
+            "professor_id": professores[0].id,
+            "turma_id": turmas[0].id,
+            "plano_id": planos[0].id,
+            "evento_id": eventos[0].id,
+            "admin_token": auth.create_access_token(data={"sub": admin.username, "role": admin.role}),
+            "aluno_token": auth.create_access_token(data={"sub": aluno_portal.usuario.username, "role": "aluno"}),
+        }
+    finally:
+        db.close()
@@ -54,6 +54,7 @@ def login():
         if response.status_code == 200:
             data = response.json()
             session['access_token'] = data['access_token']
+            session['refresh_token'] = data.get('refresh_token') # Renova o access token (curto) sem pedir a senha de novo
             session['user_info'] = data['user_info'] # Armazena os dados do usuário
             return redirect(url_for('index'))
         else:
@@ -63,6 +64,13 @@ def login():
 
 @app.route("/logout")
 def logout():
+    refresh_token = session.get('refresh_token')
+    if refresh_token:
+        # Revoga o refresh token na API; o access token expira sozinho
+        try:
+            requests.post(f"{API_BASE_URL}/api/v1/auth/logout", json={"refresh_token": refresh_token}, timeout=5)
+        except requests.exceptions.RequestException as e:
+            app.logger.warning(f"Erro ao revogar o refresh token no logout: {e}")
     session.clear()
     flash("Você saiu do sistema.", "success")
     return redirect(url_for('login'))
@@ -90,33 +98,76 @@ def format_date_br_filter(value):
     except (ValueError, TypeError): return value
     
 
+def _refresh_session():
+    """
+    Troca o refresh token da sessão por um novo par de tokens (POST /auth/refresh).
+    Retorna True se a sessão foi renovada, False se não há sessão válida e None se
+    outra requisição do mesmo navegador acabou de renovar com o mesmo token (409):
+    nesse caso a sessão não deve ser limpa, o cookie da outra resposta já traz os tokens novos.
+    """
+    refresh_token = session.get('refresh_token')
+    if not refresh_token:
+        return False
+    try:
+        response = requests.post(f"{API_BASE_URL}/api/v1/auth/refresh", json={"refresh_token": refresh_token}, timeout=10)
+    except requests.exceptions.RequestException as e:
+        app.logger.error(f"Erro ao renovar a sessão: {e}")
+        return False
+    if response.status_code == 409:
+        return None
+    if response.status_code != 200:
+        return False
+    data = response.json()
+    session['access_token'] = data['access_token']
+    session['refresh_token'] = data['refresh_token']
+    session['user_info'] = data['user_info']
+    return True
+
+
+def _send(method, url, data=None, files=None, json=None, params=None, headers=None):
+    if method == 'GET':
+        return requests.get(url, timeout=10, params=params, headers=headers)
+    elif method == 'POST':
+        return requests.post(url, data=data, files=files, json=json, timeout=10, headers=headers)
+    elif method == 'PUT':
+        # A sua lógica original para PUT já lida com 'files'
+        if files:
+            return requests.put(url, data=data, files=files, timeout=10, headers=headers)
+        return requests.put(url, data=data, json=json, timeout=10, headers=headers)
+    elif method == 'DELETE':
+        return requests.delete(url, timeout=10, headers=headers)
+
+
 def api_request(endpoint, method='GET', data=None, files=None, json=None, params=None, headers=None):
     """
     Função auxiliar para fazer requisições à API FastAPI, incluindo o token de autenticação.
+    Se o access token tiver expirado (401), renova a sessão uma vez e repete a requisição.
     """
     url = f"{API_BASE_URL}/api/v1{endpoint}"
     
     # Prepara os cabeçalhos da requisição
     request_headers = headers if headers is not None else {}
-    if 'access_token' in session and 'Authorization' not in request_headers:
+    uses_session_token = 'access_token' in session and 'Authorization' not in request_headers
+    if uses_session_token:
         request_headers['Authorization'] = f"Bearer {session['access_token']}"
     
     try:
-        if method == 'GET':
-            response = requests.get(url, timeout=10, params=params, headers=request_headers)
-        elif method == 'POST':
-            response = requests.post(url, data=data, files=files, json=json, timeout=10, headers=request_headers)
-        elif method == 'PUT':
-            # A sua lógica original para PUT já lida com 'files'
-            if files:
-                response = requests.put(url, data=data, files=files, timeout=10, headers=request_headers)
-            else:
-                response = requests.put(url, data=data, json=json, timeout=10, headers=request_headers)
-        elif method == 'DELETE':
-            response = requests.delete(url, timeout=10, headers=request_headers)
+        response = _send(method, url, data=data, files=files, json=json, params=params, headers=request_headers)
+
+        refreshed = False
+        if response.status_code == 401 and uses_session_token:
+            refreshed = _refresh_session()
+            if refreshed:
+                # Os arquivos já foram lidos no primeiro envio
+                for file_tuple in (files or {}).values():
+                    if hasattr(file_tuple[1], 'seek'):
+                        file_tuple[1].seek(0)
+                request_headers['Authorization'] = f"Bearer {session['access_token']}"
+                response = _send(method, url, data=data, files=files, json=json, params=params, headers=request_headers)
         
-        # Se a API retornar "Não Autorizado", limpa a sessão para forçar um novo login
-        if response.status_code == 401:
+        # Se a API retornar "Não Autorizado" (e a sessão não pôde ser renovada), limpa a sessão para forçar um novo login.
+        # Renovação concorrente (refreshed is None): mantém a sessão que a outra requisição gravou
+        if response.status_code == 401 and refreshed is not None:
             session.clear()
         
         app.logger.info(f"API Request: {method} {url} - Status: {response.status_code}")
@@ -146,12 +197,12 @@ def index():
     
     try:
         # Busca o total de ALUNOS ATIVOS
-        alunos_ativos_resp = api_request("/alunos?status=ativo&limit=1")
+        alunos_ativos_resp = api_request("/alunos?status=ativo&limit=1&include_total=true")
         if alunos_ativos_resp and alunos_ativos_resp.status_code == 200:
             stats['total_alunos_ativos'] = alunos_ativos_resp.json().get('total', 0)
         
         # Busca o total geral de alunos
-        alunos_total_resp = api_request("/alunos?limit=1")
+        alunos_total_resp = api_request("/alunos?limit=1&include_total=true")
         if alunos_total_resp and alunos_total_resp.status_code == 200:
             stats['total_alunos'] = alunos_total_resp.json().get('total', 0)
 
@@ -191,7 +242,8 @@ def alunos_list():
         "skip": skip,
         "limit": limit,
         "nome": busca,
-        "status": status # ADICIONE ESTA LINHA
+        "status": status, # ADICIONE ESTA LINHA
+        "include_total": "true"
     }
     
     params = {k: v for k, v in params.items() if v}
@@ -1612,15 +1664,21 @@ def usuarios_deletar(id):
 
 @app.route("/login/callback")
 def login_callback():
-    token = request.args.get('token')
-    if not token:
+    code = request.args.get('code')
+    if not code:
         flash("Falha na autenticação.", "error")
         return redirect(url_for('login'))
-        
-    user_info_resp = api_request("/auth/me", headers={"Authorization": f"Bearer {token}"})
-    
-    if user_info_resp and user_info_resp.status_code == 200:
-        user_info = user_info_resp.json()
+
+    # A URL só traz um código de uso único; os tokens vêm da API, servidor a servidor
+    try:
+        response = requests.post(f"{API_BASE_URL}/api/v1/auth/exchange", json={"code": code}, timeout=10)
+    except requests.exceptions.RequestException as e:
+        app.logger.error(f"Erro ao trocar o código de login: {e}")
+        response = None
+
+    if response is not None and response.status_code == 200:
+        data = response.json()
+        user_info = data['user_info']
         
         # --- LÓGICA DE VERIFICAÇÃO DE STATUS PENDENTE ---
         if user_info.get('role') == 'pendente':
@@ -1628,7 +1686,8 @@ def login_callback():
             return redirect(url_for('login'))
         # --- FIM DA LÓGICA ---
 
-        session['access_token'] = token
+        session['access_token'] = data['access_token']
+        session['refresh_token'] = data['refresh_token']
         session['user_info'] = user_info
         return redirect(url_for('index'))
     else:
@@ -1655,6 +1714,7 @@ def portal_aluno_login():
             # Apenas permite o login se a role for 'aluno'
             if user_info.get('role') == 'aluno':
                 session['access_token'] = data['access_token']
+                session['refresh_token'] = data.get('refresh_token')
                 session['user_info'] = user_info
                 return redirect(url_for('portal_aluno_dashboard'))
             else:
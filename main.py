@@ -5,6 +5,7 @@ Arquivo principal da aplicação FastAPI para o sistema de gerenciamento da acad
 """
 
 import os
+from contextlib import asynccontextmanager
 from pathlib import Path
 from fastapi import FastAPI, Request, UploadFile
 from fastapi.exceptions import RequestValidationError
@@ -14,15 +15,15 @@ from fastapi.staticfiles import StaticFiles
 from typing import Any, Dict, List
 from src.routes import pagamentos_fastapi
 from src.routes import dashboard_fastapi 
-from src.models import usuario
+from src.models import usuario, refresh_token, login_code
 from src.routes import auth_fastapi,usuarios_fastapi
+from src.routes import internal_fastapi, metrics_fastapi
 from fastapi.middleware.cors import CORSMiddleware
 from starlette.middleware.sessions import SessionMiddleware 
 from fastapi.staticfiles import StaticFiles
 from fastapi.responses import FileResponse
-import create_first_user
 
-from src.models import aluno, professor, turma, evento, financeiro, matricula, plano, mensalidade, produto, categoria, historico_matricula, inscricao
+from src.models import aluno, professor, turma, evento, financeiro, matricula, plano, mensalidade, produto, categoria, historico_matricula, inscricao, aluno_resumo
 
 from src.routes import (alunos_fastapi, professores_fastapi, turmas_fastapi, eventos_fastapi, 
                         financeiro_fastapi, matriculas_fastapi, planos_fastapi, mensalidades_fastapi, 
@@ -30,25 +31,54 @@ from src.routes import (alunos_fastapi, professores_fastapi, turmas_fastapi, eve
                         dashboard_fastapi, inscricoes_fastapi,portal_aluno_fastapi,portal_professor_fastapi
 )
 
-from src.database import engine, Base
+from src.database import sync_pool_capacity, dispose_async_engine, DATABASE_READ_URL
+from src.read_routing import ReadYourWritesMiddleware
+from src import continuous_profiler, db_pool, image_utils, loop_monitor, memory_diagnostics, storage, tracing
+from src.sql_instrumentation import SqlInstrumentationMiddleware
+from src.metrics import MetricsMiddleware
+from src.logging_config import RequestLoggingMiddleware, configure_logging
+from src.request_profiler import RequestProfilerMiddleware
 
 
 import logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    filename='app.log'
-)
 
-# Cria as tabelas no banco de dados com tratamento de erros
-try:
-    Base.metadata.create_all(bind=engine)
-    print("Tabelas criadas com sucesso!")
-except Exception as e:
-    print(f"Erro ao criar tabelas: {e}")
+# Importar este módulo não toca no banco: criação de tabelas, migrações e o
+# usuário administrador são um passo explícito (python manage.py bootstrap).
+# Em desenvolvimento, BOOTSTRAP_ON_STARTUP=1 executa esse passo no startup.
+BOOTSTRAP_ON_STARTUP = os.environ.get("BOOTSTRAP_ON_STARTUP", "0") == "1"
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    from fastapi.concurrency import run_in_threadpool
+
+    # Logs vão para uma fila e uma thread grava em app.log (JSON, com rotação): ver src/logging_config.py.
+    # Só no startup do servidor: importar main (scripts, benchmarks) não abre o arquivo nem sobe a thread
+    configure_logging()
+    if BOOTSTRAP_ON_STARTUP:
+        import manage
+        await run_in_threadpool(manage.bootstrap)
+    # Mantém o limite de threads do anyio coerente com o tamanho do pool de conexões
+    db_pool.configure_thread_limiter(sync_pool_capacity())
+    # CONTINUOUS_PROFILING=1: amostra as pilhas do worker em segundo plano (arquivos por hora)
+    continuous_profiler.start_from_env()
+    # MEMORY_LOG_INTERVAL_SECONDS > 0: registra RSS/GC/sessões abertas periodicamente
+    memory_diagnostics.start_logger_from_env()
+    # Lag do event loop no /metrics; LOOP_BLOCK_THRESHOLD_MS > 0 loga a pilha de quem trava o loop
+    loop_monitor.start()
+    yield
+    # Fotos ainda na fila de upload terminam antes de o worker sair
+    if not await run_in_threadpool(storage.drain, storage.STORAGE_DRAIN_TIMEOUT_SECONDS):
+        logging.warning("Shutdown com uploads de foto pendentes: as fotos ainda na fila não serão gravadas.")
+    await run_in_threadpool(image_utils.shutdown_pool)
+    await loop_monitor.stop()
+    memory_diagnostics.stop_logger()
+    continuous_profiler.stop()
+    tracing.flush()
+    await dispose_async_engine()
 
 # Inicializa a aplicação FastAPI
 app = FastAPI(
+    lifespan=lifespan,
     title="API Academia de Lutas",
     description="API para gerenciamento de academia de lutas",
     version="1.0.0",
@@ -83,6 +113,13 @@ async def serve_pwa_root():
     return FileResponse(pwa_dir / "index.html")
 
 
+# Conta consultas/tempo de banco por requisição (header Server-Timing + log com alerta de N+1)
+app.add_middleware(SqlInstrumentationMiddleware)
+
+# Com réplica de leitura: após uma escrita, as leituras do mesmo cliente vão ao primário por alguns segundos
+if DATABASE_READ_URL:
+    app.add_middleware(ReadYourWritesMiddleware)
+
 app.add_middleware(SessionMiddleware, secret_key="SUA_SECRET_KEY_AQUI_DEVE_SER_A_MESMA_DO_AUTH.PY")
 
 # Configuração de CORS (já existente)
@@ -99,6 +136,23 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Profiler sob demanda: administrador envia X-Profile: 1 (ou ?_profile=1); lista em /api/v1/_internal/profiles
+app.add_middleware(RequestProfilerMiddleware)
+
+# Crescimento de RSS por rota (diagnóstico de memória, GET /api/v1/_internal/memory)
+if memory_diagnostics.MEMORY_TRACK_ROUTES:
+    app.add_middleware(memory_diagnostics.MemoryTrackingMiddleware)
+
+# Latência por router/rota e requisições em andamento (GET /metrics); por último = mais externo
+app.add_middleware(MetricsMiddleware)
+
+# TRACING_EXPORTER=jsonl|otlp: trace por requisição com spans de SQL, S3, Mercado Pago e Google OAuth (header X-Trace-Id)
+if tracing.ENABLED:
+    app.add_middleware(tracing.TracingMiddleware)
+
+# Request id (X-Request-ID) e contexto dos logs; uma linha por requisição em academia.access
+app.add_middleware(RequestLoggingMiddleware)
+
 # Montagem dos routers
 app.include_router(alunos_fastapi.router, prefix="/api/v1/alunos")
 app.include_router(professores_fastapi.router, prefix="/api/v1/professores")
@@ -118,21 +172,13 @@ app.include_router(auth_fastapi.router)
 app.include_router(usuarios_fastapi.router)
 app.include_router(portal_aluno_fastapi.router)
 app.include_router(portal_professor_fastapi.router)
+app.include_router(internal_fastapi.router)
+app.include_router(metrics_fastapi.router)
 
 
-
-create_first_user.create_first_user()
-
-
-
-
-# Servir arquivos estáticos
+# Servir arquivos estáticos (o diretório é criado pelo manage.py bootstrap)
 static_dir = Path(__file__).parent / "src" / "static"
-try:
-    static_dir.mkdir(exist_ok=True)
-    app.mount("/static", StaticFiles(directory=static_dir), name="static")
-except Exception as e:
-    print(f"Erro ao configurar arquivos estáticos: {e}")
+app.mount("/static", StaticFiles(directory=static_dir, check_dir=False), name="static")
 
 @app.get("/", tags=["Root"])
 async def root():
@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+"""
+Tarefas de administração da API (rodam uma vez por deploy, não em cada worker).
+
+Uso:
+    python manage.py bootstrap       # init-db + create-admin (padrão)
+    python manage.py init-db         # cria tabelas, aplica migrações e o diretório estático
+    python manage.py create-admin    # cria o usuário 'admin' se ainda não existir
+    python manage.py migrations      # lista migrações aplicadas/pendentes
+    python manage.py reindex-search  # recalcula a coluna nome_busca e o índice de busca
+    python manage.py rebuild-resumo  # recalcula a tabela aluno_resumo inteira
+
+No Render, use como Pre-Deploy Command (ou antes do uvicorn no Start Command):
+    python manage.py bootstrap
+"""
+import logging
+import sys
+from pathlib import Path
+
+from src.database import Base, engine
+from src.migrations import MIGRATIONS, applied_versions, run_migrations
+
+# Registra todos os modelos no metadata antes do create_all
+from src.models import (aluno, professor, turma, evento, financeiro, matricula, plano, mensalidade,  # noqa: F401
+                        produto, categoria, historico_matricula, inscricao, usuario, refresh_token,
+                        login_code, aluno_resumo)
+
+STATIC_DIR = Path(__file__).parent / "src" / "static"
+
+
+def init_db():
+    Base.metadata.create_all(bind=engine)
+    print("Tabelas criadas com sucesso!")
+    applied = run_migrations(engine)
+    print(f"Migrações aplicadas: {applied}" if applied else "Nenhuma migração pendente.")
+    STATIC_DIR.mkdir(exist_ok=True)
+
+
+def create_admin():
+    import create_first_user
+    create_first_user.create_first_user()
+
+
+def bootstrap():
+    init_db()
+    create_admin()
+
+
+def reindex_search():
+    """Recalcula nome_busca e o índice de busca (após alterar nomes com SQL direto / import em massa)."""
+    from src import search
+
+    with engine.begin() as conn:
+        counts = search.rebuild(conn)
+    print("Índice de busca reconstruído: " + ", ".join(f"{table}={n}" for table, n in counts.items()))
+
+
+def rebuild_resumo():
+    """Recalcula aluno_resumo (após alterar matrículas/mensalidades com SQL direto / import em massa)."""
+    from src import aluno_resumo as resumo_service
+
+    with engine.begin() as conn:
+        total = resumo_service.rebuild(conn)
+    print(f"aluno_resumo reconstruída: {total} alunos")
+
+
+def show_migrations():
+    applied = applied_versions(engine)
+    for version, name, _ in MIGRATIONS:
+        print(f"{'[x]' if version in applied else '[ ]'} {version:03d}_{name}")
+
+
+COMMANDS = {
+    "bootstrap": bootstrap,
+    "init-db": init_db,
+    "create-admin": create_admin,
+    "migrations": show_migrations,
+    "reindex-search": reindex_search,
+    "rebuild-resumo": rebuild_resumo,
+}
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    command = argv[0] if argv else "bootstrap"
+    if command not in COMMANDS:
+        print(f"Comando desconhecido: {command}. Disponíveis: {', '.join(COMMANDS)}")
+        return 2
+    try:
+        COMMANDS[command]()
+    except Exception as e:
+        logging.error(f"Erro em '{command}': {e}")
+        print(f"❌ Erro em '{command}': {e}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,5 +1,8 @@
 const API_BASE_URL = '/api/v1';
 
+// Promessa compartilhada: várias requisições com 401 ao mesmo tempo disparam um único /refresh
+let refreshPromise = null;
+
 const api = {
     // Funções auxiliares
     getMatriculas: () => api.request('/portal/matriculas'),
@@ -34,6 +37,77 @@ const api = {
         }
     },
     
+    // Troca o código do callback do Google pelo par de tokens
+    exchangeLoginCode: async (code) => {
+        const response = await fetch(`${API_BASE_URL}/auth/exchange`, {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ code })
+        });
+        if (!response.ok) throw new Error('Código de login inválido ou expirado.');
+        return await response.json();
+    },
+
+    // Troca o refresh token por um novo access token (sem senha/bcrypt no servidor)
+    refreshSession: () => {
+        if (refreshPromise) return refreshPromise;
+
+        const refreshToken = localStorage.getItem('refreshToken');
+        if (!refreshToken) return Promise.resolve(false);
+
+        refreshPromise = (async () => {
+            try {
+                const response = await fetch(`${API_BASE_URL}/auth/refresh`, {
+                    method: 'POST',
+                    headers: { 'Content-Type': 'application/json' },
+                    body: JSON.stringify({ refresh_token: refreshToken })
+                });
+                if (response.status === 409) {
+                    // Outra aba renovou com o mesmo token: espera ela gravar o par novo no localStorage
+                    return await api.waitForRotatedToken(refreshToken);
+                }
+                if (!response.ok) return false;
+
+                const data = await response.json();
+                localStorage.setItem('accessToken', data.access_token);
+                localStorage.setItem('refreshToken', data.refresh_token);
+                localStorage.setItem('userRole', data.user_info.role);
+                return true;
+            } catch (error) {
+                console.error("Erro ao renovar sessão:", error);
+                return false;
+            } finally {
+                refreshPromise = null;
+            }
+        })();
+        return refreshPromise;
+    },
+
+    waitForRotatedToken: async (oldToken) => {
+        for (let i = 0; i < 20; i++) {
+            const current = localStorage.getItem('refreshToken');
+            if (current && current !== oldToken) return true;
+            await new Promise(resolve => setTimeout(resolve, 100));
+        }
+        return false;
+    },
+
+    logout: async () => {
+        const refreshToken = localStorage.getItem('refreshToken');
+        localStorage.removeItem('accessToken');
+        localStorage.removeItem('refreshToken');
+        localStorage.removeItem('userRole');
+        if (refreshToken) {
+            try {
+                await fetch(`${API_BASE_URL}/auth/logout`, {
+                    method: 'POST',
+                    headers: { 'Content-Type': 'application/json' },
+                    body: JSON.stringify({ refresh_token: refreshToken })
+                });
+            } catch (e) {}
+        }
+    },
+
     register: (data) => api.request('/portal/register', 'POST', data, false, false),
     getProfile: () => api.request('/portal/me'),
     updateProfile: (formData) => api.request('/portal/me', 'PUT', formData, true, true),
@@ -42,7 +116,7 @@ const api = {
     enrollInEvent: (eventoId) => api.request(`/portal/eventos/${eventoId}/inscrever`, 'POST'),
 
     // --- FUNÇÃO PRINCIPAL DE REQUISIÇÃO (CORRIGIDA) ---
-    async request(endpoint, method = 'GET', body = null, isFormData = false, requiresAuth = true) {
+    async request(endpoint, method = 'GET', body = null, isFormData = false, requiresAuth = true, isRetry = false) {
         const url = `${API_BASE_URL}${endpoint}`;
         const headers = new Headers();
 
@@ -69,9 +143,13 @@ const api = {
         try {
             const response = await fetch(url, config);
             
-            // Se não autorizado, desloga
+            // Se não autorizado, tenta renovar a sessão uma vez; se falhar, desloga
             if (response.status === 401) {
+                if (requiresAuth && !isRetry && await api.refreshSession()) {
+                    return api.request(endpoint, method, body, isFormData, requiresAuth, true);
+                }
                 localStorage.removeItem('accessToken');
+                localStorage.removeItem('refreshToken');
                 window.location.hash = '/login';
                 return;
             }
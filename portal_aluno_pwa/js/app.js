@@ -145,6 +145,7 @@ function handleLoginPage() {
             }
 
             localStorage.setItem('accessToken', data.access_token);
+            localStorage.setItem('refreshToken', data.refresh_token);
             localStorage.setItem('userRole', data.user_info.role);
             
             // Redirecionamento baseado na role
@@ -161,21 +162,24 @@ function handleLoginPage() {
     });
 }
 
-function handleLoginCallback() {
+async function handleLoginCallback() {
     ui.toggleNav(false);
     appRoot.innerHTML = '<p class="text-center mt-5">Autenticando...</p>';
     const params = new URLSearchParams(window.location.hash.split('?')[1]);
-    const token = params.get('token');
-    if (token) {
-        // Precisaríamos decodificar o token ou chamar /me para saber a role
-        // Por simplificação, vamos chamar /me
-        localStorage.setItem('accessToken', token);
-        api.getProfile().then(user => {
-             localStorage.setItem('userRole', user.role); // Assumindo que getProfile retorna a role
-             if (user.role === 'aluno') window.location.hash = '/dashboard';
-             else window.location.hash = '/prof/dashboard';
-        }).catch(() => window.location.hash = '/login');
-    } else {
+    const code = params.get('code');
+    if (!code) {
+        window.location.hash = '/login';
+        return;
+    }
+    try {
+        // A URL só traz um código de uso único; os tokens vêm do POST /auth/exchange
+        const data = await api.exchangeLoginCode(code);
+        localStorage.setItem('accessToken', data.access_token);
+        localStorage.setItem('refreshToken', data.refresh_token);
+        localStorage.setItem('userRole', data.user_info.role);
+        if (data.user_info.role === 'aluno') window.location.hash = '/dashboard';
+        else window.location.hash = '/prof/dashboard';
+    } catch (error) {
         window.location.hash = '/login';
     }
 }
@@ -202,7 +206,7 @@ async function handleDashboardPage() {
         const profile = await api.getProfile();
         document.getElementById('aluno-nome').innerText = profile.nome;
         document.getElementById('aluno-email').innerText = profile.email;
-        document.getElementById('profile-picture').src = profile.foto || '/portal/images/icone.png';
+        ui.setPhoto(document.getElementById('profile-picture'), profile, '/portal/images/icone.png');
         document.getElementById('aluno-telefone').innerText = profile.telefone || '-';
         document.getElementById('aluno-nascimento').innerText = profile.data_nascimento || '-';
 
@@ -224,7 +228,7 @@ async function handleCarteirinhaPage() {
     try {
         const profile = await api.getProfile();
         document.getElementById('aluno-nome').innerText = profile.nome;
-        document.getElementById('aluno-foto').src = profile.foto || '/portal/images/default-avatar.png';
+        ui.setPhoto(document.getElementById('aluno-foto'), profile, '/portal/images/default-avatar.png');
         document.getElementById('aluno-matricula').innerText = 1000 + profile.id;
         document.getElementById('aluno-email').innerText = profile.email || '-';
         document.getElementById('aluno-telefone').innerText = profile.telefone || '-';
@@ -294,7 +298,7 @@ async function handleEditProfilePage() {
         observacoesInput.value = profile.observacoes || '';
         
         if (profile.foto) {
-            fotoPreview.src = profile.foto;
+            ui.setPhoto(fotoPreview, profile);
         }
         
         // Dados do responsável
@@ -317,7 +321,7 @@ async function handleEditProfilePage() {
             const file = fotoInput.files[0];
             if (file) {
                 const reader = new FileReader();
-                reader.onload = (e) => { fotoPreview.src = e.target.result; };
+                reader.onload = (e) => { ui.setPhoto(fotoPreview, { foto: e.target.result }); };
                 reader.readAsDataURL(file);
             }
         });
@@ -843,9 +847,8 @@ window.addEventListener('hashchange', router);
 window.addEventListener('load', () => {
     if ('serviceWorker' in navigator) navigator.serviceWorker.register('/portal/sw.js').catch(console.error);
     
-    document.getElementById('logout-button').addEventListener('click', () => {
-        localStorage.removeItem('accessToken');
-        localStorage.removeItem('userRole');
+    document.getElementById('logout-button').addEventListener('click', async () => {
+        await api.logout();
         window.location.hash = '/login';
     });
     
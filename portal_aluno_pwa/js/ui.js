@@ -20,6 +20,20 @@ const ui = {
         const container = document.getElementById('alert-container') || document.getElementById('app-root');
         container.prepend(alertBox);
     },
+    // Foto com as variantes do backend (foto_variantes): WebP no <source> do <picture>, JPEG no srcset do <img>
+    setPhoto: (img, profile, fallback) => {
+        const variantes = profile.foto_variantes;
+        const srcset = (urls) => Object.entries(urls).map(([size, url]) => `${url} ${size}w`).join(', ');
+        const source = img.parentElement.tagName === 'PICTURE' ? img.parentElement.querySelector('source') : null;
+        if (variantes) {
+            if (source) source.srcset = srcset(variantes.webp);
+            img.srcset = srcset(variantes.jpeg);
+        } else {
+            if (source) source.removeAttribute('srcset');
+            img.removeAttribute('srcset');
+        }
+        img.src = profile.foto || fallback;
+    },
     toggleNav: (show) => {
         document.getElementById('main-header').style.display = show ? 'flex' : 'none';
         document.getElementById('main-nav').style.display = show ? 'flex' : 'none';
@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+"""
+Tabela materializada aluno_resumo: situação de cada aluno sem JOIN nas listagens.
+
+Por aluno: ativo (tem matrícula ativa), matrículas ativas, valor em aberto,
+vencimento em aberto mais antigo (pendente_desde; inadimplente quando é
+anterior a hoje) e data do último pagamento.
+
+Manutenção incremental: depois de cada flush do ORM (sessões síncronas e
+assíncronas), os alunos cujas matrículas/mensalidades foram criadas, apagadas ou
+tiveram campos relevantes alterados são recalculados na mesma transação, com
+consultas agregadas restritas a esses alunos. Escritas por SQL direto não passam
+por aqui: depois delas, rode `python manage.py rebuild-resumo`.
+"""
+from datetime import datetime
+from itertools import chain
+
+from sqlalchemy import delete, event, func, insert, inspect, select
+from sqlalchemy.orm import Session
+
+from src.database import Base
+from src.models.aluno_resumo import AlunoResumo
+
+MENSALIDADE_EM_ABERTO = ("pendente", "atrasado")
+BATCH_SIZE = 500
+
+# Campos que mudam o resumo (alteração em outros campos não dispara recálculo)
+_CAMPOS = {
+    "matriculas": ("aluno_id", "ativa"),
+    "mensalidades": ("aluno_id", "status", "valor", "data_vencimento", "data_pagamento"),
+}
+
+
+def _tables():
+    tables = Base.metadata.tables
+    return tables["alunos"], tables["matriculas"], tables["mensalidades"], AlunoResumo.__table__
+
+
+def _calcular(conn, aluno_ids) -> list:
+    alunos, matriculas, mensalidades, _ = _tables()
+    existentes = [row[0] for row in conn.execute(select(alunos.c.id).where(alunos.c.id.in_(aluno_ids)))]
+    if not existentes:
+        return []
+    ativas = dict(conn.execute(
+        select(matriculas.c.aluno_id, func.count())
+        .where(matriculas.c.aluno_id.in_(existentes), matriculas.c.ativa == True)  # noqa: E712
+        .group_by(matriculas.c.aluno_id)
+    ).all())
+    em_aberto = {row[0]: row[1:] for row in conn.execute(
+        select(mensalidades.c.aluno_id, func.sum(mensalidades.c.valor), func.min(mensalidades.c.data_vencimento))
+        .where(mensalidades.c.aluno_id.in_(existentes), mensalidades.c.status.in_(MENSALIDADE_EM_ABERTO))
+        .group_by(mensalidades.c.aluno_id)
+    )}
+    pagamentos = dict(conn.execute(
+        select(mensalidades.c.aluno_id, func.max(mensalidades.c.data_pagamento))
+        .where(mensalidades.c.aluno_id.in_(existentes), mensalidades.c.status == "pago")
+        .group_by(mensalidades.c.aluno_id)
+    ).all())
+
+    agora = datetime.utcnow()
+    rows = []
+    for aluno_id in existentes:
+        valor_pendente, pendente_desde = em_aberto.get(aluno_id, (0.0, None))
+        rows.append({
+            "aluno_id": aluno_id,
+            "ativo": ativas.get(aluno_id, 0) > 0,
+            "matriculas_ativas": ativas.get(aluno_id, 0),
+            "valor_pendente": valor_pendente or 0.0,
+            "pendente_desde": pendente_desde,
+            "ultimo_pagamento": pagamentos.get(aluno_id),
+            "atualizado_em": agora,
+        })
+    return rows
+
+
+def recompute(conn, aluno_ids):
+    """Recalcula o resumo dos alunos informados (apaga o de alunos que não existem mais)."""
+    resumo = AlunoResumo.__table__
+    ids = sorted({aluno_id for aluno_id in aluno_ids if aluno_id is not None})
+    for start in range(0, len(ids), BATCH_SIZE):
+        batch = ids[start:start + BATCH_SIZE]
+        conn.execute(delete(resumo).where(resumo.c.aluno_id.in_(batch)))
+        rows = _calcular(conn, batch)
+        if rows:
+            conn.execute(insert(resumo), rows)
+
+
+def rebuild(conn) -> int:
+    """Recria a tabela inteira a partir de matrículas e mensalidades."""
+    alunos, _, _, resumo = _tables()
+    conn.execute(delete(resumo))
+    ids = [row[0] for row in conn.execute(select(alunos.c.id).order_by(alunos.c.id))]
+    recompute(conn, ids)
+    return len(ids)
+
+
+def _alunos_afetados(session) -> set:
+    ids = set()
+    for obj in chain(session.new, session.deleted):
+        table = getattr(obj, "__tablename__", None)
+        if table == "alunos":
+            ids.add(obj.id)
+        elif table in _CAMPOS:
+            ids.add(obj.aluno_id)
+    for obj in session.dirty:
+        campos = _CAMPOS.get(getattr(obj, "__tablename__", None))
+        if not campos:
+            continue
+        state = inspect(obj)
+        for campo in campos:
+            history = state.attrs[campo].history
+            if history.has_changes():
+                # aluno_id alterado: o aluno antigo também muda
+                ids.update(history.deleted if campo == "aluno_id" else ())
+                ids.add(obj.aluno_id)
+    return ids
+
+
+@event.listens_for(Session, "after_flush")
+def _manter_resumo(session, flush_context):
+    ids = _alunos_afetados(session)
+    if ids:
+        recompute(session.connection(), ids)
@@ -1,45 +1,76 @@
+from dataclasses import dataclass
 from datetime import datetime, timedelta
+from typing import Optional
+import hashlib
+import secrets
+import threading
+from cachetools import TTLCache
 from jose import JWTError, jwt
-from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import or_, case
+from sqlalchemy.orm import Session, joinedload
 import os
-from authlib.integrations.starlette_client import OAuth
 from starlette.config import Config
-import httpx
 
-from src import database
+from src import database, logging_config, password_hashing
 from src.models import usuario as models_usuario
+from src.models import refresh_token as models_refresh_token
+from src.models import login_code as models_login_code
 
 # --- CONFIGURAÇÃO DE SEGURANÇA ---
 SECRET_KEY = os.environ.get("SECRET_KEY", "09d25e094faa6ca2556c818166b7a9563b93f7099f6f0f4caa6cf63b88e8d3e7")
 ALGORITHM = "HS256"
-ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 8 # Token expira em 8 horas
+# Access token curto; a sessão longa fica no refresh token (rotacionado a cada uso)
+ACCESS_TOKEN_EXPIRE_MINUTES = int(os.environ.get("ACCESS_TOKEN_EXPIRE_MINUTES", "30"))
+REFRESH_TOKEN_EXPIRE_DAYS = int(os.environ.get("REFRESH_TOKEN_EXPIRE_DAYS", "30"))
+# Janela em que reapresentar um refresh token recém-rotacionado é tratado como corrida (duas abas, retry), não como roubo
+REFRESH_TOKEN_REUSE_GRACE_SECONDS = int(os.environ.get("REFRESH_TOKEN_REUSE_GRACE_SECONDS", "30"))
+# Código de uso único que o callback do Google põe na URL no lugar dos tokens
+LOGIN_CODE_EXPIRE_SECONDS = int(os.environ.get("LOGIN_CODE_EXPIRE_SECONDS", "60"))
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Cache de principais (token já validado -> snapshot do usuário), por processo
+AUTH_CACHE_TTL_SECONDS = int(os.environ.get("AUTH_CACHE_TTL_SECONDS", "60"))
+AUTH_CACHE_MAX_SIZE = int(os.environ.get("AUTH_CACHE_MAX_SIZE", "4096"))
+
+pwd_context = password_hashing.pwd_context
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/v1/auth/token")
 
 config = Config('.env') 
 
-# Inicializa o OAuth
-oauth = OAuth(config)
-timeout_client = httpx.AsyncClient(timeout=15.0)
+# O cliente OAuth (authlib + httpx) só é montado no primeiro login com Google,
+# para não pesar no import/boot de cada worker
+_oauth = None
+_oauth_lock = threading.Lock()
+
+def get_oauth():
+    global _oauth
+    if _oauth is None:
+        with _oauth_lock:
+            if _oauth is None:
+                import httpx
+                from authlib.integrations.starlette_client import OAuth
 
-oauth.register(
-    name='google',
-    server_metadata_url='https://accounts.google.com/.well-known/openid-configuration',
-    client_kwargs={
-        'scope': 'openid email profile'
-    },
-    client=timeout_client
-)
+                oauth = OAuth(config)
+                timeout_client = httpx.AsyncClient(timeout=15.0)
+                oauth.register(
+                    name='google',
+                    server_metadata_url='https://accounts.google.com/.well-known/openid-configuration',
+                    client_kwargs={
+                        'scope': 'openid email profile'
+                    },
+                    client=timeout_client
+                )
+                _oauth = oauth
+    return _oauth
 
+# bcrypt roda no pool dedicado de src/password_hashing.py (nunca no event loop)
 def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
+    return password_hashing.verify_password(plain_password, hashed_password)
 
 def get_password_hash(password):
-    return pwd_context.hash(password)
+    return password_hashing.hash_password(password)
 
 def create_access_token(data: dict):
     to_encode = data.copy()
@@ -48,6 +79,131 @@ def create_access_token(data: dict):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
+# --- REFRESH TOKENS ---
+
+def _hash_refresh_token(raw_token: str) -> str:
+    return hashlib.sha256(raw_token.encode("utf-8")).hexdigest()
+
+def _new_refresh_token(db: Session, user_id: int):
+    raw_token = secrets.token_urlsafe(48)
+    db_token = models_refresh_token.RefreshToken(
+        usuario_id=user_id,
+        token_hash=_hash_refresh_token(raw_token),
+        expires_at=datetime.utcnow() + timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS),
+    )
+    db.add(db_token)
+    return db_token, raw_token
+
+def create_refresh_token(db: Session, user_id: int) -> str:
+    """Emite um refresh token opaco e grava apenas o hash dele no banco."""
+    _, raw_token = _new_refresh_token(db, user_id)
+    db.commit()
+    return raw_token
+
+def rotate_refresh_token(db: Session, raw_token: str):
+    """
+    Troca um refresh token válido por um novo (o antigo é revogado e aponta para o sucessor).
+    Retorna (usuario, novo_refresh_token) ou (None, None) se o token não for aceito.
+
+    Reapresentar um token já rotacionado dentro de REFRESH_TOKEN_REUSE_GRACE_SECONDS é
+    uma corrida entre requisições do mesmo cliente: responde 409 sem derrubar a sessão
+    (o cliente usa o token que a outra requisição recebeu). Depois da janela, ou com um
+    token revogado por logout/troca de senha, o reuso indica vazamento e todos os tokens
+    do usuário são revogados. Nenhum hash de senha é feito aqui.
+    """
+    RefreshToken = models_refresh_token.RefreshToken
+    token_hash = _hash_refresh_token(raw_token)
+    now = datetime.utcnow()
+
+    # Reivindica o token num único UPDATE condicional: de duas renovações simultâneas
+    # com o mesmo token, só uma revoga a linha e recebe um token novo
+    claimed = db.query(RefreshToken).filter(
+        RefreshToken.token_hash == token_hash,
+        RefreshToken.revoked_at.is_(None),
+        RefreshToken.expires_at > now
+    ).update({RefreshToken.revoked_at: now}, synchronize_session=False)
+
+    db_token = db.query(RefreshToken).filter(RefreshToken.token_hash == token_hash).first()
+    if claimed != 1:
+        if db_token is None or db_token.revoked_at is None:
+            db.rollback()
+        elif (db_token.replaced_by_id is not None
+              and now - db_token.revoked_at <= timedelta(seconds=REFRESH_TOKEN_REUSE_GRACE_SECONDS)):
+            db.rollback()
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="Sessão já renovada por outra requisição. Use o token mais recente.",
+            )
+        else:
+            revoke_user_refresh_tokens(db, db_token.usuario_id)
+        return None, None
+
+    user = db_token.usuario
+    if user is None:
+        db.commit()
+        return None, None
+
+    successor, new_raw_token = _new_refresh_token(db, user.id)
+    db.flush()
+    db_token.replaced_by_id = successor.id
+    db.commit()
+    return user, new_raw_token
+
+def revoke_refresh_token(db: Session, raw_token: str):
+    RefreshToken = models_refresh_token.RefreshToken
+    db.query(RefreshToken).filter(
+        RefreshToken.token_hash == _hash_refresh_token(raw_token),
+        RefreshToken.revoked_at.is_(None)
+    ).update({RefreshToken.revoked_at: datetime.utcnow()}, synchronize_session=False)
+    db.commit()
+
+def revoke_user_refresh_tokens(db: Session, user_id: int):
+    """Encerra todas as sessões do usuário (troca de senha, exclusão, reuso de token)."""
+    RefreshToken = models_refresh_token.RefreshToken
+    db.query(RefreshToken).filter(
+        RefreshToken.usuario_id == user_id,
+        RefreshToken.revoked_at.is_(None)
+    ).update({RefreshToken.revoked_at: datetime.utcnow()}, synchronize_session=False)
+    db.commit()
+
+# --- CÓDIGOS DE LOGIN (callback do Google) ---
+
+def create_login_code(db: Session, user_id: int) -> str:
+    """
+    Emite um código curto e de uso único para o redirecionamento do login com Google.
+    Os tokens nunca vão na URL (logs de acesso, histórico, Referer): o frontend troca
+    o código pelo par de tokens em POST /auth/exchange.
+    """
+    LoginCode = models_login_code.LoginCode
+    now = datetime.utcnow()
+    # Os códigos vencidos não servem para nada: limpa junto com a emissão
+    db.query(LoginCode).filter(LoginCode.expires_at < now).delete(synchronize_session=False)
+    raw_code = secrets.token_urlsafe(32)
+    db.add(LoginCode(
+        usuario_id=user_id,
+        code_hash=_hash_refresh_token(raw_code),
+        expires_at=now + timedelta(seconds=LOGIN_CODE_EXPIRE_SECONDS),
+    ))
+    db.commit()
+    return raw_code
+
+def redeem_login_code(db: Session, raw_code: str):
+    """Consome o código (UPDATE condicional, só a primeira troca vale). Retorna o usuário ou None."""
+    LoginCode = models_login_code.LoginCode
+    code_hash = _hash_refresh_token(raw_code)
+    now = datetime.utcnow()
+    claimed = db.query(LoginCode).filter(
+        LoginCode.code_hash == code_hash,
+        LoginCode.used_at.is_(None),
+        LoginCode.expires_at > now
+    ).update({LoginCode.used_at: now}, synchronize_session=False)
+    if claimed != 1:
+        db.rollback()
+        return None
+    db_code = db.query(LoginCode).options(joinedload(LoginCode.usuario)).filter(LoginCode.code_hash == code_hash).first()
+    db.commit()
+    return db_code.usuario
+
 # --- FUNÇÕES DE BUSCA DE USUÁRIO ---
 
 def get_user(db: Session, email: str):
@@ -58,13 +214,91 @@ def get_user_by_username(db: Session, username: str):
     """Busca por username (usado no novo login padrão)"""
     return db.query(models_usuario.Usuario).filter(models_usuario.Usuario.username == username).first()
 
+def get_user_by_login(db: Session, login: str):
+    """
+    Busca por username OU email em uma única consulta.
+    Se houver os dois, o usuário cujo username bate tem prioridade (mesma regra do fallback antigo).
+    """
+    Usuario = models_usuario.Usuario
+    # aluno vem no mesmo SELECT: o principal precisa do aluno_id
+    return db.query(Usuario).options(joinedload(Usuario.aluno)).filter(
+        or_(Usuario.username == login, Usuario.email == login)
+    ).order_by(case((Usuario.username == login, 0), else_=1)).first()
+
+# --- CACHE DE PRINCIPAIS ---
+
+@dataclass(frozen=True)
+class UsuarioPrincipal:
+    """
+    Snapshot desacoplado da sessão do usuário autenticado.
+    Tem os mesmos campos que UsuarioRead precisa, então pode ser devolvido direto nas rotas.
+    Rotas que precisam alterar o usuário devem buscá-lo no banco pelo id.
+    """
+    id: int
+    username: Optional[str]
+    email: Optional[str]
+    nome: Optional[str]
+    role: str
+    aluno_id: Optional[int] = None
+
+_principal_cache = TTLCache(maxsize=AUTH_CACHE_MAX_SIZE, ttl=AUTH_CACHE_TTL_SECONDS)
+_principal_cache_lock = threading.Lock()
+
+def _token_key(token: str) -> str:
+    # Nunca guardamos o token em si como chave, apenas o hash
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+def _principal_from_user(user) -> UsuarioPrincipal:
+    return UsuarioPrincipal(
+        id=user.id,
+        username=user.username,
+        email=user.email,
+        nome=user.nome,
+        role=user.role,
+        aluno_id=user.aluno.id if user.aluno else None,
+    )
+
+def _resolve_principal(login: str) -> Optional[UsuarioPrincipal]:
+    # Sessão própria, aberta só quando o token não está no cache
+    db = database.SessionLocal()
+    try:
+        user = get_user_by_login(db, login)
+        if user is None:
+            return None
+        return _principal_from_user(user)
+    finally:
+        db.close()
+
+def invalidate_user_cache(user_id: int):
+    """Remove do cache todos os tokens do usuário (chamar após alterar/excluir o usuário ou sua senha)."""
+    with _principal_cache_lock:
+        stale_keys = [key for key, (_, principal) in _principal_cache.items() if principal.id == user_id]
+        for key in stale_keys:
+            _principal_cache.pop(key, None)
+
+def clear_principal_cache():
+    with _principal_cache_lock:
+        _principal_cache.clear()
+
 # --- DEPENDÊNCIA PRINCIPAL DE AUTENTICAÇÃO ---
 
-async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(database.get_db)):
+async def get_current_user(token: str = Depends(oauth2_scheme)):
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Credenciais inválidas", headers={"WWW-Authenticate": "Bearer"},
     )
+    cache_key = _token_key(token)
+    with _principal_cache_lock:
+        cached = _principal_cache.get(cache_key)
+    if cached is not None:
+        claims, principal = cached
+        # O TTL do cache pode ser maior que o tempo restante do token
+        if claims.get("exp") is None or claims["exp"] > datetime.utcnow().timestamp():
+            logging_config.set_user_id(principal.id)
+            return principal
+        with _principal_cache_lock:
+            _principal_cache.pop(cache_key, None)
+
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         # CORREÇÃO: O 'sub' do token agora contém o USERNAME, não o email
@@ -74,18 +308,19 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = De
     except JWTError:
         raise credentials_exception
     
-    # CORREÇÃO: Busca pelo username, não pelo email
-    user = get_user_by_username(db, username=username)
-    
-    # Fallback: Se não achou por username, tenta por email (para compatibilidade com tokens antigos ou Google)
-    if user is None:
-         user = get_user(db, email=username)
-         
-    if user is None:
+    # Busca por username com fallback para email (tokens antigos ou Google) em uma só consulta.
+    # A consulta é síncrona, então roda no threadpool para não travar o event loop.
+    principal = await run_in_threadpool(_resolve_principal, username)
+
+    if principal is None:
         raise credentials_exception
-    return user
 
-async def get_current_active_user(current_user: models_usuario.Usuario = Depends(get_current_user)):
+    with _principal_cache_lock:
+        _principal_cache[cache_key] = (payload, principal)
+    logging_config.set_user_id(principal.id)
+    return principal
+
+async def get_current_active_user(current_user: UsuarioPrincipal = Depends(get_current_user)):
     if current_user.role == "pendente":
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN, 
@@ -93,12 +328,12 @@ async def get_current_active_user(current_user: models_usuario.Usuario = Depends
         )
     return current_user
 
-async def get_admin_or_gerente(current_user: models_usuario.Usuario = Depends(get_current_active_user)):
+async def get_admin_or_gerente(current_user: UsuarioPrincipal = Depends(get_current_active_user)):
     if current_user.role not in ["administrador", "gerente"]:
         raise HTTPException(status_code=403, detail="Acesso restrito a Administradores ou Gerentes.")
     return current_user
 
-async def get_admin_user(current_user: models_usuario.Usuario = Depends(get_current_active_user)):
+async def get_admin_user(current_user: UsuarioPrincipal = Depends(get_current_active_user)):
     if current_user.role != "administrador":
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN, 
@@ -0,0 +1,260 @@
+# -*- coding: utf-8 -*-
+"""
+Profiler contínuo por amostragem para os workers do uvicorn.
+
+Com CONTINUOUS_PROFILING=1, uma thread daemon lê as pilhas de todas as threads
+do processo CONTINUOUS_PROFILE_HZ vezes por segundo (event loop, threadpool do
+anyio, pool do bcrypt...), descarta as threads ociosas (esperando em fila,
+lock ou select) e soma as pilhas em memória. A cada
+CONTINUOUS_PROFILE_FLUSH_SECONDS o agregado da hora corrente é regravado em
+
+    CONTINUOUS_PROFILE_DIR/<AAAAMMDDTHH>-<pid>.folded
+
+(formato collapsed stacks, UTC, um arquivo por hora e por worker). Arquivos mais
+antigos que CONTINUOUS_PROFILE_RETENTION_HOURS são apagados.
+
+Para ver onde o tempo foi ao longo de vários dias:
+
+    python -m src.continuous_profiler merge --hours 72 > semana.folded
+    python -m src.continuous_profiler top --hours 24
+"""
+import argparse
+import linecache
+import logging
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+
+from src.request_profiler import PROFILE_DIR, frame_label
+
+CONTINUOUS_PROFILING = os.environ.get("CONTINUOUS_PROFILING", "0") == "1"
+CONTINUOUS_PROFILE_HZ = float(os.environ.get("CONTINUOUS_PROFILE_HZ", "19"))
+CONTINUOUS_PROFILE_DIR = Path(os.environ.get("CONTINUOUS_PROFILE_DIR", str(PROFILE_DIR / "continuous")))
+CONTINUOUS_PROFILE_FLUSH_SECONDS = float(os.environ.get("CONTINUOUS_PROFILE_FLUSH_SECONDS", "60"))
+CONTINUOUS_PROFILE_RETENTION_HOURS = int(os.environ.get("CONTINUOUS_PROFILE_RETENTION_HOURS", "168"))
+
+logger = logging.getLogger("academia.profiler")
+
+_FILE_RE = re.compile(r"^(\d{8}T\d{2})-(\d+)\.folded$")
+_THREAD_NUMBER_RE = re.compile(r"[-_ ]?\d+$|_\d+$")
+
+# Folhas que indicam thread parada esperando trabalho (não consomem CPU). Quando a
+# espera é uma chamada em C, a folha é o próprio laço do worker: o valor é um
+# trecho da linha atual que identifica a espera (None = a função inteira é espera).
+_IDLE_LEAVES = {
+    ("threading.py", "wait"): None,
+    ("threading.py", "_wait_for_tstate_lock"): None,
+    ("queue.py", "get"): None,
+    ("selectors.py", "select"): None,
+    ("selectors.py", "poll"): None,
+    ("thread.py", "_worker"): "get(",
+    ("core.py", "_connection_worker_thread"): "get(",  # aiosqlite
+}
+
+
+def _is_idle(frame) -> bool:
+    code = frame.f_code
+    key = (os.path.basename(code.co_filename), code.co_name)
+    if key not in _IDLE_LEAVES:
+        return False
+    marker = _IDLE_LEAVES[key]
+    return marker is None or marker in linecache.getline(code.co_filename, frame.f_lineno)
+
+
+def _thread_group(name: str) -> str:
+    """'AnyIO worker thread' / 'password-hash_3' -> nome sem o número da thread."""
+    return _THREAD_NUMBER_RE.sub("", name) or name
+
+
+class ContinuousProfiler:
+    def __init__(self, hz=CONTINUOUS_PROFILE_HZ, directory=CONTINUOUS_PROFILE_DIR,
+                 flush_seconds=CONTINUOUS_PROFILE_FLUSH_SECONDS, retention_hours=CONTINUOUS_PROFILE_RETENTION_HOURS):
+        self.interval = 1.0 / hz
+        self.directory = Path(directory)
+        self.flush_seconds = flush_seconds
+        self.retention_hours = retention_hours
+        self.samples_total = 0
+        self._lock = threading.Lock()
+        self._stacks = Counter()
+        self._hour = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        if self.running:
+            return
+        self._stop.clear()
+        self._hour = time.strftime("%Y%m%dT%H", time.gmtime())
+        self._thread = threading.Thread(target=self._run, name="continuous-profiler", daemon=True)
+        self._thread.start()
+        logger.info(f"Profiler contínuo iniciado ({1 / self.interval:.0f} Hz, {self.directory})")
+
+    def stop(self):
+        if not self.running:
+            return
+        self._stop.set()
+        self._thread.join()
+        self.flush()
+
+    def sample(self):
+        own_id = threading.get_ident()
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        stacks = []
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == own_id or _is_idle(frame):
+                continue
+            codes = []
+            while frame is not None:
+                codes.append(frame.f_code)
+                frame = frame.f_back
+            root = _thread_group(names.get(thread_id, "thread"))
+            stacks.append((root,) + tuple(reversed(codes)))
+        with self._lock:
+            self._stacks.update(stacks)
+            self.samples_total += 1
+
+    def _run(self):
+        next_flush = time.monotonic() + self.flush_seconds
+        while not self._stop.wait(self.interval):
+            try:
+                self.sample()
+                hour = time.strftime("%Y%m%dT%H", time.gmtime())
+                if hour != self._hour or time.monotonic() >= next_flush:
+                    self.flush()
+                    if hour != self._hour:
+                        with self._lock:
+                            self._stacks.clear()
+                        self._hour = hour
+                        self._cleanup()
+                    next_flush = time.monotonic() + self.flush_seconds
+            except Exception:
+                logger.exception("Falha no profiler contínuo")
+
+    def flush(self):
+        """Regrava o arquivo da hora corrente com o agregado em memória."""
+        with self._lock:
+            items = self._stacks.most_common()
+        if not items:
+            return
+        lines = []
+        for stack, count in items:
+            labels = [stack[0]] + [frame_label(code) for code in stack[1:]]
+            lines.append(";".join(label.replace(";", ":") for label in labels) + f" {count}")
+        self.directory.mkdir(parents=True, exist_ok=True)
+        path = self.directory / f"{self._hour}-{os.getpid()}.folded"
+        tmp = path.with_suffix(".tmp")
+        tmp.write_text("\n".join(lines) + "\n", encoding="utf-8")
+        os.replace(tmp, path)
+
+    def _cleanup(self):
+        cutoff = time.time() - self.retention_hours * 3600
+        for path in self.directory.glob("*.folded"):
+            try:
+                if path.stat().st_mtime < cutoff:
+                    path.unlink()
+            except OSError:
+                continue
+
+
+_profiler = None
+
+
+def start_from_env():
+    """Inicia o profiler se CONTINUOUS_PROFILING=1 (chamado no lifespan de main.app)."""
+    global _profiler
+    if not CONTINUOUS_PROFILING:
+        return None
+    if _profiler is None:
+        _profiler = ContinuousProfiler()
+    _profiler.start()
+    return _profiler
+
+
+def stop():
+    if _profiler is not None:
+        _profiler.stop()
+
+
+def status() -> dict:
+    return {
+        "enabled": CONTINUOUS_PROFILING,
+        "running": _profiler is not None and _profiler.running,
+        "hz": CONTINUOUS_PROFILE_HZ,
+        "samples_total": _profiler.samples_total if _profiler is not None else 0,
+        "directory": str(CONTINUOUS_PROFILE_DIR),
+        "files": list_files(),
+    }
+
+
+def list_files(hours=None) -> list:
+    """Arquivos horários (de todos os workers), do mais recente para o mais antigo."""
+    if not CONTINUOUS_PROFILE_DIR.is_dir():
+        return []
+    cutoff = time.strftime("%Y%m%dT%H", time.gmtime(time.time() - hours * 3600)) if hours else None
+    files = []
+    for path in sorted(CONTINUOUS_PROFILE_DIR.glob("*.folded"), reverse=True):
+        match = _FILE_RE.match(path.name)
+        if match is None or (cutoff is not None and match.group(1) < cutoff):
+            continue
+        files.append({"name": path.name, "hour": match.group(1), "pid": int(match.group(2)),
+                      "size": path.stat().st_size})
+    return files
+
+
+def file_path(name: str):
+    if not _FILE_RE.match(name):
+        return None
+    path = CONTINUOUS_PROFILE_DIR / name
+    return path if path.is_file() else None
+
+
+def merge(paths) -> Counter:
+    """Soma as contagens de vários arquivos collapsed."""
+    stacks = Counter()
+    for path in paths:
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                stack, _, count = line.rstrip("\n").rpartition(" ")
+                if stack and count.isdigit():
+                    stacks[stack] += int(count)
+    return stacks
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Agrega os arquivos do profiler contínuo")
+    parser.add_argument("command", choices=["merge", "top"])
+    parser.add_argument("--hours", type=int, default=24, help="janela (horas) a considerar")
+    parser.add_argument("--limit", type=int, default=30, help="funções exibidas no top")
+    args = parser.parse_args(argv)
+
+    stacks = merge(CONTINUOUS_PROFILE_DIR / f["name"] for f in list_files(args.hours))
+    if args.command == "merge":
+        for stack, count in stacks.most_common():
+            print(f"{stack} {count}")
+        return 0
+
+    # top: tempo próprio (folha da pilha) e tempo total (aparece em qualquer nível) por função
+    total = sum(stacks.values()) or 1
+    self_time, inclusive = Counter(), Counter()
+    for stack, count in stacks.items():
+        frames = stack.split(";")[1:]
+        if frames:
+            self_time[frames[-1]] += count
+        for frame in set(frames):
+            inclusive[frame] += count
+    print(f"{total} amostras em {args.hours}h\n{'próprio':>8} {'total':>8}  função")
+    for frame, count in self_time.most_common(args.limit):
+        print(f"{count / total:8.1%} {inclusive[frame] / total:8.1%}  {frame}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
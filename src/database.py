@@ -3,11 +3,17 @@
 Configuração do banco de dados SQLAlchemy para a aplicação FastAPI.
 """
 
+import logging
 import os
-from sqlalchemy import create_engine
+import time
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+from fastapi import Request
+from sqlalchemy import create_engine, event
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 
+from src import db_pool, sqlite_profile, read_routing
+
 # Usa variável de ambiente ou default para SQLite
 DATABASE_URL = os.environ.get("DATABASE_URL", "sqlite:///./database/academia.db")
 
@@ -19,6 +25,16 @@ if DATABASE_URL and DATABASE_URL.startswith("postgres://"):
 connect_args = {}
 if DATABASE_URL.startswith("sqlite"):
     connect_args = {"check_same_thread": False}
+    # SQLite em arquivo: busy timeout + escritor serializado (ver src/sqlite_profile.py)
+    if sqlite_profile.is_enabled(DATABASE_URL):
+        connect_args.update(sqlite_profile.connect_args())
+
+def _uses_queue_pool(url: str) -> bool:
+    # SQLite em memória usa um pool de conexão única; os parâmetros de QueuePool não se aplicam
+    return not (url.startswith("sqlite") and (":memory:" in url or url.rstrip("/") in ("sqlite:", "sqlite+aiosqlite:")))
+
+# Tamanho do pool via ambiente: DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_TIMEOUT (ver src/db_pool.py)
+pool_kwargs = db_pool.pool_kwargs() if _uses_queue_pool(DATABASE_URL) else {}
 
 # Cria a engine SQLAlchemy com configurações de robustez (Pool Pre-Ping)
 engine = create_engine(
@@ -27,12 +43,65 @@ engine = create_engine(
     # pool_pre_ping=True: Verifica se a conexão está viva antes de usar (Evita o erro SSL connection closed)
     pool_pre_ping=True,
     # pool_recycle: Recicla conexões a cada hora para evitar timeouts do banco
-    pool_recycle=3600
+    pool_recycle=3600,
+    **pool_kwargs
 )
+db_pool.attach_pool_events(engine)
+if sqlite_profile.is_enabled(DATABASE_URL):
+    sqlite_profile.apply_profile(engine)
+
+def sync_pool_capacity():
+    """Conexões simultâneas que o pool síncrono consegue entregar (pool_size + max_overflow), ou None se não houver limite."""
+    if not pool_kwargs or pool_kwargs["max_overflow"] < 0:
+        return None
+    return pool_kwargs["pool_size"] + pool_kwargs["max_overflow"]
 
 # Cria uma SessionLocal class
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+
+# --- RÉPLICA DE LEITURA (opcional) ---
+# Com DATABASE_READ_URL definida, rotas GET seguras usam get_read_db/get_async_read_db.
+# Se a réplica falhar, as leituras voltam ao primário por REPLICA_RETRY_SECONDS.
+# Para uma réplica SQLite, abra somente leitura: sqlite:///file:/caminho/replica.db?mode=ro&uri=true
+DATABASE_READ_URL = os.environ.get("DATABASE_READ_URL") or None
+if DATABASE_READ_URL and DATABASE_READ_URL.startswith("postgres://"):
+    DATABASE_READ_URL = DATABASE_READ_URL.replace("postgres://", "postgresql://", 1)
+REPLICA_RETRY_SECONDS = float(os.environ.get("REPLICA_RETRY_SECONDS", "30"))
+
+_replica_down_until = 0.0
+
+def _mark_replica_down(reason):
+    global _replica_down_until
+    if time.monotonic() >= _replica_down_until:
+        logging.warning(f"Réplica de leitura indisponível ({reason}); usando o primário por {REPLICA_RETRY_SECONDS:.0f}s.")
+    _replica_down_until = time.monotonic() + REPLICA_RETRY_SECONDS
+
+def replica_available():
+    return read_engine is not None and time.monotonic() >= _replica_down_until
+
+def _watch_replica_errors(target):
+    # Erro de conexão/operacional no meio de uma leitura tira a réplica de uso até o próximo retry
+    @event.listens_for(target, "handle_error")
+    def _on_replica_error(context):
+        if context.is_disconnect or type(context.original_exception).__name__ == "OperationalError":
+            _mark_replica_down(context.original_exception)
+
+read_engine = None
+ReadSessionLocal = None
+if DATABASE_READ_URL:
+    read_engine = create_engine(
+        DATABASE_READ_URL,
+        # Réplica só lê: nada de escritor serializado nem PRAGMAs de escrita
+        connect_args={"check_same_thread": False} if DATABASE_READ_URL.startswith("sqlite") else {},
+        pool_pre_ping=True,
+        pool_recycle=3600,
+        **(db_pool.pool_kwargs() if _uses_queue_pool(DATABASE_READ_URL) else {})
+    )
+    db_pool.attach_pool_events(read_engine)
+    _watch_replica_errors(read_engine)
+    ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=read_engine)
+
 # Cria uma Base class
 Base = declarative_base()
 
@@ -42,4 +111,137 @@ def get_db():
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+def _open_read_session(request: Request):
+    if ReadSessionLocal is None or not replica_available() or read_routing.prefers_primary(request):
+        return SessionLocal()
+    db = ReadSessionLocal()
+    try:
+        # Checkout + pre-ping agora: se a réplica estiver fora, ainda dá para cair no primário
+        db.connection()
+        return db
+    except Exception as e:
+        db.close()
+        _mark_replica_down(e)
+        return SessionLocal()
+
+def get_read_db(request: Request):
+    """
+    Sessão para rotas GET somente leitura: usa a réplica (DATABASE_READ_URL) quando
+    configurada e saudável, e o primário logo após uma escrita do mesmo cliente.
+    Nunca grave com esta sessão.
+    """
+    db = _open_read_session(request)
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+# --- ENGINE ASSÍNCRONA ---
+# Rotas `async def` usam get_async_db e não ocupam uma thread do anyio durante a espera do banco.
+# A engine é criada só no primeiro uso, para que o driver async (aiosqlite/asyncpg)
+# não seja obrigatório em scripts que usam apenas a sessão síncrona.
+
+def _build_async_url(url: str):
+    """Converte a DATABASE_URL síncrona para o driver async equivalente."""
+    async_connect_args = {}
+    if url.startswith("sqlite"):
+        return url.replace("sqlite://", "sqlite+aiosqlite://", 1), async_connect_args
+    if url.startswith("postgresql"):
+        # asyncpg não entende o parâmetro 'sslmode' usado nas URLs do Neon/Render
+        parts = urlsplit(url)
+        query = dict(parse_qsl(parts.query))
+        sslmode = query.pop("sslmode", None)
+        if sslmode and sslmode != "disable":
+            async_connect_args["ssl"] = "require"
+        scheme = parts.scheme.split("+")[0] + "+asyncpg"
+        return urlunsplit((scheme, parts.netloc, parts.path, urlencode(query), parts.fragment)), async_connect_args
+    return url, async_connect_args
+
+_async_engine = None
+_async_session_factory = None
+
+def get_async_engine_if_created():
+    """Engine async já criada (ou None), para telemetria sem forçar a criação."""
+    return _async_engine
+
+def get_async_engine():
+    global _async_engine, _async_session_factory
+    if _async_engine is None:
+        from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+
+        async_url, async_connect_args = _build_async_url(DATABASE_URL)
+        _async_engine = create_async_engine(
+            async_url,
+            connect_args=async_connect_args,
+            pool_pre_ping=True,
+            pool_recycle=3600,
+            **(db_pool.pool_kwargs(is_async=True) if _uses_queue_pool(async_url) else {})
+        )
+        db_pool.attach_pool_events(_async_engine)
+        if sqlite_profile.is_enabled(DATABASE_URL):
+            # Só os PRAGMAs; o escritor serializado fica na engine síncrona
+            sqlite_profile.apply_profile(_async_engine)
+        # expire_on_commit=False: atributos continuam acessíveis após o commit sem novo I/O
+        _async_session_factory = async_sessionmaker(_async_engine, autoflush=False, expire_on_commit=False)
+    return _async_engine
+
+_async_read_engine = None
+_async_read_session_factory = None
+
+def get_async_read_engine_if_created():
+    return _async_read_engine
+
+def get_async_read_engine():
+    """Engine async da réplica (None se DATABASE_READ_URL não estiver definida)."""
+    global _async_read_engine, _async_read_session_factory
+    if _async_read_engine is None and DATABASE_READ_URL:
+        from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+
+        async_url, async_connect_args = _build_async_url(DATABASE_READ_URL)
+        _async_read_engine = create_async_engine(
+            async_url,
+            connect_args=async_connect_args,
+            pool_pre_ping=True,
+            pool_recycle=3600,
+            **(db_pool.pool_kwargs(is_async=True) if _uses_queue_pool(async_url) else {})
+        )
+        db_pool.attach_pool_events(_async_read_engine)
+        _watch_replica_errors(_async_read_engine.sync_engine)
+        _async_read_session_factory = async_sessionmaker(_async_read_engine, autoflush=False, expire_on_commit=False)
+    return _async_read_engine
+
+async def dispose_async_engine():
+    """Fecha as conexões dos pools async (chamar no shutdown; as threads do aiosqlite impedem o processo de sair)."""
+    if _async_engine is not None:
+        await _async_engine.dispose()
+    if _async_read_engine is not None:
+        await _async_read_engine.dispose()
+
+async def get_async_db():
+    """Equivalente assíncrono de get_db (usado com Depends em rotas `async def`)."""
+    get_async_engine()
+    async with _async_session_factory() as session:
+        yield session
+
+async def get_async_read_db(request: Request):
+    """Equivalente assíncrono de get_read_db (réplica com fallback para o primário)."""
+    get_async_engine()
+    session = None
+    if DATABASE_READ_URL and replica_available() and not read_routing.prefers_primary(request):
+        get_async_read_engine()
+        session = _async_read_session_factory()
+        try:
+            await session.connection()
+        except Exception as e:
+            await session.close()
+            _mark_replica_down(e)
+            session = None
+    if session is None:
+        session = _async_session_factory()
+    try:
+        yield session
+    finally:
+        await session.close()
@@ -0,0 +1,205 @@
+# -*- coding: utf-8 -*-
+"""
+Pool de conexões instrumentado e telemetria do pool.
+
+As classes abaixo são as mesmas QueuePool/AsyncAdaptedQueuePool do SQLAlchemy,
+apenas medindo quanto tempo cada checkout espera por uma conexão livre e quantas
+threads/tarefas estão esperando naquele momento. Antes disso, pool esgotado
+aparecia só como "requisição travou 30 s" sem explicação.
+"""
+import logging
+import os
+import threading
+import time
+
+from sqlalchemy import event
+from sqlalchemy.pool import QueuePool, AsyncAdaptedQueuePool
+
+# Limites dos buckets do histograma de espera no checkout (em segundos)
+WAIT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class PoolStats:
+    """Contadores de um pool (um por engine)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.waiters = 0
+        self.max_waiters = 0
+        self.checkouts_total = 0
+        self.checkins_total = 0
+        self.connects_total = 0
+        self.invalidated_total = 0
+        self.timeouts_total = 0
+        self.wait_count = 0
+        self.wait_sum = 0.0
+        self.wait_max = 0.0
+        self.wait_buckets = [0] * (len(WAIT_BUCKETS) + 1)  # último = +Inf
+
+    def start_wait(self):
+        with self._lock:
+            self.waiters += 1
+            self.max_waiters = max(self.max_waiters, self.waiters)
+
+    def end_wait(self, elapsed, timed_out=False):
+        with self._lock:
+            self.waiters -= 1
+            if timed_out:
+                self.timeouts_total += 1
+            self.wait_count += 1
+            self.wait_sum += elapsed
+            self.wait_max = max(self.wait_max, elapsed)
+            for index, limit in enumerate(WAIT_BUCKETS):
+                if elapsed <= limit:
+                    self.wait_buckets[index] += 1
+                    break
+            else:
+                self.wait_buckets[-1] += 1
+
+    def incr(self, name):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def snapshot(self):
+        with self._lock:
+            cumulative = 0
+            buckets = {}
+            for limit, count in zip(list(WAIT_BUCKETS) + ["+Inf"], self.wait_buckets):
+                cumulative += count
+                buckets[str(limit)] = cumulative
+            return {
+                "waiters": self.waiters,
+                "max_waiters": self.max_waiters,
+                "checkouts_total": self.checkouts_total,
+                "checkins_total": self.checkins_total,
+                "connects_total": self.connects_total,
+                "invalidated_total": self.invalidated_total,
+                "timeouts_total": self.timeouts_total,
+                "checkout_wait_seconds": {
+                    "count": self.wait_count,
+                    "sum": round(self.wait_sum, 6),
+                    "max": round(self.wait_max, 6),
+                    "buckets": buckets,
+                },
+            }
+
+
+class _InstrumentedPoolMixin:
+    """Mede a espera dentro de _do_get (onde o QueuePool bloqueia quando está cheio)."""
+
+    def _do_get(self):
+        stats = self._stats
+        stats.start_wait()
+        start = time.perf_counter()
+        timed_out = False
+        try:
+            return super()._do_get()
+        except Exception as exc:
+            timed_out = exc.__class__.__name__ == "TimeoutError"
+            raise
+        finally:
+            stats.end_wait(time.perf_counter() - start, timed_out)
+
+    @property
+    def _stats(self):
+        stats = getattr(self, "_pool_stats", None)
+        if stats is None:
+            stats = self._pool_stats = PoolStats()
+        return stats
+
+    def recreate(self):
+        # pool.recreate() (ex.: após dispose) mantém os mesmos contadores
+        new_pool = super().recreate()
+        new_pool._pool_stats = self._stats
+        return new_pool
+
+
+class InstrumentedQueuePool(_InstrumentedPoolMixin, QueuePool):
+    pass
+
+
+class InstrumentedAsyncQueuePool(_InstrumentedPoolMixin, AsyncAdaptedQueuePool):
+    pass
+
+
+def pool_kwargs(is_async=False):
+    """Parâmetros de pool vindos do ambiente (DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_TIMEOUT)."""
+    return {
+        "poolclass": InstrumentedAsyncQueuePool if is_async else InstrumentedQueuePool,
+        "pool_size": int(os.environ.get("DB_POOL_SIZE", "5")),
+        "max_overflow": int(os.environ.get("DB_MAX_OVERFLOW", "10")),
+        "pool_timeout": float(os.environ.get("DB_POOL_TIMEOUT", "30")),
+    }
+
+
+def attach_pool_events(engine):
+    """Registra os eventos de pool que alimentam os contadores."""
+    pool = engine.pool if hasattr(engine, "pool") else engine.sync_engine.pool
+    if not isinstance(pool, _InstrumentedPoolMixin):
+        return
+    target = engine.sync_engine if hasattr(engine, "sync_engine") else engine
+    stats = pool._stats
+
+    @event.listens_for(target, "checkout")
+    def _on_checkout(dbapi_connection, connection_record, connection_proxy):
+        stats.incr("checkouts_total")
+
+    @event.listens_for(target, "checkin")
+    def _on_checkin(dbapi_connection, connection_record):
+        stats.incr("checkins_total")
+
+    @event.listens_for(target, "connect")
+    def _on_connect(dbapi_connection, connection_record):
+        stats.incr("connects_total")
+
+    @event.listens_for(target, "invalidate")
+    def _on_invalidate(dbapi_connection, connection_record, exception):
+        stats.incr("invalidated_total")
+
+
+def pool_status(engine):
+    """Estado atual + contadores acumulados do pool de uma engine (sync ou async)."""
+    pool = engine.sync_engine.pool if hasattr(engine, "sync_engine") else engine.pool
+    status = {"class": pool.__class__.__name__}
+    if isinstance(pool, QueuePool):
+        status.update({
+            "size": pool.size(),
+            "checked_in": pool.checkedin(),
+            "checked_out": pool.checkedout(),
+            "overflow": pool.overflow(),
+            "max_overflow": pool._max_overflow,
+            "timeout": pool.timeout(),
+        })
+    if isinstance(pool, _InstrumentedPoolMixin):
+        status.update(pool._stats.snapshot())
+    return status
+
+
+def configure_thread_limiter(pool_capacity):
+    """
+    Mantém o limite de threads do anyio coerente com o pool síncrono.
+
+    Cada rota `def` ocupa uma thread e, em geral, uma conexão. Com mais threads
+    que conexões (padrão do anyio: 40), as threads excedentes ficam paradas no
+    checkout até o DB_POOL_TIMEOUT. ANYIO_THREAD_LIMIT define o limite desejado e
+    DB_POOL_GUARD decide o que fazer se ele passar da capacidade do pool:
+    'warn' (padrão) apenas registra, 'clamp' reduz o limite de threads. O clamp
+    vale para todo trabalho síncrono (rotas `def`, run_in_threadpool, arquivos),
+    não só para o banco, por isso é opcional.
+    Deve ser chamado dentro do event loop (o limitador é por loop).
+    """
+    import anyio.to_thread
+
+    limiter = anyio.to_thread.current_default_thread_limiter()
+    desired = int(os.environ.get("ANYIO_THREAD_LIMIT", str(int(limiter.total_tokens))))
+    guard = os.environ.get("DB_POOL_GUARD", "warn")
+
+    if pool_capacity is not None and desired > pool_capacity:
+        logging.warning(
+            f"Limite de threads ({desired}) maior que a capacidade do pool ({pool_capacity}). "
+            "Ajuste DB_POOL_SIZE/DB_MAX_OVERFLOW ou ANYIO_THREAD_LIMIT."
+        )
+        if guard == "clamp":
+            desired = pool_capacity
+    limiter.total_tokens = desired
+    return desired
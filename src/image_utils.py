@@ -1,38 +1,142 @@
-from PIL import Image
+"""
+Processamento das fotos de perfil (alunos e professores).
+
+Cada foto vira AVATAR_SIZES (padrão 64/128/250 px no maior lado) em WebP e em
+JPEG (fallback para quem não aceita WebP), sem metadados, já rotacionadas pela
+orientação EXIF do celular.
+
+- JPEG é decodificado direto em escala reduzida (draft do libjpeg: 1/2, 1/4,
+  1/8), então uma foto de 12 MP nunca chega a ser expandida inteira na memória.
+- Antes de decodificar, só o cabeçalho é lido: arquivos acima de
+  AVATAR_MAX_BYTES ou AVATAR_MAX_PIXELS são recusados (inspect_avatar(), usado
+  também na requisição para responder 400/413 na hora).
+- A conta roda num pool de AVATAR_PROCESS_WORKERS processos (0 = no próprio
+  processo): nem o event loop nem as threads da API disputam CPU/GIL com o Pillow.
+  Os processos são criados com spawn, que reimporta o módulo __main__: scripts
+  que sobem o app precisam do `if __name__ == "__main__"` (uvicorn/gunicorn já têm).
+"""
 import io
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 
-def process_avatar_image(file_stream, max_size=(250, 250), quality=70):
-    """
-    Redimensiona e comprime uma imagem para ser usada como avatar.
-    Otimizado para mobile: 250px e qualidade 70.
+AVATAR_SIZES = tuple(sorted({int(s) for s in os.environ.get("AVATAR_SIZES", "64,128,250").split(",") if s.strip()}))
+AVATAR_MAX_BYTES = int(os.environ.get("AVATAR_MAX_BYTES", str(20 * 1024 * 1024)))
+AVATAR_MAX_PIXELS = int(os.environ.get("AVATAR_MAX_PIXELS", "50000000"))
+AVATAR_WEBP_QUALITY = int(os.environ.get("AVATAR_WEBP_QUALITY", "75"))
+AVATAR_JPEG_QUALITY = int(os.environ.get("AVATAR_JPEG_QUALITY", "80"))
+AVATAR_PROCESS_WORKERS = int(os.environ.get("AVATAR_PROCESS_WORKERS", str(min(2, os.cpu_count() or 1))))
+AVATAR_PROCESS_TIMEOUT_SECONDS = float(os.environ.get("AVATAR_PROCESS_TIMEOUT_SECONDS", "30"))
 
-    :param file_stream: O stream de bytes do arquivo de imagem.
-    :param max_size: Uma tupla (width, height) com o tamanho máximo.
-    :param quality: A qualidade da compressão JPEG (0-100).
-    :return: Um objeto BytesIO com a imagem processada e seu content type.
-    """
+# formato -> (extensão, content type)
+FORMATS = {"webp": ("webp", "image/webp"), "jpeg": ("jpg", "image/jpeg")}
+
+
+class InvalidImage(ValueError):
+    """Arquivo que não é imagem ou passa dos limites de tamanho/pixels."""
+
+
+def inspect_avatar(data: bytes):
+    """Valida tamanho, formato e pixels lendo só o cabeçalho. Devolve (largura, altura)."""
+    from PIL import Image, UnidentifiedImageError
+
+    if len(data) > AVATAR_MAX_BYTES:
+        raise InvalidImage(f"Foto muito grande (máximo {AVATAR_MAX_BYTES // (1024 * 1024)} MB).")
     try:
-        # Abre a imagem usando a biblioteca Pillow
-        img = Image.open(file_stream)
-
-        # Converte imagens com paletas (como alguns GIFs) ou com canal alfa (PNG) para RGB
-        if img.mode in ('P', 'RGBA'):
-            img = img.convert('RGB')
-
-        # Mantém a proporção da imagem, redimensionando para o tamanho máximo
-        img.thumbnail(max_size, Image.Resampling.LANCZOS)
-
-        # Salva a imagem otimizada em um buffer de memória
-        img_byte_arr = io.BytesIO()
-        # optimize=True faz uma passagem extra para reduzir o tamanho
-        img.save(img_byte_arr, format='JPEG', quality=quality, optimize=True)
-        
-        # Move o "cursor" de volta para o início do buffer para que o boto3 possa lê-lo
-        img_byte_arr.seek(0)
-
-        return img_byte_arr, 'image/jpeg'
-
-    except Exception as e:
-        # Se ocorrer um erro (ex: arquivo não é uma imagem), retorna None
-        print(f"Erro ao processar imagem: {e}")
-        return None, None
\ No newline at end of file
+        # Image.open não decodifica os pixels, só lê o cabeçalho
+        with Image.open(io.BytesIO(data)) as img:
+            width, height = img.size
+    except (UnidentifiedImageError, OSError, Image.DecompressionBombError):
+        raise InvalidImage("Arquivo de foto inválido.")
+    if width * height > AVATAR_MAX_PIXELS:
+        raise InvalidImage(f"Foto com resolução muito alta ({width}x{height}).")
+    return width, height
+
+
+def _to_rgb(img):
+    from PIL import Image
+
+    if img.mode == "RGB":
+        return img
+    if img.mode in ("RGBA", "LA") or (img.mode == "P" and "transparency" in img.info):
+        # Transparência vira fundo branco (convert('RGB') deixaria preto)
+        rgba = img.convert("RGBA")
+        background = Image.new("RGB", rgba.size, (255, 255, 255))
+        background.paste(rgba, mask=rgba.getchannel("A"))
+        return background
+    return img.convert("RGB")
+
+
+def _render_variants(data: bytes, sizes, max_pixels, webp_quality, jpeg_quality) -> dict:
+    """Roda no pool de processos: {(tamanho, formato): bytes}."""
+    from PIL import Image, ImageOps
+
+    Image.MAX_IMAGE_PIXELS = max_pixels
+    img = Image.open(io.BytesIO(data))
+    if img.size[0] * img.size[1] > max_pixels:
+        raise InvalidImage(f"Foto com resolução muito alta ({img.size[0]}x{img.size[1]}).")
+    largest = max(sizes)
+    if img.format == "JPEG":
+        # Decodifica já reduzido, mantendo os dois lados >= o maior tamanho pedido
+        img.draft("RGB", (largest, largest))
+    img = _to_rgb(ImageOps.exif_transpose(img))
+
+    variants = {}
+    current = img
+    # Do maior para o menor: cada tamanho parte do anterior (menos pixels para reamostrar)
+    for size in sorted(sizes, reverse=True):
+        current = current.copy()
+        current.thumbnail((size, size), Image.Resampling.LANCZOS, reducing_gap=2.0)
+        webp = io.BytesIO()
+        current.save(webp, format="WEBP", quality=webp_quality, method=4)
+        jpeg = io.BytesIO()
+        current.save(jpeg, format="JPEG", quality=jpeg_quality, optimize=True, progressive=True)
+        variants[(size, "webp")] = webp.getvalue()
+        variants[(size, "jpeg")] = jpeg.getvalue()
+    return variants
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                # spawn: o processo filho não herda as threads/conexões do worker da API
+                _pool = ProcessPoolExecutor(max_workers=AVATAR_PROCESS_WORKERS,
+                                            mp_context=multiprocessing.get_context("spawn"))
+    return _pool
+
+
+def shutdown_pool():
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+
+def render_avatar_variants(data: bytes, sizes=AVATAR_SIZES) -> dict:
+    """
+    Gera as variantes da foto: {(tamanho, 'webp'|'jpeg'): bytes}.
+    Bloqueia quem chama até o pool terminar (chamado pela fila de upload, fora das rotas).
+    Levanta InvalidImage para arquivos inválidos ou grandes demais.
+    """
+    # Importado aqui: o processo do pool só precisa do Pillow, não do app
+    from src import tracing
+
+    args = (data, tuple(sizes), AVATAR_MAX_PIXELS, AVATAR_WEBP_QUALITY, AVATAR_JPEG_QUALITY)
+    with tracing.span("avatar.process", **{"avatar.bytes": len(data), "avatar.sizes": ",".join(map(str, sizes))}):
+        if AVATAR_PROCESS_WORKERS <= 0:
+            return _render_variants(*args)
+        try:
+            return _get_pool().submit(_render_variants, *args).result(timeout=AVATAR_PROCESS_TIMEOUT_SECONDS)
+        except BrokenProcessPool:
+            # Um processo do pool morreu (ex.: falta de memória): o próximo upload recria o pool
+            shutdown_pool()
+            raise
@@ -0,0 +1,276 @@
+# -*- coding: utf-8 -*-
+"""
+Logging assíncrono e estruturado.
+
+As rotas só enfileiram o registro (QueueHandler); uma thread (QueueListener)
+formata e grava no arquivo com rotação, então `logging.info/error` não faz
+I/O de disco no caminho da requisição. Se a fila encher (LOG_QUEUE_SIZE), o
+registro é descartado em vez de bloquear.
+
+- Formato JSON (LOG_FORMAT=json, padrão) com request_id, método, rota e
+  user_id da requisição em andamento. Mensagens que já são JSON (academia.sql,
+  academia.memory...) são mescladas no registro.
+- Rotação por tamanho (LOG_MAX_BYTES) ou por tempo (LOG_ROTATE_WHEN=midnight,
+  H...), mantendo LOG_BACKUP_COUNT arquivos.
+- Amostragem de INFO/DEBUG: LOG_INFO_SAMPLE_RATE (padrão 1 = tudo) e taxas por
+  logger em LOG_SAMPLE_RATES="academia.access=0.1,academia.sql=0.5".
+  WARNING e acima nunca são amostrados.
+- RequestLoggingMiddleware define o contexto da requisição, devolve o header
+  X-Request-ID e registra uma linha por requisição em `academia.access`.
+"""
+import atexit
+import contextvars
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import re
+import sys
+import time
+import uuid
+from datetime import datetime, timezone
+
+LOG_FILE = os.environ.get("LOG_FILE", "app.log")
+LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.environ.get("LOG_FORMAT", "json")
+LOG_MAX_BYTES = int(os.environ.get("LOG_MAX_BYTES", str(10 * 1024 * 1024)))
+LOG_ROTATE_WHEN = os.environ.get("LOG_ROTATE_WHEN", "")
+LOG_BACKUP_COUNT = int(os.environ.get("LOG_BACKUP_COUNT", "5"))
+LOG_STDERR = os.environ.get("LOG_STDERR", "0") == "1"
+LOG_QUEUE_SIZE = int(os.environ.get("LOG_QUEUE_SIZE", "10000"))
+LOG_INFO_SAMPLE_RATE = float(os.environ.get("LOG_INFO_SAMPLE_RATE", "1"))
+LOG_SAMPLE_RATES = os.environ.get("LOG_SAMPLE_RATES", "")
+
+TEXT_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+REQUEST_ID_HEADER = b"x-request-id"
+_REQUEST_ID_RE = re.compile(r"^[\w.-]{1,64}$")
+
+access_logger = logging.getLogger("academia.access")
+
+
+# --- CONTEXTO DA REQUISIÇÃO ---
+
+class RequestContext:
+    __slots__ = ("request_id", "scope", "user_id")
+
+    def __init__(self, request_id, scope):
+        self.request_id = request_id
+        self.scope = scope
+        self.user_id = None
+
+    @property
+    def route(self):
+        return getattr(self.scope.get("route"), "path", None)
+
+
+_request_context = contextvars.ContextVar("log_request_context", default=None)
+
+
+def current_context():
+    return _request_context.get()
+
+
+def set_user_id(user_id):
+    """Chamado pela autenticação: associa o usuário aos logs da requisição em andamento."""
+    context = _request_context.get()
+    if context is not None:
+        context.user_id = user_id
+
+
+class ContextFilter(logging.Filter):
+    """Copia o contexto da requisição para o registro (na thread que loga, antes de ir para a fila)."""
+
+    def filter(self, record):
+        context = _request_context.get()
+        if context is not None:
+            record.request_id = context.request_id
+            record.method = context.scope.get("method")
+            record.route = context.route or context.scope.get("path")
+            record.user_id = context.user_id
+        return True
+
+
+def _parse_sample_rates(spec: str) -> dict:
+    rates = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        name, _, rate = item.partition("=")
+        try:
+            rates[name.strip()] = float(rate)
+        except ValueError:
+            continue
+    return rates
+
+
+class SamplingFilter(logging.Filter):
+    """Mantém só uma fração dos registros INFO/DEBUG (por logger, com prefixo mais longo)."""
+
+    def __init__(self, default_rate=1.0, rates=None):
+        super().__init__()
+        self.default_rate = default_rate
+        self.rates = sorted((rates or {}).items(), key=lambda item: -len(item[0]))
+        self._cache = {}
+
+    def _rate_for(self, name):
+        rate = self._cache.get(name)
+        if rate is None:
+            rate = self.default_rate
+            for prefix, prefix_rate in self.rates:
+                if name == prefix or name.startswith(prefix + "."):
+                    rate = prefix_rate
+                    break
+            self._cache[name] = rate
+        return rate
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING:
+            return True
+        rate = self._rate_for(record.name)
+        return rate >= 1 or random.random() < rate
+
+
+# --- FILA ---
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler que descarta (e conta) quando a fila está cheia, em vez de bloquear a requisição."""
+
+    dropped = 0
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            NonBlockingQueueHandler.dropped += 1
+
+    def prepare(self, record):
+        # Resolve a mensagem e a exceção aqui (os args podem mudar depois), mas mantém
+        # o registro estruturado para o formatter da thread de escrita
+        record = logging.makeLogRecord(record.__dict__)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+class JsonFormatter(logging.Formatter):
+    CONTEXT_FIELDS = ("request_id", "method", "route", "user_id")
+
+    def format(self, record):
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+        }
+        message = record.getMessage()
+        data = None
+        if message.startswith("{"):
+            try:
+                data = json.loads(message)
+            except ValueError:
+                data = None
+        if isinstance(data, dict):
+            entry.update(data)
+        else:
+            entry["message"] = message
+        for field in self.CONTEXT_FIELDS:
+            value = getattr(record, field, None)
+            if value is not None:
+                entry.setdefault(field, value)
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        elif record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+def _file_handler():
+    if LOG_ROTATE_WHEN:
+        return logging.handlers.TimedRotatingFileHandler(
+            LOG_FILE, when=LOG_ROTATE_WHEN, backupCount=LOG_BACKUP_COUNT, encoding="utf-8", utc=True
+        )
+    return logging.handlers.RotatingFileHandler(
+        LOG_FILE, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUP_COUNT, encoding="utf-8"
+    )
+
+
+_listener = None
+
+
+def configure_logging():
+    """Substitui os handlers do root por QueueHandler -> QueueListener (arquivo com rotação). Idempotente."""
+    global _listener
+    if _listener is not None:
+        return _listener
+
+    formatter = JsonFormatter() if LOG_FORMAT == "json" else logging.Formatter(TEXT_FORMAT)
+    handlers = [_file_handler()]
+    if LOG_STDERR:
+        handlers.append(logging.StreamHandler(sys.stderr))
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    log_queue = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+    queue_handler = NonBlockingQueueHandler(log_queue)
+    queue_handler.addFilter(SamplingFilter(LOG_INFO_SAMPLE_RATE, _parse_sample_rates(LOG_SAMPLE_RATES)))
+    queue_handler.addFilter(ContextFilter())
+
+    root = logging.getLogger()
+    # Algum import pode ter chamado logging.info() antes, o que cria um handler de stderr implícito
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    root.setLevel(LOG_LEVEL)
+
+    _listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
+    return _listener
+
+
+# --- MIDDLEWARE ---
+
+class RequestLoggingMiddleware:
+    """Middleware ASGI: request id (X-Request-ID), contexto para os logs e uma linha por requisição."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_id = None
+        for name, value in scope.get("headers") or ():
+            if name == REQUEST_ID_HEADER:
+                candidate = value.decode("latin-1")
+                request_id = candidate if _REQUEST_ID_RE.match(candidate) else None
+                break
+        context = RequestContext(request_id or uuid.uuid4().hex, scope)
+        token = _request_context.set(context)
+        status_code = 500
+        start = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                message["headers"] = list(message.get("headers", [])) + [
+                    (REQUEST_ID_HEADER, context.request_id.encode("latin-1"))
+                ]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            entry = {
+                "event": "request",
+                "path": scope.get("path"),
+                "status": status_code,
+                "duration_ms": round((time.perf_counter() - start) * 1000, 2),
+            }
+            access_logger.log(logging.WARNING if status_code >= 500 else logging.INFO, json.dumps(entry))
+            _request_context.reset(token)
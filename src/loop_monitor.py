@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+"""
+Atraso (lag) do event loop e detector de chamadas bloqueantes.
+
+- Lag: uma tarefa dorme LOOP_LAG_INTERVAL_SECONDS e mede quanto acordou
+  atrasada. O atraso vai para o histograma academia_event_loop_lag_seconds do
+  /metrics. Se um `async def` faz I/O síncrono (bcrypt, SDK HTTP, consulta ao
+  banco), todas as requisições do worker esperam, e é aqui que isso aparece.
+- Detector (para desenvolvimento/homologação, LOOP_BLOCK_THRESHOLD_MS > 0): uma
+  thread de vigia confere o último "batimento" da tarefa acima. Se o loop ficar
+  preso por mais que o limite, registra no log `academia.loop` a pilha do event
+  loop naquele instante (a corrotina culpada e a linha que está bloqueando),
+  uma vez por episódio.
+"""
+import asyncio
+import logging
+import os
+import sys
+import threading
+import time
+import traceback
+
+from src import metrics
+
+LOOP_LAG_INTERVAL_SECONDS = float(os.environ.get("LOOP_LAG_INTERVAL_SECONDS", "0.5"))
+LOOP_BLOCK_THRESHOLD_MS = float(os.environ.get("LOOP_BLOCK_THRESHOLD_MS", "0"))
+
+logger = logging.getLogger("academia.loop")
+
+
+class LoopMonitor:
+    def __init__(self, interval=LOOP_LAG_INTERVAL_SECONDS, block_threshold_ms=LOOP_BLOCK_THRESHOLD_MS):
+        self.interval = interval
+        self.block_threshold = block_threshold_ms / 1000
+        self.max_lag = 0.0
+        self.blocked_total = 0
+        self._heartbeat = time.monotonic()
+        self._loop = None
+        self._loop_thread_id = None
+        self._task = None
+        self._watchdog = None
+        self._stop = threading.Event()
+
+    def start(self):
+        """Deve ser chamado dentro do event loop (lifespan)."""
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        self._heartbeat = time.monotonic()
+        self._task = asyncio.create_task(self._run(), name="loop-monitor")
+        if self.block_threshold > 0:
+            self._stop.clear()
+            self._watchdog = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+            self._watchdog.start()
+
+    async def stop(self):
+        self._stop.set()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        if self._watchdog is not None:
+            self._watchdog.join()
+
+    async def _run(self):
+        # Com o detector ligado, o batimento precisa ser bem mais curto que o limite
+        step = min(self.interval, self.block_threshold / 4) if self.block_threshold > 0 else self.interval
+        while True:
+            expected = time.monotonic() + step
+            await asyncio.sleep(step)
+            now = time.monotonic()
+            self._heartbeat = now
+            lag = max(0.0, now - expected)
+            self.max_lag = max(self.max_lag, lag)
+            metrics.event_loop_lag.observe(lag)
+
+    def _watch(self):
+        reported_heartbeat = None
+        check_every = max(self.block_threshold / 4, 0.005)
+        while not self._stop.wait(check_every):
+            heartbeat = self._heartbeat
+            blocked_for = time.monotonic() - heartbeat
+            if blocked_for < self.block_threshold or heartbeat == reported_heartbeat:
+                continue
+            reported_heartbeat = heartbeat
+            self.blocked_total += 1
+            metrics.event_loop_blocked.inc()
+            frame = sys._current_frames().get(self._loop_thread_id)
+            stack = "".join(traceback.format_stack(frame)) if frame is not None else "(pilha indisponível)"
+            logger.warning(
+                f"Event loop bloqueado há {blocked_for * 1000:.0f}ms (limite {self.block_threshold * 1000:.0f}ms) "
+                f"na tarefa {self._current_task_name()}:\n{stack}"
+            )
+
+    def _current_task_name(self):
+        # Leitura sem lock do dicionário de tarefas correntes: só para o log
+        task = asyncio.tasks._current_tasks.get(self._loop)
+        if task is None:
+            return "(nenhuma: callback do loop)"
+        coro = task.get_coro()
+        return f"{task.get_name()} ({getattr(coro, '__qualname__', coro)})"
+
+    def status(self) -> dict:
+        return {
+            "interval_seconds": self.interval,
+            "max_lag_ms": round(self.max_lag * 1000, 2),
+            "block_threshold_ms": self.block_threshold * 1000,
+            "blocked_total": self.blocked_total,
+        }
+
+
+_monitor = None
+
+
+def start():
+    """Inicia o monitor no loop atual (chamado no lifespan de main.app)."""
+    global _monitor
+    if LOOP_LAG_INTERVAL_SECONDS <= 0:
+        return None
+    _monitor = LoopMonitor()
+    _monitor.start()
+    if _monitor.block_threshold > 0:
+        logger.info(f"Detector de bloqueio do event loop ligado (limite {LOOP_BLOCK_THRESHOLD_MS:.0f}ms)")
+    return _monitor
+
+
+async def stop():
+    if _monitor is not None:
+        await _monitor.stop()
+
+
+def status() -> dict:
+    return _monitor.status() if _monitor is not None else {"enabled": False}
@@ -0,0 +1,228 @@
+# -*- coding: utf-8 -*-
+"""
+Diagnóstico de memória dos workers.
+
+- tracemalloc sob demanda (rotas em /api/v1/_internal/memory): liga/desliga,
+  tira snapshots (os MEMORY_MAX_SNAPSHOTS mais recentes ficam em memória) e
+  compara dois snapshots agrupando por arquivo, linha ou traceback;
+- sessões do SQLAlchemy vivas e o tamanho dos identity maps (objetos ORM presos
+  a uma sessão que não foi fechada);
+- com MEMORY_TRACK_ROUTES=1, o middleware acumula quanto o RSS cresceu durante
+  cada rota (aproximado quando há requisições simultâneas);
+- com MEMORY_LOG_INTERVAL_SECONDS > 0, uma thread registra RSS, GC, sessões e
+  as rotas que mais cresceram no log `academia.memory`.
+
+Tudo é por processo: cada chamada às rotas atinge apenas o worker que a atendeu.
+"""
+import gc
+import itertools
+import json
+import logging
+import os
+import threading
+import tracemalloc
+from collections import Counter, OrderedDict
+from datetime import datetime
+
+MEMORY_MAX_SNAPSHOTS = int(os.environ.get("MEMORY_MAX_SNAPSHOTS", "5"))
+MEMORY_LOG_INTERVAL_SECONDS = float(os.environ.get("MEMORY_LOG_INTERVAL_SECONDS", "0"))
+MEMORY_TRACK_ROUTES = os.environ.get("MEMORY_TRACK_ROUTES", "0") == "1"
+
+logger = logging.getLogger("academia.memory")
+
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+# Alocações do próprio tracemalloc e do import system só poluem o diff
+_SNAPSHOT_FILTERS = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+    tracemalloc.Filter(False, "<unknown>"),
+)
+
+_lock = threading.Lock()
+_snapshots = OrderedDict()
+_snapshot_ids = itertools.count(1)
+
+_route_rss_growth = Counter()
+_route_requests = Counter()
+
+
+def rss_bytes() -> int:
+    """RSS atual do processo (Linux: /proc/self/statm; outros: pico do getrusage)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except (OSError, IndexError, ValueError):
+        import resource  # não existe no Windows; lá o /proc também não
+
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def gc_stats() -> dict:
+    return {
+        "counts": gc.get_count(),
+        "thresholds": gc.get_threshold(),
+        "collections": [s["collections"] for s in gc.get_stats()],
+        "collected": [s["collected"] for s in gc.get_stats()],
+        "uncollectable": len(gc.garbage),
+    }
+
+
+def orm_sessions() -> dict:
+    """Sessões do SQLAlchemy ainda vivas e quantos objetos estão nos identity maps."""
+    from sqlalchemy.orm import session as orm_session
+
+    try:
+        sessions = list(orm_session._sessions.values())
+    except RuntimeError:
+        # Outra thread abriu/fechou uma sessão durante a cópia do WeakValueDictionary
+        sessions = list(orm_session._sessions.values())
+    sizes = sorted((len(s.identity_map) for s in sessions), reverse=True)
+    return {"open_sessions": len(sessions), "identity_map_objects": sum(sizes), "largest_identity_maps": sizes[:5]}
+
+
+def record_route_growth(route: str, delta: int):
+    with _lock:
+        _route_requests[route] += 1
+        if delta > 0:
+            _route_rss_growth[route] += delta
+
+
+def top_routes(limit=10) -> list:
+    with _lock:
+        return [{"route": route, "rss_growth_bytes": growth, "requests": _route_requests[route]}
+                for route, growth in _route_rss_growth.most_common(limit)]
+
+
+# --- TRACEMALLOC ---
+
+def tracemalloc_status() -> dict:
+    current, peak = tracemalloc.get_traced_memory()
+    with _lock:
+        snapshots = [{"id": snapshot_id, **meta} for snapshot_id, (_, meta) in _snapshots.items()]
+    return {
+        "tracing": tracemalloc.is_tracing(),
+        "nframes": tracemalloc.get_traceback_limit(),
+        "traced_bytes": current,
+        "traced_peak_bytes": peak,
+        "overhead_bytes": tracemalloc.get_tracemalloc_memory(),
+        "snapshots": snapshots,
+    }
+
+
+def start_tracing(nframes: int = 1):
+    if tracemalloc.is_tracing():
+        tracemalloc.stop()
+    tracemalloc.start(nframes)
+
+
+def stop_tracing():
+    """Para o tracemalloc e descarta os snapshots (eles não podem ser comparados com um novo trace)."""
+    tracemalloc.stop()
+    with _lock:
+        _snapshots.clear()
+
+
+def take_snapshot(label=None) -> dict:
+    if not tracemalloc.is_tracing():
+        raise RuntimeError("tracemalloc não está ativo")
+    snapshot = tracemalloc.take_snapshot().filter_traces(_SNAPSHOT_FILTERS)
+    meta = {
+        "label": label,
+        "taken_at": datetime.utcnow().isoformat() + "Z",
+        "traced_bytes": sum(stat.size for stat in snapshot.statistics("filename")),
+        "rss_bytes": rss_bytes(),
+    }
+    with _lock:
+        snapshot_id = next(_snapshot_ids)
+        _snapshots[snapshot_id] = (snapshot, meta)
+        while len(_snapshots) > MEMORY_MAX_SNAPSHOTS:
+            _snapshots.popitem(last=False)
+    return {"id": snapshot_id, **meta}
+
+
+def get_snapshot(snapshot_id: int):
+    with _lock:
+        entry = _snapshots.get(snapshot_id)
+    return entry[0] if entry is not None else None
+
+
+def compare(base, target, group_by="lineno", limit=25) -> list:
+    """Maiores diferenças de alocação entre dois snapshots (positivo = cresceu)."""
+    stats = target.compare_to(base, group_by)
+    result = []
+    for stat in stats[:limit]:
+        frame = stat.traceback[0]
+        item = {
+            "file": frame.filename,
+            "line": frame.lineno if group_by != "filename" else None,
+            "size_diff_bytes": stat.size_diff,
+            "count_diff": stat.count_diff,
+            "size_bytes": stat.size,
+            "count": stat.count,
+        }
+        if group_by == "traceback":
+            item["traceback"] = [f"{f.filename}:{f.lineno}" for f in stat.traceback]
+        result.append(item)
+    return result
+
+
+# --- MIDDLEWARE E LOG PERIÓDICO ---
+
+class MemoryTrackingMiddleware:
+    """Middleware ASGI: acumula o crescimento de RSS por rota (MEMORY_TRACK_ROUTES=1)."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        before = rss_bytes()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            route = getattr(scope.get("route"), "path", None) or "<sem rota>"
+            record_route_growth(f"{scope['method']} {route}", rss_bytes() - before)
+
+
+def memory_report() -> dict:
+    return {
+        "pid": os.getpid(),
+        "rss_bytes": rss_bytes(),
+        "gc": gc_stats(),
+        "orm": orm_sessions(),
+        "top_routes_rss_growth": top_routes(),
+        "tracemalloc": tracemalloc_status(),
+    }
+
+
+_logger_stop = threading.Event()
+_logger_thread = None
+
+
+def _log_loop(interval):
+    while not _logger_stop.wait(interval):
+        try:
+            report = {"event": "memory", "pid": os.getpid(), "rss_mb": round(rss_bytes() / 1048576, 1),
+                      "gc": gc_stats(), "orm": orm_sessions(), "top_routes": top_routes(5)}
+            logger.info(json.dumps(report))
+        except Exception:
+            logger.exception("Falha ao coletar estatísticas de memória")
+
+
+def start_logger_from_env():
+    """Inicia o log periódico se MEMORY_LOG_INTERVAL_SECONDS > 0 (chamado no lifespan de main.app)."""
+    global _logger_thread
+    if MEMORY_LOG_INTERVAL_SECONDS <= 0 or (_logger_thread is not None and _logger_thread.is_alive()):
+        return
+    _logger_stop.clear()
+    _logger_thread = threading.Thread(target=_log_loop, args=(MEMORY_LOG_INTERVAL_SECONDS,),
+                                      name="memory-logger", daemon=True)
+    _logger_thread.start()
+
+
+def stop_logger():
+    _logger_stop.set()
@@ -0,0 +1,331 @@
+# -*- coding: utf-8 -*-
+"""
+Métricas da API no formato texto do Prometheus (sem dependências externas).
+
+- MetricsMiddleware mede cada requisição: histograma de latência por router
+  (alunos, mensalidades, portal, pagamentos...), rota, método e status, e um
+  gauge de requisições em andamento por router;
+- external_call() mede chamadas a serviços externos (Mercado Pago, S3/R2,
+  Google OAuth) e abre um span no trace da requisição (src.tracing);
+- render() junta tudo com o estado dos pools de conexão, da fila do bcrypt e do
+  escritor do SQLite no momento da coleta.
+
+As métricas são por processo: com vários workers, o Prometheus deve coletar
+cada um (ou agregar por instância).
+"""
+import threading
+import time
+from contextlib import contextmanager
+
+from src import tracing
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+EXTERNAL_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _format_labels(names, values):
+    if not names:
+        return ""
+    pairs = []
+    for name, value in zip(names, values):
+        escaped = str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        pairs.append(f'{name}="{escaped}"')
+    return "{" + ",".join(pairs) + "}"
+
+
+def _format_value(value):
+    if isinstance(value, float):
+        return repr(value) if value != int(value) else f"{int(value)}"
+    return str(value)
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def header(self):
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        return self.header() + [f"{self.name}{_format_labels(self.labelnames, k)} {_format_value(v)}" for k, v in items]
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def dec(self, *labels, amount=1):
+        self.inc(*labels, amount=-amount)
+
+    def render(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        return self.header() + [f"{self.name}{_format_labels(self.labelnames, k)} {_format_value(v)}" for k, v in items]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, *labels):
+        with self._lock:
+            series = self._values.get(labels)
+            if series is None:
+                series = self._values[labels] = {"counts": [0] * (len(self.buckets) + 1), "sum": 0.0}
+            for index, limit in enumerate(self.buckets):
+                if value <= limit:
+                    series["counts"][index] += 1
+                    break
+            else:
+                series["counts"][-1] += 1
+            series["sum"] += value
+
+    def render(self):
+        with self._lock:
+            items = sorted((k, {"counts": list(v["counts"]), "sum": v["sum"]}) for k, v in self._values.items())
+        lines = self.header()
+        for labels, series in items:
+            cumulative = 0
+            for limit, count in zip(list(self.buckets) + ["+Inf"], series["counts"]):
+                cumulative += count
+                le = limit if limit == "+Inf" else _format_value(float(limit))
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames + ('le',), labels + (le,))} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, labels)} {_format_value(round(series['sum'], 6))}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, labels)} {cumulative}")
+        return lines
+
+
+# --- MÉTRICAS DA APLICAÇÃO ---
+
+http_request_duration = Histogram(
+    "academia_http_request_duration_seconds", "Latência das requisições HTTP.",
+    ("router", "route", "method", "status"),
+)
+http_requests_in_flight = Gauge(
+    "academia_http_requests_in_flight", "Requisições HTTP em andamento.", ("router",),
+)
+external_call_duration = Histogram(
+    "academia_external_call_duration_seconds", "Latência de chamadas a serviços externos (Mercado Pago, S3).",
+    ("service", "operation", "outcome"), buckets=EXTERNAL_BUCKETS,
+)
+event_loop_lag = Histogram(
+    "academia_event_loop_lag_seconds", "Atraso do event loop medido pelo src.loop_monitor.",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5),
+)
+event_loop_blocked = Counter(
+    "academia_event_loop_blocked_total", "Episódios de event loop bloqueado acima de LOOP_BLOCK_THRESHOLD_MS.",
+)
+
+REGISTRY = [http_request_duration, http_requests_in_flight, external_call_duration, event_loop_lag, event_loop_blocked]
+
+
+_known_routers = None
+
+
+def _api_routers(app) -> set:
+    """Prefixos /api/v1/<router> registrados no app (evita um rótulo por URL inexistente)."""
+    global _known_routers
+    if _known_routers is None:
+        _known_routers = {
+            route.path[len("/api/v1/"):].split("/", 1)[0]
+            for route in getattr(app, "routes", [])
+            if getattr(route, "path", "").startswith("/api/v1/")
+        }
+    return _known_routers
+
+
+def router_label(path: str, app=None) -> str:
+    """'/api/v1/alunos/12' -> 'alunos'; fora da API: 'pwa', 'static', 'docs', 'metrics' ou 'outros'."""
+    if path.startswith("/api/v1/"):
+        router = path[len("/api/v1/"):].split("/", 1)[0]
+        return router if app is None or router in _api_routers(app) else "outros"
+    first = path.strip("/").split("/", 1)[0]
+    if first == "portal":
+        return "pwa"
+    if first in ("static", "metrics"):
+        return first
+    if first in ("docs", "redoc", "openapi.json"):
+        return "docs"
+    return "outros"
+
+
+@contextmanager
+def external_call(service: str, operation: str):
+    """Mede uma chamada externa: `with metrics.external_call("s3", "upload"): ...`. Também vira um span do trace."""
+    start = time.perf_counter()
+    outcome = "error"
+    try:
+        with tracing.span(f"{service}.{operation}", kind="client", **{"peer.service": service}):
+            yield
+        outcome = "ok"
+    finally:
+        external_call_duration.observe(time.perf_counter() - start, service, operation, outcome)
+
+
+class MetricsMiddleware:
+    """Middleware ASGI: latência por router/rota e requisições em andamento."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        router = router_label(scope.get("path", ""), scope.get("app"))
+        status_code = 500
+        start = time.perf_counter()
+        http_requests_in_flight.inc(router)
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            http_requests_in_flight.dec(router)
+            route = getattr(scope.get("route"), "path", None) or "<sem rota>"
+            http_request_duration.observe(
+                time.perf_counter() - start, router, route, scope.get("method", ""), f"{status_code // 100}xx"
+            )
+
+
+# --- COLETA DO ESTADO ATUAL (pools, bcrypt, SQLite) ---
+
+def _gauge_lines(name, documentation, samples, kind="gauge"):
+    """samples: lista de (labels_dict, valor)."""
+    lines = [f"# HELP {name} {documentation}", f"# TYPE {name} {kind}"]
+    for labels, value in samples:
+        lines.append(f"{name}{_format_labels(tuple(labels), tuple(labels.values()))} {_format_value(value)}")
+    return lines
+
+
+def _pool_lines():
+    from src import database, db_pool
+
+    engines = [("sync", database.engine), ("async", database.get_async_engine_if_created()),
+               ("read", database.read_engine), ("async_read", database.get_async_read_engine_if_created())]
+    statuses = [(label, db_pool.pool_status(engine)) for label, engine in engines if engine is not None]
+
+    lines = []
+    for key, name, doc, kind in (
+        ("checked_out", "academia_db_pool_checked_out", "Conexões em uso.", "gauge"),
+        ("size", "academia_db_pool_size", "Tamanho fixo do pool.", "gauge"),
+        ("overflow", "academia_db_pool_overflow", "Conexões de overflow abertas.", "gauge"),
+        ("waiters", "academia_db_pool_waiters", "Threads/tarefas esperando uma conexão.", "gauge"),
+        ("checkouts_total", "academia_db_pool_checkouts_total", "Checkouts de conexão.", "counter"),
+        ("timeouts_total", "academia_db_pool_timeouts_total", "Checkouts que estouraram o DB_POOL_TIMEOUT.", "counter"),
+        ("invalidated_total", "academia_db_pool_invalidated_total", "Conexões invalidadas.", "counter"),
+    ):
+        samples = [({"engine": label}, status[key]) for label, status in statuses if key in status]
+        if samples:
+            lines += _gauge_lines(name, doc, samples, kind)
+
+    waits = [(label, status["checkout_wait_seconds"]) for label, status in statuses if "checkout_wait_seconds" in status]
+    if waits:
+        name = "academia_db_pool_checkout_wait_seconds"
+        lines += [f"# HELP {name} Espera por uma conexão livre no checkout.", f"# TYPE {name} histogram"]
+        for label, wait in waits:
+            for le, cumulative in wait["buckets"].items():
+                le = le if le == "+Inf" else _format_value(float(le))
+                lines.append(f'{name}_bucket{{engine="{label}",le="{le}"}} {cumulative}')
+            lines.append(f'{name}_sum{{engine="{label}"}} {_format_value(wait["sum"])}')
+            lines.append(f'{name}_count{{engine="{label}"}} {wait["count"]}')
+    return lines
+
+
+def _password_hash_lines():
+    from src import password_hashing
+
+    m = password_hashing.get_metrics()
+    lines = []
+    for key, kind, doc in (
+        ("pending", "gauge", "Operações de bcrypt pendentes (na fila + executando)."),
+        ("queued", "gauge", "Operações de bcrypt esperando um worker."),
+        ("running", "gauge", "Operações de bcrypt executando."),
+        ("workers", "gauge", "Threads do pool de bcrypt."),
+        ("submitted_total", "counter", "Operações de bcrypt enviadas ao pool."),
+        ("rejected_total", "counter", "Operações recusadas com 503 (fila cheia)."),
+        ("rehashed_total", "counter", "Senhas regravadas com o custo atual no login."),
+        ("wait_seconds_total", "counter", "Tempo total de espera na fila do bcrypt."),
+        ("run_seconds_total", "counter", "Tempo total de execução do bcrypt."),
+    ):
+        lines += _gauge_lines(f"academia_password_hash_{key}", doc, [({}, m[key])], kind)
+    if m.get("bcrypt_rounds"):
+        lines += _gauge_lines("academia_password_hash_bcrypt_rounds", "Custo do bcrypt em uso.", [({}, m["bcrypt_rounds"])])
+    return lines
+
+
+def _sqlite_writer_lines():
+    from src import database, sqlite_profile
+
+    if not sqlite_profile.is_enabled(database.DATABASE_URL):
+        return []
+    stats = sqlite_profile.writer_stats()
+    return (
+        _gauge_lines("academia_sqlite_writer_acquired_total", "Transações de escrita que passaram pelo escritor serializado.",
+                     [({}, stats["acquired_total"])], "counter")
+        + _gauge_lines("academia_sqlite_writer_wait_seconds_total", "Tempo total na fila de escrita do SQLite.",
+                       [({}, round(stats["wait_seconds_total"], 6))], "counter")
+        + _gauge_lines("academia_sqlite_writer_timeouts_total", "Escritas que desistiram da fila (busy_timeout).",
+                       [({}, stats["timeouts_total"])], "counter")
+        + _gauge_lines("academia_sqlite_writer_reentry_total",
+                       "Escritas recusadas: a mesma thread já tinha uma transação de escrita em outra conexão.",
+                       [({}, stats["reentry_total"])], "counter")
+    )
+
+
+def _storage_upload_lines():
+    from src import storage
+
+    m = storage.get_metrics()
+    lines = []
+    for key, kind, doc in (
+        ("pending", "gauge", "Fotos na fila de upload (esperando + processando)."),
+        ("pending_bytes", "gauge", "Bytes das fotos na fila de upload (arquivos originais em memória)."),
+        ("submitted_total", "counter", "Fotos enviadas para a fila de upload."),
+        ("inline_total", "counter", "Fotos processadas na própria requisição (fila cheia)."),
+        ("completed_total", "counter", "Fotos enviadas e gravadas no registro."),
+        ("failed_total", "counter", "Fotos inválidas ou com erro no upload."),
+        ("superseded_total", "counter", "Fotos descartadas (registro excluído ou foto mais nova)."),
+        ("run_seconds_total", "counter", "Tempo total de processamento + upload das fotos."),
+    ):
+        lines += _gauge_lines(f"academia_storage_upload_{key}", doc, [({}, m[key])], kind)
+    return lines
+
+
+def render() -> str:
+    lines = []
+    for metric in REGISTRY:
+        lines += metric.render()
+    lines += _pool_lines()
+    lines += _password_hash_lines()
+    lines += _sqlite_writer_lines()
+    lines += _storage_upload_lines()
+    return "\n".join(lines) + "\n"
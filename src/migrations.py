@@ -0,0 +1,179 @@
+# -*- coding: utf-8 -*-
+"""
+Migrações versionadas do esquema.
+
+`Base.metadata.create_all` só cria tabelas que ainda não existem: índices ou
+restrições novas declaradas nos modelos nunca chegam a um banco que já está em
+produção. Cada migração abaixo tem um número de versão; as já aplicadas ficam
+registradas na tabela `schema_migrations` e não rodam de novo.
+
+Regras para novas migrações:
+- nunca altere uma migração já publicada, crie a próxima versão;
+- use SQL que funcione no SQLite e no PostgreSQL (ex.: CREATE INDEX IF NOT EXISTS);
+- declare também o índice/restrição no modelo, para bancos novos via create_all.
+
+Uso:
+    python -m src.migrations            # aplica as pendentes
+    python -m src.migrations status     # lista aplicadas/pendentes
+"""
+import logging
+import sys
+from datetime import datetime
+
+from sqlalchemy import inspect, text
+
+MIGRATIONS_TABLE = "schema_migrations"
+
+
+def _create_index(conn, name, table, columns, unique=False):
+    conn.execute(text(
+        f"CREATE {'UNIQUE ' if unique else ''}INDEX IF NOT EXISTS {name} ON {table} ({', '.join(columns)})"
+    ))
+
+
+# --- MIGRAÇÕES ---
+
+def _m001_indices_consultas_frequentes(conn):
+    """Índices para os filtros das listagens, do dashboard e do gerador de mensalidades."""
+    # Antes do índice único, confere se já existem inscrições duplicadas (aluno inscrito 2x no mesmo evento)
+    duplicadas = conn.execute(text(
+        "SELECT evento_id, aluno_id, COUNT(*) FROM inscricoes GROUP BY evento_id, aluno_id HAVING COUNT(*) > 1"
+    )).fetchall()
+    if duplicadas:
+        raise RuntimeError(
+            "Inscrições duplicadas impedem o índice único (evento_id, aluno_id): "
+            + ", ".join(f"evento {e} / aluno {a} ({n}x)" for e, a, n in duplicadas[:20])
+            + ". Remova as duplicadas e rode as migrações novamente."
+        )
+
+    _create_index(conn, "ix_mensalidades_status_vencimento", "mensalidades", ["status", "data_vencimento"])
+    _create_index(conn, "ix_mensalidades_matricula_vencimento", "mensalidades", ["matricula_id", "data_vencimento"])
+    _create_index(conn, "ix_mensalidades_aluno_id", "mensalidades", ["aluno_id"])
+    _create_index(conn, "ix_financeiro_tipo_data", "financeiro", ["tipo", "data"])
+    _create_index(conn, "ix_matriculas_aluno_ativa", "matriculas", ["aluno_id", "ativa"])
+    _create_index(conn, "ix_matriculas_turma_id", "matriculas", ["turma_id"])
+    _create_index(conn, "uq_inscricoes_evento_aluno", "inscricoes", ["evento_id", "aluno_id"], unique=True)
+    _create_index(conn, "ix_historico_matriculas_matricula_id", "historico_matriculas", ["matricula_id"])
+
+
+def _m002_indice_paginacao_alunos(conn):
+    """Paginação por cursor da listagem de alunos: ORDER BY nome, id com WHERE (nome, id) > (...)."""
+    _create_index(conn, "ix_alunos_nome_id", "alunos", ["nome", "id"])
+
+
+def _m003_busca_sem_acento(conn):
+    """Coluna nome_busca (normalizada) em alunos, professores e usuarios + FTS5 (SQLite) ou pg_trgm (PostgreSQL)."""
+    from src import search
+    from src.models import aluno, professor, usuario  # noqa: F401 (registram as tabelas em search.SEARCHABLE)
+
+    for table in search.SEARCHABLE:
+        columns = {column["name"] for column in inspect(conn).get_columns(table)}
+        if search.SEARCH_COLUMN not in columns:
+            conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {search.SEARCH_COLUMN} VARCHAR(255)"))
+        search.backfill(conn, table)
+    search.create_indexes(conn)
+    if conn.dialect.name == "sqlite":
+        # As triggers só cobrem escritas futuras: indexa o que já existe
+        for table in search.SEARCHABLE:
+            conn.execute(text(f"INSERT INTO {table}_busca_fts({table}_busca_fts) VALUES ('rebuild')"))
+
+
+def _m004_aluno_resumo(conn):
+    """Tabela materializada aluno_resumo (status/inadimplência da listagem sem JOIN), já preenchida."""
+    from src import aluno_resumo
+    from src.models import matricula, mensalidade  # noqa: F401 (tabelas usadas no cálculo)
+    from src.models.aluno_resumo import AlunoResumo
+
+    AlunoResumo.__table__.create(conn, checkfirst=True)
+    for index in AlunoResumo.__table__.indexes:
+        index.create(conn, checkfirst=True)
+    aluno_resumo.rebuild(conn)
+
+
+def _m005_refresh_token_sucessor(conn):
+    """refresh_tokens.replaced_by_id: distingue corrida de rotação (janela de tolerância) de reuso de token roubado."""
+    columns = {column["name"] for column in inspect(conn).get_columns("refresh_tokens")}
+    if "replaced_by_id" not in columns:
+        conn.execute(text("ALTER TABLE refresh_tokens ADD COLUMN replaced_by_id INTEGER REFERENCES refresh_tokens(id)"))
+
+
+def _m006_codigos_login(conn):
+    """Tabela login_codes: código de uso único do callback do Google (os tokens saem da URL)."""
+    from src.models import usuario  # noqa: F401 (FK para usuarios)
+    from src.models.login_code import LoginCode
+
+    LoginCode.__table__.create(conn, checkfirst=True)
+    for index in LoginCode.__table__.indexes:
+        index.create(conn, checkfirst=True)
+
+
+# (versão, nome, função) — sempre em ordem crescente de versão
+MIGRATIONS = [
+    (1, "indices_consultas_frequentes", _m001_indices_consultas_frequentes),
+    (2, "indice_paginacao_alunos", _m002_indice_paginacao_alunos),
+    (3, "busca_sem_acento", _m003_busca_sem_acento),
+    (4, "aluno_resumo", _m004_aluno_resumo),
+    (5, "refresh_token_sucessor", _m005_refresh_token_sucessor),
+    (6, "codigos_login", _m006_codigos_login),
+]
+
+
+# --- EXECUÇÃO ---
+
+def _ensure_migrations_table(conn):
+    conn.execute(text(
+        f"CREATE TABLE IF NOT EXISTS {MIGRATIONS_TABLE} ("
+        "version INTEGER PRIMARY KEY, name VARCHAR(200) NOT NULL, applied_at TIMESTAMP NOT NULL)"
+    ))
+
+
+def applied_versions(engine):
+    with engine.begin() as conn:
+        _ensure_migrations_table(conn)
+        return {row[0] for row in conn.execute(text(f"SELECT version FROM {MIGRATIONS_TABLE}"))}
+
+
+def pending_migrations(engine):
+    applied = applied_versions(engine)
+    return [m for m in MIGRATIONS if m[0] not in applied]
+
+
+def run_migrations(engine):
+    """
+    Aplica as migrações pendentes, cada uma em sua própria transação.
+    Para na primeira falha (as seguintes podem depender dela). Retorna as versões aplicadas.
+    """
+    applied_now = []
+    for version, name, migration in pending_migrations(engine):
+        logging.info(f"Aplicando migração {version:03d}_{name}...")
+        with engine.begin() as conn:
+            migration(conn)
+            conn.execute(
+                text(f"INSERT INTO {MIGRATIONS_TABLE} (version, name, applied_at) VALUES (:v, :n, :t)"),
+                {"v": version, "n": name, "t": datetime.utcnow()},
+            )
+        applied_now.append(version)
+        logging.info(f"Migração {version:03d}_{name} aplicada.")
+    return applied_now
+
+
+def main(argv=None):
+    from src.database import engine
+
+    argv = sys.argv[1:] if argv is None else argv
+    command = argv[0] if argv else "upgrade"
+    if command == "status":
+        applied = applied_versions(engine)
+        for version, name, _ in MIGRATIONS:
+            print(f"{'[x]' if version in applied else '[ ]'} {version:03d}_{name}")
+        return 0
+    if command == "upgrade":
+        applied = run_migrations(engine)
+        print(f"Migrações aplicadas: {applied}" if applied else "Nenhuma migração pendente.")
+        return 0
+    print(f"Comando desconhecido: {command} (use 'upgrade' ou 'status')")
+    return 2
+
+
+if __name__ == "__main__":
+    sys.exit(main())
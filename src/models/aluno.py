@@ -1,15 +1,21 @@
-from sqlalchemy import Column, Integer, String, Date, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, String, Date, DateTime, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from src.database import Base
+from src import search
 from datetime import datetime
 
 class Aluno(Base):
     __tablename__ = "alunos"
+    # Bancos já existentes recebem este índice pela migração 002 (src/migrations.py)
+    __table_args__ = (
+        Index("ix_alunos_nome_id", "nome", "id"),  # paginação por cursor (nome, id)
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     usuario_id = Column(Integer, ForeignKey('usuarios.id'), nullable=True, unique=True)    
     
     nome = Column(String(100), index=True)
+    nome_busca = Column(String(255), nullable=True)  # nome normalizado (src/search.py)
     data_nascimento = Column(Date)
     cpf = Column(String(14), unique=True, index=True)
     telefone = Column(String(20))
@@ -31,4 +37,10 @@ class Aluno(Base):
     inscricoes = relationship("Inscricao", back_populates="aluno")
     
     # Novo relacionamento
-    usuario = relationship("Usuario", back_populates="aluno")
\ No newline at end of file
+    usuario = relationship("Usuario", back_populates="aluno")
+
+
+search.register(Aluno, "nome")
+
+# Listener que mantém aluno_resumo a cada flush (importado aqui para valer em qualquer ponto de entrada)
+from src import aluno_resumo  # noqa: E402,F401
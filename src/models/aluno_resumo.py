@@ -0,0 +1,30 @@
+# -*- coding: utf-8 -*-
+"""
+Modelo SQLAlchemy da tabela materializada aluno_resumo (mantida por src/aluno_resumo.py).
+"""
+from datetime import date
+
+from sqlalchemy import Column, Integer, Boolean, Float, Date, DateTime, ForeignKey, Index
+from src.database import Base
+
+
+class AlunoResumo(Base):
+    __tablename__ = "aluno_resumo"
+    # Bancos já existentes recebem esta tabela (já preenchida) pela migração 004 (src/migrations.py)
+    __table_args__ = (
+        Index("ix_aluno_resumo_ativo", "ativo"),
+        Index("ix_aluno_resumo_pendente_desde", "pendente_desde"),
+    )
+
+    aluno_id = Column(Integer, ForeignKey("alunos.id", ondelete="CASCADE"), primary_key=True)
+    ativo = Column(Boolean, nullable=False, default=False)
+    matriculas_ativas = Column(Integer, nullable=False, default=0)
+    valor_pendente = Column(Float, nullable=False, default=0.0)
+    # Vencimento mais antigo ainda em aberto: inadimplente quando for anterior a hoje
+    pendente_desde = Column(Date, nullable=True)
+    ultimo_pagamento = Column(Date, nullable=True)
+    atualizado_em = Column(DateTime, nullable=False)
+
+    @property
+    def inadimplente(self) -> bool:
+        return self.pendente_desde is not None and self.pendente_desde < date.today()
@@ -2,12 +2,16 @@
 """
 Modelo SQLAlchemy para a entidade Financeiro.
 """
-from sqlalchemy import Column, Integer, String, Float, DateTime
+from sqlalchemy import Column, Integer, String, Float, DateTime, Index
 from src.database import Base
 from datetime import datetime
 
 class Financeiro(Base):
     __tablename__ = 'financeiro'
+    # Bancos já existentes recebem estes índices pela migração 001 (src/migrations.py)
+    __table_args__ = (
+        Index("ix_financeiro_tipo_data", "tipo", "data"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     tipo = Column(String(20), nullable=False) # 'receita' ou 'despesa'
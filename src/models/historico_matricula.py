@@ -1,12 +1,15 @@
 # Em src/models/historico_matricula.py
 
-from sqlalchemy import Column, Integer, ForeignKey, DateTime, String, Boolean
+from sqlalchemy import Column, Integer, ForeignKey, DateTime, String, Boolean, Index
 from sqlalchemy.orm import relationship
 from src.database import Base
 from datetime import datetime
 
 class HistoricoMatricula(Base):
     __tablename__ = 'historico_matriculas'
+    __table_args__ = (
+        Index("ix_historico_matriculas_matricula_id", "matricula_id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     matricula_id = Column(Integer, ForeignKey('matriculas.id'), nullable=False)
@@ -1,11 +1,15 @@
 # src/models/inscricao.py
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Float
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Float, Index
 from sqlalchemy.orm import relationship
 from src.database import Base
 from datetime import datetime
 
 class Inscricao(Base):
     __tablename__ = 'inscricoes'
+    # Um aluno só pode se inscrever uma vez por evento; o índice também atende "inscrições do evento X"
+    __table_args__ = (
+        Index("uq_inscricoes_evento_aluno", "evento_id", "aluno_id", unique=True),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     aluno_id = Column(Integer, ForeignKey('alunos.id'), nullable=False)
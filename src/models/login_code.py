@@ -0,0 +1,19 @@
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey
+from sqlalchemy.orm import relationship
+from src.database import Base
+from datetime import datetime
+
+class LoginCode(Base):
+    __tablename__ = "login_codes"
+
+    id = Column(Integer, primary_key=True, index=True)
+    usuario_id = Column(Integer, ForeignKey("usuarios.id", ondelete="CASCADE"), nullable=False, index=True)
+
+    # Código de uso único do callback do Google (vai na URL); guardamos apenas o SHA-256
+    code_hash = Column(String(64), unique=True, index=True, nullable=False)
+
+    created_at = Column(DateTime, default=datetime.utcnow)
+    expires_at = Column(DateTime, nullable=False)
+    used_at = Column(DateTime, nullable=True)
+
+    usuario = relationship("Usuario")
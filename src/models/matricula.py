@@ -1,5 +1,5 @@
 # src/models/matricula.py
-from sqlalchemy import Column, Integer, Boolean, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, Boolean, DateTime, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from src.database import Base
@@ -15,6 +15,11 @@ from src.models.plano import Plano
 
 class Matricula(Base):
     __tablename__ = "matriculas"
+    # Bancos já existentes recebem estes índices pela migração 001 (src/migrations.py)
+    __table_args__ = (
+        Index("ix_matriculas_aluno_ativa", "aluno_id", "ativa"),
+        Index("ix_matriculas_turma_id", "turma_id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     aluno_id = Column(Integer, ForeignKey("alunos.id"), nullable=False)
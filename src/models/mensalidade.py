@@ -1,5 +1,5 @@
 # src/models/mensalidade.py
-from sqlalchemy import Column, Integer, String, Date, Float, ForeignKey
+from sqlalchemy import Column, Integer, String, Date, Float, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from src.database import Base
 from datetime import date
@@ -11,6 +11,12 @@ from src.models.matricula import Matricula
 
 class Mensalidade(Base):
     __tablename__ = "mensalidades"
+    # Bancos já existentes recebem estes índices pela migração 001 (src/migrations.py)
+    __table_args__ = (
+        Index("ix_mensalidades_status_vencimento", "status", "data_vencimento"),
+        Index("ix_mensalidades_matricula_vencimento", "matricula_id", "data_vencimento"),
+        Index("ix_mensalidades_aluno_id", "aluno_id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     aluno_id = Column(Integer, ForeignKey("alunos.id"), nullable=False)
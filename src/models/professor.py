@@ -6,12 +6,14 @@ Modelo SQLAlchemy para a entidade Professor.
 from sqlalchemy import Column, Integer, String, Date, Text
 from sqlalchemy.orm import relationship # Importar se houver relacionamentos (ex: com Turmas)
 from src.database import Base # Importa a Base do novo arquivo database.py
+from src import search
 
 class Professor(Base):
     __tablename__ = 'professores'
 
     id = Column(Integer, primary_key=True, index=True)
     nome = Column(String(100), nullable=False)
+    nome_busca = Column(String(255), nullable=True)  # nome normalizado (src/search.py)
     cpf = Column(String(14), unique=True, index=True, nullable=True)
     data_nascimento = Column(Date, nullable=True)
     telefone = Column(String(20), nullable=True)
@@ -28,3 +30,5 @@ class Professor(Base):
 
     # __init__ e to_dict() removidos, Pydantic/SQLAlchemy cuidam disso.
 
+
+search.register(Professor, "nome")
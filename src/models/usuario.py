@@ -1,6 +1,7 @@
 from sqlalchemy import Column, Integer, String
 from sqlalchemy.orm import relationship
 from src.database import Base
+from src import search
 
 class Usuario(Base):
     __tablename__ = "usuarios"
@@ -14,8 +15,12 @@ class Usuario(Base):
     email = Column(String, unique=True, index=True, nullable=False)
     
     nome = Column(String)
+    nome_busca = Column(String, nullable=True)  # nome, username e e-mail normalizados (src/search.py)
     hashed_password = Column(String, nullable=True) 
     role = Column(String, nullable=False, default="pendente")
 
     # 3. Relação revertida para "um-para-um" (aluno, singular)
-    aluno = relationship("Aluno", back_populates="usuario", uselist=False)
\ No newline at end of file
+    aluno = relationship("Aluno", back_populates="usuario", uselist=False)
+
+
+search.register(Usuario, "nome", "username", "email")
@@ -0,0 +1,165 @@
+# -*- coding: utf-8 -*-
+"""
+Pool dedicado para hash/verificação de senhas (bcrypt).
+
+O bcrypt é propositalmente lento (~200-300 ms por operação). Rodá-lo no event loop
+trava o worker inteiro, e rodá-lo no threadpool padrão do anyio disputa as mesmas
+~40 threads usadas pelas rotas síncronas. Aqui ele roda em um executor próprio,
+com concorrência e fila limitadas: um pico de logins no início da aula espera na
+fila (ou recebe 503) em vez de paralisar as outras requisições.
+
+Configuração por variáveis de ambiente:
+- PASSWORD_HASH_WORKERS: threads do pool (padrão: min(4, CPUs)).
+- PASSWORD_HASH_MAX_QUEUE: operações pendentes aceitas antes de responder 503 (padrão: 64).
+- PASSWORD_HASH_TARGET_MS: tempo alvo de um hash para a calibração automática (padrão: 250).
+- BCRYPT_ROUNDS: fixa o custo e desliga a calibração (nunca abaixo de 12).
+"""
+import asyncio
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from fastapi import HTTPException, status
+from passlib.context import CryptContext
+
+PASSWORD_HASH_WORKERS = int(os.environ.get("PASSWORD_HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+PASSWORD_HASH_MAX_QUEUE = int(os.environ.get("PASSWORD_HASH_MAX_QUEUE", "64"))
+PASSWORD_HASH_TARGET_MS = float(os.environ.get("PASSWORD_HASH_TARGET_MS", "250"))
+
+# Limites da calibração: nunca abaixo de 12 (o padrão do passlib usado até aqui,
+# para não enfraquecer os hashes novos numa máquina lenta) nem acima de 14
+MIN_BCRYPT_ROUNDS = 12
+MAX_BCRYPT_ROUNDS = 14
+
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+_executor = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="bcrypt")
+_calibration_lock = threading.Lock()
+_calibrated = False
+
+_metrics_lock = threading.Lock()
+_metrics = {
+    "workers": PASSWORD_HASH_WORKERS,
+    "max_queue": PASSWORD_HASH_MAX_QUEUE,
+    "bcrypt_rounds": None,
+    "pending": 0,
+    "running": 0,
+    "submitted_total": 0,
+    "completed_total": 0,
+    "rejected_total": 0,
+    "rehashed_total": 0,
+    "wait_seconds_total": 0.0,
+    "run_seconds_total": 0.0,
+}
+
+
+def _calibrate_rounds() -> int:
+    """Escolhe o maior custo cujo hash fica dentro do tempo alvo nesta máquina."""
+    env_rounds = os.environ.get("BCRYPT_ROUNDS")
+    if env_rounds:
+        return max(MIN_BCRYPT_ROUNDS, int(env_rounds))
+
+    rounds = MIN_BCRYPT_ROUNDS
+    probe = CryptContext(schemes=["bcrypt"])
+    while rounds < MAX_BCRYPT_ROUNDS:
+        start = time.perf_counter()
+        probe.hash("calibracao", rounds=rounds)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        # Cada round a mais dobra o custo
+        if elapsed_ms * 2 > PASSWORD_HASH_TARGET_MS:
+            break
+        rounds += 1
+    return rounds
+
+
+def _ensure_calibrated():
+    global _calibrated
+    if _calibrated:
+        return
+    with _calibration_lock:
+        if _calibrated:
+            return
+        rounds = _calibrate_rounds()
+        # min_rounds faz o verify_and_update marcar hashes mais fracos para rehash
+        pwd_context.update(bcrypt__default_rounds=rounds, bcrypt__min_rounds=rounds)
+        with _metrics_lock:
+            _metrics["bcrypt_rounds"] = rounds
+        logging.info(f"Custo do bcrypt calibrado em {rounds} rounds.")
+        _calibrated = True
+
+
+def _run(fn, *args):
+    """Executa no worker, contabilizando tempo de fila e de execução."""
+    def task(submitted_at):
+        started_at = time.perf_counter()
+        with _metrics_lock:
+            _metrics["running"] += 1
+            _metrics["wait_seconds_total"] += started_at - submitted_at
+        try:
+            _ensure_calibrated()
+            return fn(*args)
+        finally:
+            finished_at = time.perf_counter()
+            with _metrics_lock:
+                _metrics["running"] -= 1
+                _metrics["pending"] -= 1
+                _metrics["completed_total"] += 1
+                _metrics["run_seconds_total"] += finished_at - started_at
+
+    with _metrics_lock:
+        if _metrics["pending"] >= PASSWORD_HASH_MAX_QUEUE:
+            _metrics["rejected_total"] += 1
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Servidor ocupado processando logins. Tente novamente em instantes.",
+                headers={"Retry-After": "2"},
+            )
+        _metrics["pending"] += 1
+        _metrics["submitted_total"] += 1
+    return _executor.submit(task, time.perf_counter())
+
+
+# --- API SÍNCRONA (scripts: seed, manage.py) ---
+# Prende a thread de quem chama até o pool terminar; em rotas, use a API assíncrona.
+
+def hash_password(password: str) -> str:
+    return _run(pwd_context.hash, password).result()
+
+
+def verify_password(plain_password: str, hashed_password: str) -> bool:
+    return _run(pwd_context.verify, plain_password, hashed_password).result()
+
+
+# --- API ASSÍNCRONA (rotas `async def`) ---
+
+async def hash_password_async(password: str) -> str:
+    return await asyncio.wrap_future(_run(pwd_context.hash, password))
+
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    return await asyncio.wrap_future(_run(pwd_context.verify, plain_password, hashed_password))
+
+
+async def verify_and_update_async(plain_password: str, hashed_password: str):
+    """
+    Verifica a senha e, se o hash estiver com custo abaixo do calibrado,
+    devolve um novo hash para ser gravado (rehash transparente no login).
+    Retorna (senha_ok, novo_hash_ou_None).
+    """
+    valid, new_hash = await asyncio.wrap_future(
+        _run(pwd_context.verify_and_update, plain_password, hashed_password)
+    )
+    if valid and new_hash:
+        with _metrics_lock:
+            _metrics["rehashed_total"] += 1
+    return valid, new_hash
+
+
+def get_metrics() -> dict:
+    """Snapshot dos contadores do pool (fila, execução, rejeições, tempos)."""
+    with _metrics_lock:
+        snapshot = dict(_metrics)
+    snapshot["queued"] = snapshot["pending"] - snapshot["running"]
+    return snapshot
@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+"""
+Decide quando uma leitura pode ir para a réplica (DATABASE_READ_URL).
+
+A réplica fica alguns instantes atrás do primário. Quem acabou de gravar
+(ex.: POST /mensalidades/processar_pagamento) e em seguida recarrega a lista
+precisa ver a própria escrita, então, por READ_YOUR_WRITES_SECONDS após uma
+escrita bem-sucedida, as leituras desse cliente vão para o primário:
+
+- o middleware marca o cliente (hash do header Authorization) em um cache local
+  do processo e devolve o cookie `rw_primary`, que cobre os demais workers
+  quando o cliente é um navegador;
+- o cliente também pode pedir explicitamente com o header `X-Read-Primary: 1`.
+"""
+import hashlib
+import os
+import threading
+
+from cachetools import TTLCache
+
+READ_YOUR_WRITES_SECONDS = float(os.environ.get("READ_YOUR_WRITES_SECONDS", "5"))
+READ_PRIMARY_COOKIE = "rw_primary"
+READ_PRIMARY_HEADER = "x-read-primary"
+
+_SAFE_METHODS = {"GET", "HEAD", "OPTIONS"}
+
+_recent_writers = TTLCache(maxsize=10000, ttl=READ_YOUR_WRITES_SECONDS)
+_recent_writers_lock = threading.Lock()
+
+
+def _client_key(authorization):
+    if not authorization:
+        return None
+    return hashlib.sha256(authorization.encode("utf-8")).hexdigest()
+
+
+def prefers_primary(request) -> bool:
+    """True se a leitura desta requisição deve ir para o primário (read-your-writes)."""
+    if request.headers.get(READ_PRIMARY_HEADER) == "1" or request.cookies.get(READ_PRIMARY_COOKIE):
+        return True
+    key = _client_key(request.headers.get("authorization"))
+    if key is None:
+        return False
+    with _recent_writers_lock:
+        return key in _recent_writers
+
+
+class ReadYourWritesMiddleware:
+    """Middleware ASGI: após uma escrita bem-sucedida, fixa as leituras do cliente no primário por alguns segundos."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] in _SAFE_METHODS or READ_YOUR_WRITES_SECONDS <= 0:
+            await self.app(scope, receive, send)
+            return
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start" and message["status"] < 400:
+                headers = dict(scope.get("headers") or [])
+                key = _client_key(headers.get(b"authorization", b"").decode("latin-1"))
+                if key is not None:
+                    with _recent_writers_lock:
+                        _recent_writers[key] = True
+                cookie = (
+                    f"{READ_PRIMARY_COOKIE}=1; Max-Age={int(max(1, READ_YOUR_WRITES_SECONDS))}; "
+                    "Path=/; HttpOnly; SameSite=Lax"
+                )
+                message["headers"] = list(message.get("headers", [])) + [(b"set-cookie", cookie.encode("latin-1"))]
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
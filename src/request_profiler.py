@@ -0,0 +1,297 @@
+# -*- coding: utf-8 -*-
+"""
+Profiler sob demanda, por requisição, para administradores.
+
+Um administrador envia `X-Profile: 1` (ou `?_profile=1`) e só aquela requisição
+é amostrada: uma thread lê `sys._current_frames()` a cada
+PROFILE_SAMPLE_INTERVAL_MS (padrão 5 ms) e guarda as pilhas que pertencem à
+requisição. No event loop, são as que passam por este middleware; no
+threadpool, as das threads que estão rodando trabalho despachado pela própria
+requisição (rota/dependências `def`, run_in_threadpool). Para saber quais são,
+anyio.to_thread.run_sync é envolvido enquanto houver requisição perfilada em
+andamento e marca a thread enquanto ela trabalha para a requisição;
+requisições concorrentes para a mesma rota não entram no perfil.
+
+O resultado vai para PROFILE_DIR no formato "collapsed stacks" (uma pilha por
+linha + contagem), aceito por flamegraph.pl e speedscope, com um .json de
+metadados ao lado. Só os PROFILE_MAX_FILES perfis mais recentes são mantidos.
+A resposta traz `X-Profile-Id`; a lista fica em GET /api/v1/_internal/profiles.
+
+Requisições sem o header/parâmetro pagam apenas a checagem do header.
+"""
+import contextvars
+import functools
+import json
+import logging
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+
+import anyio.to_thread
+from fastapi import HTTPException
+
+PROFILE_DIR = Path(os.environ.get("PROFILE_DIR", "./profiles"))
+PROFILE_MAX_FILES = int(os.environ.get("PROFILE_MAX_FILES", "50"))
+PROFILE_SAMPLE_INTERVAL_MS = float(os.environ.get("PROFILE_SAMPLE_INTERVAL_MS", "5"))
+
+PROFILE_HEADER = b"x-profile"
+PROFILE_QUERY_RE = re.compile(rb"(?:^|&)_profile=1(?:&|$)")
+PROFILE_ID_RE = re.compile(r"^[\w.-]+$")
+
+logger = logging.getLogger("academia.profiler")
+
+_LIBRARY_PREFIX_RE = re.compile(r".*[/\\](?:(?:site|dist)-packages|lib[/\\]python3\.\d+)[/\\]")
+_CWD = os.getcwd() + os.sep
+
+
+def frame_label(code) -> str:
+    """'funcao (src/routes/alunos_fastapi.py:120)' — rótulo de um frame no flamegraph."""
+    filename = code.co_filename
+    if filename.startswith(_CWD):
+        filename = filename[len(_CWD):]
+    else:
+        filename = _LIBRARY_PREFIX_RE.sub("", filename)
+    return f"{code.co_name} ({filename}:{code.co_firstlineno})"
+
+
+def collapse_stack(frame, stop=None) -> list:
+    """Códigos da pilha, da raiz até `frame`. Com `stop`, começa no frame mais próximo da raiz que satisfaz stop(frame)."""
+    codes = []
+    while frame is not None:
+        codes.append(frame.f_code)
+        if stop is not None and stop(frame):
+            return codes[::-1]
+        frame = frame.f_back
+    return None if stop is not None else codes[::-1]
+
+
+# Sampler da requisição perfilada no contexto atual (o anyio copia o contexto para as threads do pool)
+_active_sampler = contextvars.ContextVar("request_profiler_sampler", default=None)
+_install_lock = threading.Lock()
+_tagging_users = 0
+_original_run_sync = None
+_tagging_run_sync = None
+
+
+def _install_thread_tagging():
+    """
+    Envolve anyio.to_thread.run_sync (usado por run_in_threadpool e pelas rotas e
+    dependências `def`) para registrar qual thread trabalha para a requisição
+    perfilada. O wrapper só fica instalado enquanto houver requisição perfilada em
+    andamento (ver _uninstall_thread_tagging); no resto do tempo o despacho para o
+    threadpool é o original do anyio.
+    """
+    global _tagging_users, _original_run_sync, _tagging_run_sync
+    with _install_lock:
+        _tagging_users += 1
+        if _tagging_users > 1:
+            return
+        original = _original_run_sync = anyio.to_thread.run_sync
+
+        async def run_sync(func, *args, **kwargs):
+            sampler = _active_sampler.get()
+            if sampler is not None:
+                func = functools.partial(sampler.run_tagged, func)
+            return await original(func, *args, **kwargs)
+
+        anyio.to_thread.run_sync = _tagging_run_sync = run_sync
+
+
+def _uninstall_thread_tagging():
+    """Devolve o anyio.to_thread.run_sync original quando a última requisição perfilada termina."""
+    global _tagging_users, _original_run_sync, _tagging_run_sync
+    with _install_lock:
+        _tagging_users -= 1
+        if _tagging_users > 0:
+            return
+        # Se alguém envolveu a função depois de nós, não desfaz o wrapper dele
+        if anyio.to_thread.run_sync is _tagging_run_sync:
+            anyio.to_thread.run_sync = _original_run_sync
+        _original_run_sync = _tagging_run_sync = None
+
+
+class RequestSampler:
+    """Amostra as pilhas de uma requisição em uma thread separada."""
+
+    def __init__(self, marker_frame, loop_thread_id):
+        self.marker_frame = marker_frame
+        self.loop_thread_id = loop_thread_id
+        self.interval = PROFILE_SAMPLE_INTERVAL_MS / 1000
+        self.stacks = Counter()
+        self.samples = 0
+        # Threads do pool trabalhando para esta requisição agora -> chamadas em andamento
+        self._threads = {}
+        self._threads_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def run_tagged(self, func, *args):
+        """Roda na thread do pool: marca a thread como desta requisição enquanto `func` executa."""
+        thread_id = threading.get_ident()
+        with self._threads_lock:
+            self._threads[thread_id] = self._threads.get(thread_id, 0) + 1
+        try:
+            return func(*args)
+        finally:
+            with self._threads_lock:
+                if self._threads[thread_id] == 1:
+                    del self._threads[thread_id]
+                else:
+                    self._threads[thread_id] -= 1
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            with self._threads_lock:
+                worker_ids = set(self._threads)
+            frames = sys._current_frames()
+            loop_frame = frames.get(self.loop_thread_id)
+            if loop_frame is not None:
+                codes = collapse_stack(loop_frame, stop=lambda f: f is self.marker_frame)
+                if codes:
+                    self.stacks[("event-loop",) + tuple(codes)] += 1
+            for thread_id in worker_ids:
+                frame = frames.get(thread_id)
+                if frame is None:
+                    continue
+                # A pilha começa logo abaixo do run_tagged (o que a requisição despachou)
+                codes = collapse_stack(frame, stop=lambda f: f.f_code is _RUN_TAGGED_CODE)
+                if codes and len(codes) > 1:
+                    self.stacks[("threadpool",) + tuple(codes[1:])] += 1
+            self.samples += 1
+
+    def collapsed(self) -> str:
+        lines = []
+        for stack, count in self.stacks.most_common():
+            labels = [stack[0]] + [frame_label(code) for code in stack[1:]]
+            lines.append(";".join(label.replace(";", ":") for label in labels) + f" {count}")
+        return "\n".join(lines) + "\n"
+
+
+_RUN_TAGGED_CODE = RequestSampler.run_tagged.__code__
+
+
+def _save_profile(sampler, metadata):
+    PROFILE_DIR.mkdir(parents=True, exist_ok=True)
+    (PROFILE_DIR / f"{metadata['id']}.folded").write_text(sampler.collapsed(), encoding="utf-8")
+    (PROFILE_DIR / f"{metadata['id']}.json").write_text(json.dumps(metadata, ensure_ascii=False), encoding="utf-8")
+
+    # Buffer circular: remove os perfis mais antigos além de PROFILE_MAX_FILES
+    profiles = sorted(PROFILE_DIR.glob("*.json"))
+    for old in profiles[:max(0, len(profiles) - PROFILE_MAX_FILES)]:
+        old.unlink(missing_ok=True)
+        old.with_suffix(".folded").unlink(missing_ok=True)
+
+
+def list_profiles() -> list:
+    """Metadados dos perfis salvos, do mais recente para o mais antigo."""
+    if not PROFILE_DIR.is_dir():
+        return []
+    profiles = []
+    for path in sorted(PROFILE_DIR.glob("*.json"), reverse=True):
+        try:
+            profiles.append(json.loads(path.read_text(encoding="utf-8")))
+        except (OSError, ValueError):
+            continue
+    return profiles
+
+
+def profile_path(profile_id: str):
+    """Caminho do arquivo .folded de um perfil (None se o id for inválido ou não existir)."""
+    if not PROFILE_ID_RE.match(profile_id):
+        return None
+    path = PROFILE_DIR / f"{profile_id}.folded"
+    return path if path.is_file() else None
+
+
+def _wants_profile(scope) -> bool:
+    for name, value in scope.get("headers") or ():
+        if name == PROFILE_HEADER:
+            return value == b"1"
+    return bool(PROFILE_QUERY_RE.search(scope.get("query_string", b"")))
+
+
+async def _admin_from_scope(scope):
+    """O administrador autenticado pelo header Authorization (mesma regra de auth.get_admin_user), ou None."""
+    from src import auth
+
+    authorization = dict(scope.get("headers") or ()).get(b"authorization", b"").decode("latin-1")
+    scheme, _, token = authorization.partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return None
+    try:
+        user = await auth.get_current_user(token)
+        return await auth.get_admin_user(await auth.get_current_active_user(user))
+    except HTTPException:
+        return None
+
+
+class RequestProfilerMiddleware:
+    """Middleware ASGI: perfila a requisição quando um administrador pede com X-Profile: 1 ou ?_profile=1."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not _wants_profile(scope):
+            await self.app(scope, receive, send)
+            return
+
+        admin = await _admin_from_scope(scope)
+        if admin is None:
+            await self.app(scope, receive, send)
+            return
+
+        started_at = datetime.utcnow()
+        profile_id = (
+            f"{started_at:%Y%m%dT%H%M%S%f}-{scope['method']}-"
+            + re.sub(r"[^\w-]+", "_", scope["path"]).strip("_")[:80]
+        )
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                message["headers"] = list(message.get("headers", [])) + [(b"x-profile-id", profile_id.encode("latin-1"))]
+            await send(message)
+
+        _install_thread_tagging()
+        sampler = RequestSampler(sys._getframe(), threading.get_ident())
+        start = time.perf_counter()
+        sampler.start()
+        token = _active_sampler.set(sampler)
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _active_sampler.reset(token)
+            sampler.stop()
+            _uninstall_thread_tagging()
+            metadata = {
+                "id": profile_id,
+                "created_at": started_at.isoformat() + "Z",
+                "method": scope["method"],
+                "path": scope["path"],
+                "route": getattr(scope.get("route"), "path", None),
+                "status": status_code,
+                "duration_ms": round((time.perf_counter() - start) * 1000, 2),
+                "samples": sampler.samples,
+                "interval_ms": PROFILE_SAMPLE_INTERVAL_MS,
+                "user": admin.username,
+            }
+            try:
+                await anyio.to_thread.run_sync(_save_profile, sampler, metadata)
+                logger.info(f"Perfil salvo: {profile_id} ({metadata['duration_ms']}ms, {sampler.samples} amostras)")
+            except OSError as e:
+                logger.error(f"Não foi possível salvar o perfil {profile_id}: {e}")
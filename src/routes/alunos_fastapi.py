@@ -6,27 +6,31 @@ import os
 import shutil
 from typing import List, Optional
 from pathlib import Path
-from datetime import datetime
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Form
+from datetime import date, datetime
+from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Form, Query
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session, joinedload
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.exc import IntegrityError
 import logging
+import base64
+import json
+import threading
+from cachetools import TTLCache
 
 
 # Imports para o Armazenamento Externo
-import boto3
-from botocore.client import Config
 
-from src.database import get_db
+from src.database import get_db, get_read_db, get_async_read_db
 from src.models.aluno import Aluno
+from src.models.aluno_resumo import AlunoResumo
 from src.schemas.aluno import AlunoCreate, AlunoRead, AlunoUpdate, AlunoPaginated
 from src.models.matricula import Matricula
 from src.models.historico_matricula import HistoricoMatricula
-from sqlalchemy import func
+from sqlalchemy import func, select, tuple_
 from src.models.mensalidade import Mensalidade
-from src.image_utils import process_avatar_image
 from src.models import usuario as models_usuario
-from src import auth
+from src import auth, password_hashing, search, storage
 import re
 
 
@@ -35,9 +39,66 @@ router = APIRouter(
     responses={404: {"description": "Aluno não encontrado"}},
 )
 
+# Totais da listagem (include_total=true) por combinação de filtros
+ALUNOS_TOTAL_CACHE_SECONDS = int(os.environ.get("ALUNOS_TOTAL_CACHE_SECONDS", "30"))
+_total_cache = TTLCache(maxsize=256, ttl=ALUNOS_TOTAL_CACHE_SECONDS)
+_total_cache_lock = threading.Lock()
+
+
+def _check_usuario_disponivel(db: Session, username: str, email: Optional[str]):
+    # Verifica se o USERNAME já existe
+    db_user_check = db.query(models_usuario.Usuario).filter(models_usuario.Usuario.username == username).first()
+    if db_user_check:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Este Nome de Usuário já está em uso."
+        )
+    
+    # Verifica se o E-MAIL já existe (na tabela de usuários)
+    if email:
+        db_email_check = db.query(models_usuario.Usuario).filter(models_usuario.Usuario.email == email).first()
+        if db_email_check:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Este Email de usuário já está em uso."
+            )
+
+
+def _insert_aluno(db: Session, aluno_data: AlunoCreate, username: str, hashed_password: str):
+    # Cria o novo usuário
+    db_user = models_usuario.Usuario(
+        username=username,
+        email=aluno_data.email,
+        nome=aluno_data.nome,
+        hashed_password=hashed_password,
+        role="aluno"
+    )
+    db.add(db_user)
+
+    db_aluno = Aluno(**aluno_data.dict(exclude_unset=True))
+    db_aluno.usuario = db_user # Vincula o aluno ao usuário criado
+    
+    db.add(db_aluno)
+    
+    try:
+        db.commit()
+    except IntegrityError as e:
+        db.rollback()
+        logging.error(f"Erro de integridade ao salvar aluno: {e}")
+        if "cpf" in str(e).lower() and "alunos_cpf_key" in str(e).lower():
+             raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Este CPF de aluno já está cadastrado.")
+        if "email" in str(e).lower() and "alunos_email_key" in str(e).lower():
+             raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Este Email de aluno já está cadastrado.")
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Erro interno ao salvar dados.")
+
+    invalidate_total_cache()
+    db.refresh(db_aluno)
+    db.refresh(db_user)
+    return db_aluno
+
 
 @router.post("", response_model=AlunoRead, status_code=status.HTTP_201_CREATED)
-def create_aluno(
+async def create_aluno(
     # --- CAMPO 'password' FOI REMOVIDO ---
     username: str = Form(...),
     nome: str = Form(...),
@@ -60,6 +121,8 @@ def create_aluno(
     O Username é definido pelo admin.
     A Senha Padrão é o CPF do aluno (apenas números).
     """
+    # Foto inválida/grande demais é recusada antes de criar qualquer registro
+    foto_bytes = await run_in_threadpool(storage.read_photo, foto)
     
     # --- LÓGICA DE CRIAÇÃO DE USUÁRIO ATUALIZADA ---
     
@@ -73,39 +136,12 @@ def create_aluno(
     if len(senha_padrao) < 6: # Define um mínimo para a senha
          raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="CPF inválido. Deve conter pelo menos 6 números.")
 
-    db_user = None
-    if username:
-        # Verifica se o USERNAME já existe
-        db_user_check = db.query(models_usuario.Usuario).filter(models_usuario.Usuario.username == username).first()
-        if db_user_check:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Este Nome de Usuário já está em uso."
-            )
-        
-        # Verifica se o E-MAIL já existe (na tabela de usuários)
-        if email:
-            db_email_check = db.query(models_usuario.Usuario).filter(models_usuario.Usuario.email == email).first()
-            if db_email_check:
-                raise HTTPException(
-                    status_code=status.HTTP_400_BAD_REQUEST,
-                    detail="Este Email de usuário já está em uso."
-                )
-
-        # Hash da senha (que é o CPF)
-        hashed_password = auth.get_password_hash(senha_padrao) # <--- USA O CPF
-        
-        # Cria o novo usuário
-        db_user = models_usuario.Usuario(
-            username=username,
-            email=email,
-            nome=nome,
-            hashed_password=hashed_password,
-            role="aluno"
-        )
-        db.add(db_user)
-    else:
+    if not username:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Nome de Usuário é obrigatório.")
+
+    # Consultas no threadpool; o bcrypt no pool dedicado, sem prender uma thread esperando por ele
+    await run_in_threadpool(_check_usuario_disponivel, db, username, email)
+    hashed_password = await password_hashing.hash_password_async(senha_padrao) # <--- USA O CPF
     # --- FIM DA LÓGICA DE USUÁRIO ---
 
     # Processa a data de nascimento
@@ -125,49 +161,11 @@ def create_aluno(
         email_responsavel=email_responsavel
     )
 
-    db_aluno = Aluno(**aluno_data.dict(exclude_unset=True))
-    db_aluno.usuario = db_user # Vincula o aluno ao usuário criado
-    
-    db.add(db_aluno)
-    
-    try:
-        db.commit()
-    except IntegrityError as e:
-        db.rollback()
-        logging.error(f"Erro de integridade ao salvar aluno: {e}")
-        if "cpf" in str(e).lower() and "alunos_cpf_key" in str(e).lower():
-             raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Este CPF de aluno já está cadastrado.")
-        if "email" in str(e).lower() and "alunos_email_key" in str(e).lower():
-             raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Este Email de aluno já está cadastrado.")
-        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Erro interno ao salvar dados.")
+    db_aluno = await run_in_threadpool(_insert_aluno, db, aluno_data, username, hashed_password)
 
-    db.refresh(db_aluno)
-    if db_user:
-        db.refresh(db_user)
-
-    # Lógica de Upload de Foto (permanece a mesma)
-    if foto and foto.filename:
-        # ... (seu código de upload de foto existente) ...
-        processed_image, mime_type = process_avatar_image(foto.file)
-        if processed_image:
-            # ... (código s3_client) ...
-            s3_endpoint_url = os.getenv("S3_ENDPOINT_URL")
-            s3_access_key_id = os.getenv("AWS_ACCESS_KEY_ID")
-            s3_secret_access_key = os.getenv("AWS_SECRET_ACCESS_KEY")
-            s3_bucket_name = os.getenv("S3_BUCKET_NAME")
-            public_bucket_url = os.getenv("PUBLIC_BUCKET_URL")
-            if not all([s3_endpoint_url, s3_access_key_id, s3_secret_access_key, s3_bucket_name, public_bucket_url]):
-                raise HTTPException(status_code=500, detail="Configuração de armazenamento na nuvem incompleta.")
-            try:
-                s3_client = boto3.client('s3', endpoint_url=s3_endpoint_url, aws_access_key_id=s3_access_key_id, aws_secret_access_key=s3_secret_access_key, region_name="auto")
-                base_filename, _ = os.path.splitext(foto.filename)
-                safe_filename = f"aluno_{db_aluno.id}_{datetime.utcnow().timestamp()}_{base_filename.replace(' ', '_')}.jpg"
-                s3_client.upload_fileobj(processed_image, s3_bucket_name, safe_filename, ExtraArgs={'ContentType': mime_type})
-                db_aluno.foto = f"{public_bucket_url.rstrip('/')}/{safe_filename}"
-                db.commit() 
-                db.refresh(db_aluno)
-            except Exception as e: 
-                logging.error(f"Erro no upload para o R2 (aluno): {e}")
+    if foto_bytes:
+        # Processamento e upload rodam em segundo plano (src/storage.py); `foto` é gravada quando terminarem
+        await run_in_threadpool(storage.enqueue_photo, Aluno, db_aluno.id, foto_bytes, foto.filename, "aluno")
 
     return db_aluno
 
@@ -214,91 +212,118 @@ def update_aluno(
         except (ValueError, TypeError):
             pass
 
-    if foto and foto.filename:
-        # Processa a imagem antes do upload
-        processed_image, mime_type = process_avatar_image(foto.file)
-        
-        if processed_image:
-            # Pega as credenciais do ambiente
-            s3_endpoint_url = os.getenv("S3_ENDPOINT_URL")
-            s3_access_key_id = os.getenv("AWS_ACCESS_KEY_ID")
-            s3_secret_access_key = os.getenv("AWS_SECRET_ACCESS_KEY")
-            s3_bucket_name = os.getenv("S3_BUCKET_NAME")
-            public_bucket_url = os.getenv("PUBLIC_BUCKET_URL")
-
-            if not all([s3_endpoint_url, s3_access_key_id, s3_secret_access_key, s3_bucket_name, public_bucket_url]):
-                raise HTTPException(status_code=500, detail="Configuração de armazenamento na nuvem incompleta.")
-
-            try:
-                s3_client = boto3.client('s3', endpoint_url=s3_endpoint_url, aws_access_key_id=s3_access_key_id, aws_secret_access_key=s3_secret_access_key, region_name="auto")
-                
-                # Garante um nome de arquivo .jpg, já que convertemos para JPEG
-                base_filename, _ = os.path.splitext(foto.filename)
-                safe_filename = f"aluno_{db_aluno.id}_{datetime.utcnow().timestamp()}_{base_filename.replace(' ', '_')}.jpg"
-
-                # Faz o upload do arquivo processado (em memória)
-                s3_client.upload_fileobj(processed_image, s3_bucket_name, safe_filename, ExtraArgs={'ContentType': mime_type})
-                
-                db_aluno.foto = f"{public_bucket_url.rstrip('/')}/{safe_filename}"
-                db.commit()
-                db.refresh(db_aluno)
-            except Exception as e:
-                logging.error(f"Erro no upload para o R2 (aluno): {e}")
-                # Não lança exceção para não quebrar o cadastro do aluno
-                logging.error(f"Erro no upload para o R2 (aluno): {e}")
+    # Validada já (tamanho, formato, pixels); o processamento fica para a fila
+    foto_bytes = storage.read_photo(foto)
 
     db.commit()
     db.refresh(db_aluno)
+
+    if foto_bytes:
+        # Processamento e upload rodam em segundo plano (src/storage.py); `foto` é gravada quando terminarem
+        storage.enqueue_photo(Aluno, db_aluno.id, foto_bytes, foto.filename, "aluno")
     return db_aluno
     
 # --- SUAS OUTRAS ROTAS DE ALUNO (read_alunos, read_aluno, etc.) PERMANECEM AQUI SEM ALTERAÇÃO ---
 # ... (deixe o resto das funções como estão)
 @router.get("", response_model=AlunoPaginated)
-def read_alunos(
-    skip: int = 0,
-    limit: int = 20,
+async def read_alunos(
+    skip: int = Query(0, ge=0),
+    # O painel pede até 2000 de uma vez (listas de seleção)
+    limit: int = Query(20, ge=1, le=5000),
     nome: Optional[str] = None,
     cpf: Optional[str] = None,
-    status: Optional[str] = None, # NOVO PARÂMETRO DE FILTRO
-    db: Session = Depends(get_db)
+    status: Optional[str] = Query(None, description="ativo, inativo ou inadimplente"),
+    cursor: Optional[str] = Query(None, description="next_cursor da página anterior (substitui o skip)"),
+    include_total: bool = Query(False, description="Inclui o total (contagem cacheada por alguns segundos)"),
+    db: AsyncSession = Depends(get_async_read_db)
 ):
     """
     Lista alunos com filtros (incluindo status) e paginação.
+
+    Status e inadimplência vêm de aluno_resumo (uma linha por aluno, mantida a
+    cada escrita em matrículas/mensalidades), então o filtro usa o índice da
+    tabela em vez de subconsultas em matriculas.
+
+    Paginação por cursor: envie o `next_cursor` da resposta em `cursor` para a
+    próxima página (custo constante, em qualquer profundidade). O `skip` continua
+    aceito para quem pagina por número de página. O `total` só vem com
+    `include_total=true`.
     """
-    query = db.query(Aluno).options(joinedload(Aluno.matriculas))
+    # Outer join 1:1 (aluno sem linha no resumo = inativo, em dia)
+    query = select(Aluno, AlunoResumo).outerjoin(AlunoResumo, AlunoResumo.aluno_id == Aluno.id)
     
     if nome:
-        query = query.filter(Aluno.nome.ilike(f"%{nome}%"))
+        query = query.where(search.matches(Aluno, nome))
     if cpf:
-        query = query.filter(Aluno.cpf == cpf)
+        query = query.where(Aluno.cpf == cpf)
     
-    # --- NOVA LÓGICA DE FILTRO POR STATUS ---
-    if status:
-        # Subconsulta para encontrar todos os IDs de alunos que têm pelo menos uma matrícula ativa.
-        subquery_alunos_ativos = db.query(Matricula.aluno_id).filter(Matricula.ativa == True).distinct()
-        
-        if status == 'ativo':
-            query = query.filter(Aluno.id.in_(subquery_alunos_ativos))
-        elif status == 'inativo':
-            query = query.filter(Aluno.id.notin_(subquery_alunos_ativos))
-    # --- FIM DA LÓGICA ---
-
-    total = query.count()
-    alunos_paginados = query.order_by(Aluno.nome).offset(skip).limit(limit).all()
+    if status == 'ativo':
+        query = query.where(AlunoResumo.ativo == True)
+    elif status == 'inativo':
+        query = query.where(func.coalesce(AlunoResumo.ativo, False) == False)
+    elif status == 'inadimplente':
+        query = query.where(AlunoResumo.pendente_desde < date.today())
+
+    total = None
+    if include_total:
+        total = await _count_alunos(db, query, (nome, cpf, status))
+
+    page_query = query.order_by(Aluno.nome, Aluno.id)
+    if cursor:
+        ultimo_nome, ultimo_id = _decode_cursor(cursor)
+        page_query = page_query.where(tuple_(Aluno.nome, Aluno.id) > tuple_(ultimo_nome, ultimo_id))
+    elif skip:
+        page_query = page_query.offset(skip)
+    # Uma linha a mais só para saber se existe próxima página
+    linhas = (await db.execute(page_query.limit(limit + 1))).all()
+    next_cursor = None
+    if len(linhas) > limit:
+        linhas = linhas[:limit]
+        next_cursor = _encode_cursor(linhas[-1][0])
 
     response_alunos = []
-    for aluno in alunos_paginados:
+    for aluno, resumo in linhas:
         aluno_read = AlunoRead.from_orm(aluno)
-        if any(matricula.ativa for matricula in aluno.matriculas):
-            aluno_read.status_geral = "Ativo"
-        else:
-            aluno_read.status_geral = "Inativo"
+        aluno_read.status_geral = "Ativo" if resumo is not None and resumo.ativo else "Inativo"
+        aluno_read.inadimplente = resumo is not None and resumo.inadimplente
         response_alunos.append(aluno_read)
         
-    return {"total": total, "alunos": response_alunos}
+    return {"total": total, "alunos": response_alunos, "next_cursor": next_cursor}
+
+
+def _encode_cursor(aluno) -> str:
+    raw = json.dumps([aluno.nome, aluno.id], ensure_ascii=False).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def _decode_cursor(cursor: str):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        nome, aluno_id = json.loads(raw)
+        if not isinstance(nome, str) or not isinstance(aluno_id, int):
+            raise ValueError
+        return nome, aluno_id
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Cursor inválido.")
+
+
+async def _count_alunos(db: AsyncSession, query, filtros) -> int:
+    """Contagem com cache curto por filtro: repetir a varredura completa a cada página não compensa."""
+    with _total_cache_lock:
+        total = _total_cache.get(filtros)
+    if total is None:
+        total = await db.scalar(select(func.count()).select_from(query.subquery()))
+        with _total_cache_lock:
+            _total_cache[filtros] = total
+    return total
+
+
+def invalidate_total_cache():
+    with _total_cache_lock:
+        _total_cache.clear()
 
 @router.get("/{aluno_id}", response_model=AlunoRead)
-def read_aluno(aluno_id: int, db: Session = Depends(get_db)):
+def read_aluno(aluno_id: int, db: Session = Depends(get_read_db)):
     """
     Obtém os detalhes de um aluno específico pelo ID.
     """
@@ -323,39 +348,18 @@ def delete_aluno(aluno_id: int, db: Session = Depends(get_db)):
             detail="Aluno não encontrado"
         )
 
-    # --- NOVA LÓGICA PARA DELETAR FOTO DO S3 (R2) ---
     if db_aluno.foto:
-        try:
-            # Pega as credenciais do ambiente
-            s3_endpoint_url = os.getenv("S3_ENDPOINT_URL")
-            s3_access_key_id = os.getenv("AWS_ACCESS_KEY_ID")
-            s3_secret_access_key = os.getenv("AWS_SECRET_ACCESS_KEY")
-            s3_bucket_name = os.getenv("S3_BUCKET_NAME")
-
-            if all([s3_endpoint_url, s3_access_key_id, s3_secret_access_key, s3_bucket_name]):
-                s3_client = boto3.client('s3', 
-                                         endpoint_url=s3_endpoint_url, 
-                                         aws_access_key_id=s3_access_key_id, 
-                                         aws_secret_access_key=s3_secret_access_key, 
-                                         region_name="auto")
-                
-                # Extrai o nome do arquivo (key) da URL completa
-                # Ex: https://.../aluno_1_12345.jpg -> aluno_1_12345.jpg
-                file_key = db_aluno.foto.split('/')[-1]
-
-                s3_client.delete_object(Bucket=s3_bucket_name, Key=file_key)
-                logging.info(f"Foto {file_key} excluída do R2 com sucesso.")
-            else:
-                logging.warning("Configuração S3 incompleta. Não foi possível excluir a foto.")
-        
-        except Exception as e:
-            # Não impede a exclusão do aluno do banco, apenas loga o erro da foto
-            logging.error(f"Erro ao excluir foto {db_aluno.foto} do R2: {e}")
-    # --- FIM DA NOVA LÓGICA ---
+        # Não impede a exclusão do aluno; falhas ao apagar a foto só são logadas
+        storage.delete_file(db_aluno.foto)
 
     # Exclui o aluno do banco de dados
+    usuario_id = db_aluno.usuario_id
     db.delete(db_aluno)
     db.commit()
+    invalidate_total_cache()
+    if usuario_id:
+        # O snapshot em cache guarda o aluno_id vinculado ao login
+        auth.invalidate_user_cache(usuario_id)
     return None
 
 # Em src/routes/alunos_fastapi.py
@@ -363,7 +367,7 @@ def delete_aluno(aluno_id: int, db: Session = Depends(get_db)):
 # ... (outros imports) ...
 
 @router.get("/{aluno_id}/historico")
-def get_aluno_historico(aluno_id: int, db: Session = Depends(get_db)):
+def get_aluno_historico(aluno_id: int, db: Session = Depends(get_read_db)):
     """
     Retorna um histórico de atividades para um aluno específico, incluindo status de matrícula.
     """
@@ -404,32 +408,26 @@ def get_aluno_historico(aluno_id: int, db: Session = Depends(get_db)):
     return historico
 
 @router.get("/{aluno_id}/status-detalhado")
-def get_aluno_status_detalhado(aluno_id: int, db: Session = Depends(get_db)):
+def get_aluno_status_detalhado(aluno_id: int, db: Session = Depends(get_read_db)):
     """
     Retorna a situação geral e o status financeiro de um aluno.
     """
-    aluno = db.query(Aluno).filter(Aluno.id == aluno_id).first()
-    if not aluno:
-        raise HTTPException(status_code=404, detail="Aluno não encontrado")
-
-    # 1. Verifica a Situação Geral (se tem alguma matrícula ativa)
-    matricula_ativa = db.query(Matricula).filter(
-        Matricula.aluno_id == aluno_id,
-        Matricula.ativa == True
+    linha = db.query(Aluno.id, AlunoResumo).outerjoin(AlunoResumo, AlunoResumo.aluno_id == Aluno.id).filter(
+        Aluno.id == aluno_id
     ).first()
-    
-    situacao_geral = "Ativo" if matricula_ativa else "Inativo"
-
-    # 2. Verifica o Status da Mensalidade
-    mensalidades_pendentes = db.query(func.sum(Mensalidade.valor)).filter(
-        Mensalidade.aluno_id == aluno_id,
-        Mensalidade.status == 'pendente'
-    ).scalar() or 0.0
+    if not linha:
+        raise HTTPException(status_code=404, detail="Aluno não encontrado")
 
-    status_mensalidade = "Em dia" if mensalidades_pendentes == 0 else "Pendente"
+    # Tudo já calculado em aluno_resumo (sem linha = sem matrículas nem mensalidades)
+    resumo = linha[1]
+    valor_pendente = resumo.valor_pendente if resumo is not None else 0.0
 
     return {
-        "situacao_geral": situacao_geral,
-        "status_mensalidade": status_mensalidade,
-        "valor_pendente": mensalidades_pendentes
+        "situacao_geral": "Ativo" if resumo is not None and resumo.ativo else "Inativo",
+        "status_mensalidade": "Em dia" if valor_pendente == 0 else "Pendente",
+        "valor_pendente": valor_pendente,
+        "matriculas_ativas": resumo.matriculas_ativas if resumo is not None else 0,
+        "inadimplente": resumo is not None and resumo.inadimplente,
+        "pendente_desde": resumo.pendente_desde if resumo is not None else None,
+        "ultimo_pagamento": resumo.ultimo_pagamento if resumo is not None else None,
     }
\ No newline at end of file
@@ -2,10 +2,11 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Request
 from fastapi.responses import RedirectResponse
 from fastapi.security import OAuth2PasswordRequestForm
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 from src import auth, database, models
 from src.schemas import usuario as schemas_usuario # Importa especificamente e dá um apelido
-from src import auth, database, models, schemas
+from src import auth, database, metrics, models, schemas, password_hashing
 import os # Importe o 'os' para usar variáveis de ambiente
 import logging
 
@@ -18,12 +19,19 @@ router = APIRouter(
 @router.post("/token", response_model=schemas_usuario.Token)
 async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(database.get_db)):
     
-    # --- ALTERAÇÃO AQUI ---
-    # Trocamos get_user (por email) para get_user_by_username
-    user = auth.get_user_by_username(db, username=form_data.username)
-    # --- FIM DA ALTERAÇÃO ---
+    # Consulta e bcrypt fora do event loop: a busca no threadpool, o hash no pool dedicado
+    user = await run_in_threadpool(auth.get_user_by_username, db, form_data.username)
 
-    if not user or not user.hashed_password or not auth.verify_password(form_data.password, user.hashed_password):
+    password_ok = False
+    if user and user.hashed_password:
+        password_ok, new_hash = await password_hashing.verify_and_update_async(form_data.password, user.hashed_password)
+        if password_ok and new_hash:
+            # Hash com custo antigo: regrava com o custo calibrado atual
+            user.hashed_password = new_hash
+            await run_in_threadpool(db.commit)
+            await run_in_threadpool(db.refresh, user)
+
+    if not password_ok:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Usuário ou senha incorretos", # Mensagem genérica
@@ -34,9 +42,39 @@ async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(
     access_token = auth.create_access_token(
         data={"sub": user.username, "role": user.role} # Mudado de user.email para user.username
     )
+    user_info = schemas_usuario.UsuarioRead.from_orm(user)
+    refresh_token = await run_in_threadpool(auth.create_refresh_token, db, user.id)
+
+    return {"access_token": access_token, "token_type": "bearer", "refresh_token": refresh_token, "user_info": user_info}
+
+
+@router.post("/refresh", response_model=schemas_usuario.Token)
+def refresh_access_token(body: schemas_usuario.RefreshTokenRequest, db: Session = Depends(database.get_db)):
+    """
+    Troca um refresh token válido por um novo access token (e um novo refresh token).
+    Não envolve senha nem bcrypt: a senha só é verificada quando o usuário a digita.
+    409: o token acabou de ser rotacionado por outra requisição do mesmo cliente.
+    """
+    user, new_refresh_token = auth.rotate_refresh_token(db, body.refresh_token)
+    if user is None or user.role == "pendente":
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Sessão expirada. Faça login novamente.",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
 
+    access_token = auth.create_access_token(data={"sub": user.username or user.email, "role": user.role})
     user_info = schemas_usuario.UsuarioRead.from_orm(user)
-    return {"access_token": access_token, "token_type": "bearer", "user_info": user_info}
+    return {"access_token": access_token, "token_type": "bearer", "refresh_token": new_refresh_token, "user_info": user_info}
+
+
+@router.post("/logout", status_code=status.HTTP_204_NO_CONTENT)
+def logout(body: schemas_usuario.RefreshTokenRequest, db: Session = Depends(database.get_db)):
+    """
+    Revoga o refresh token informado (o access token expira sozinho).
+    """
+    auth.revoke_refresh_token(db, body.refresh_token)
+    return None
 
 
 @router.get('/login/google')
@@ -52,7 +90,17 @@ async def login_google(request: Request):
     origin = request.query_params.get('origin', 'flask')
     request.session['google_auth_origin'] = origin
     
-    return await auth.oauth.google.authorize_redirect(request, redirect_uri)
+    with metrics.external_call("google_oauth", "authorize_redirect"):
+        return await auth.get_oauth().google.authorize_redirect(request, redirect_uri)
+
+def _get_or_create_google_user(db: Session, email: str, nome: str):
+    user = auth.get_user(db, email=email)
+    if not user:
+        user = models.usuario.Usuario(email=email, nome=nome, role='pendente')
+        db.add(user)
+        db.commit()
+        db.refresh(user)
+    return user
 
 @router.get('/callback/google', name='auth_google_callback')
 async def auth_google_callback(request: Request, db: Session = Depends(database.get_db)):
@@ -75,7 +123,8 @@ async def auth_google_callback(request: Request, db: Session = Depends(database.
     # --- FIM DA MODIFICAÇÃO ---
 
     try:
-        token = await auth.oauth.google.authorize_access_token(request)
+        with metrics.external_call("google_oauth", "authorize_access_token"):
+            token = await auth.get_oauth().google.authorize_access_token(request)
     except Exception as e:
         # --- MODIFICAÇÃO ---
         # Em vez de 'raise', nós redirecionamos o usuário de volta ao login
@@ -89,33 +138,41 @@ async def auth_google_callback(request: Request, db: Session = Depends(database.
         return RedirectResponse(url=error_redirect_url)
 
     email = user_info_from_google['email']
-    user = auth.get_user(db, email=email)
-
-    if not user:
-        new_user = models.usuario.Usuario(
-            email=email,
-            nome=user_info_from_google.get('name', 'Usuário Google'),
-            role='pendente'
-        )
-        db.add(new_user)
-        db.commit()
-        db.refresh(new_user)
-        user = new_user
+    # Consulta/cadastro síncronos no threadpool para não travar o event loop
+    user = await run_in_threadpool(_get_or_create_google_user, db, email, user_info_from_google.get('name', 'Usuário Google'))
     
-    access_token = auth.create_access_token(
-        data={"sub": user.email, "role": user.role}
-    )
+    # Só um código de uso único vai na URL; o frontend o troca pelos tokens em POST /auth/exchange
+    code = await run_in_threadpool(auth.create_login_code, db, user.id)
     
-    # Lógica de redirecionamento de SUCESSO (sem alteração)
+    # Lógica de redirecionamento de SUCESSO
     if origin == 'pwa':
-        response = RedirectResponse(url=f"/portal#/login/callback?token={access_token}")
+        response = RedirectResponse(url=f"/portal#/login/callback?code={code}")
     else:
-        response = RedirectResponse(url=f"{frontend_url}/login/callback?token={access_token}")
+        response = RedirectResponse(url=f"{frontend_url}/login/callback?code={code}")
     
     return response
 
+@router.post("/exchange", response_model=schemas_usuario.Token)
+def exchange_login_code(body: schemas_usuario.LoginCodeRequest, db: Session = Depends(database.get_db)):
+    """
+    Troca o código do callback do Google pelo mesmo par de tokens do /token
+    (sem o refresh token, o login pelo Google cairia a cada ACCESS_TOKEN_EXPIRE_MINUTES).
+    """
+    user = auth.redeem_login_code(db, body.code)
+    if user is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Código de login inválido ou expirado. Faça login novamente.",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+
+    access_token = auth.create_access_token(data={"sub": user.username or user.email, "role": user.role})
+    refresh_token = auth.create_refresh_token(db, user.id)
+    user_info = schemas_usuario.UsuarioRead.from_orm(user)
+    return {"access_token": access_token, "token_type": "bearer", "refresh_token": refresh_token, "user_info": user_info}
+
 @router.get("/me", response_model=schemas.usuario.UsuarioRead)
-async def read_users_me(current_user: models.usuario.Usuario = Depends(auth.get_current_active_user)):
+async def read_users_me(current_user: auth.UsuarioPrincipal = Depends(auth.get_current_active_user)):
     """
     Retorna os dados do usuário atualmente logado.
     """
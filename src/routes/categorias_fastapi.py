@@ -8,7 +8,7 @@ from sqlalchemy.orm import Session
 from sqlalchemy.exc import IntegrityError
 import logging
 
-from src.database import get_db
+from src.database import get_db, get_read_db
 from src.models.categoria import Categoria
 from src.schemas.categoria import CategoriaCreate, CategoriaRead
 
@@ -38,7 +38,7 @@ def create_categoria(categoria: CategoriaCreate, db: Session = Depends(get_db)):
 @router.get("", response_model=List[CategoriaRead])
 def read_categorias(
     tipo: Optional[str] = None,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """
     Lista categorias, opcionalmente filtradas por tipo.
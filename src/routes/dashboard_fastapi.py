@@ -6,7 +6,7 @@ from sqlalchemy import func
 from datetime import datetime, timedelta
 from collections import defaultdict
 
-from src.database import get_db
+from src.database import get_read_db
 from src.models.aluno import Aluno
 from src.models.evento import Evento
 
@@ -16,7 +16,7 @@ router = APIRouter(
 )
 
 @router.get("/atividades-recentes")
-def get_atividades_recentes(db: Session = Depends(get_db)):
+def get_atividades_recentes(db: Session = Depends(get_read_db)):
     """
     Retorna o número de novos alunos e eventos nos últimos 6 meses.
     """
@@ -4,7 +4,7 @@ from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session, joinedload
 from datetime import datetime
 
-from src.database import get_db
+from src.database import get_db, get_read_db
 from src.models.evento import Evento
 from src.schemas.evento import EventoCreate, EventoRead, EventoUpdate
 
@@ -22,12 +22,12 @@ def create_evento(evento: EventoCreate, db: Session = Depends(get_db)):
     return db_evento
 
 @router.get("", response_model=List[EventoRead])
-def read_eventos(db: Session = Depends(get_db)):
+def read_eventos(db: Session = Depends(get_read_db)):
     eventos = db.query(Evento).options(joinedload(Evento.inscricoes)).order_by(Evento.data_evento.desc()).all()
     return eventos
 
 @router.get("/{evento_id}", response_model=EventoRead)
-def read_evento(evento_id: int, db: Session = Depends(get_db)):
+def read_evento(evento_id: int, db: Session = Depends(get_read_db)):
     db_evento = db.query(Evento).options(joinedload(Evento.inscricoes)).filter(Evento.id == evento_id).first()
     if db_evento is None:
         raise HTTPException(status_code=404, detail="Evento não encontrado")
@@ -10,7 +10,7 @@ from sqlalchemy import func
 from datetime import datetime
 import logging
 
-from src.database import get_db
+from src.database import get_db, get_read_db
 from src.models.financeiro import Financeiro
 from src.schemas.financeiro import FinanceiroCreate, FinanceiroRead, FinanceiroUpdate
 from src.models.categoria import Categoria 
@@ -58,7 +58,7 @@ def read_transacoes(
     busca: Optional[str] = None,
     data_inicio: Optional[str] = None,
     data_fim: Optional[str] = None,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """
     Lista transações financeiras com filtros opcionais.
@@ -93,7 +93,7 @@ def read_transacoes(
     return transacoes
 
 @router.get("/transacoes/{transacao_id}", response_model=FinanceiroRead)
-def read_transacao(transacao_id: int, db: Session = Depends(get_db)):
+def read_transacao(transacao_id: int, db: Session = Depends(get_read_db)):
     """
     Obtém os detalhes de uma transação financeira específica pelo ID.
     """
@@ -142,7 +142,7 @@ def delete_transacao(transacao_id: int, db: Session = Depends(get_db)):
 def get_balanco(
     data_inicio: Optional[str] = None,
     data_fim: Optional[str] = None,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """
     Obtém o balanço financeiro (receitas - despesas) em um período de forma otimizada,
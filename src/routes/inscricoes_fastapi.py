@@ -2,8 +2,9 @@
 from typing import List
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session, joinedload
+from sqlalchemy.exc import IntegrityError
 
-from src.database import get_db
+from src.database import get_db, get_read_db
 from src.models.inscricao import Inscricao
 from src.models.aluno import Aluno
 from src.models.evento import Evento
@@ -38,12 +39,17 @@ def create_inscricao(inscricao: InscricaoCreate, db: Session = Depends(get_db)):
         db_inscricao.metodo_pagamento = "Gratuito"
 
     db.add(db_inscricao)
-    db.commit()
+    try:
+        db.commit()
+    except IntegrityError:
+        # uq_inscricoes_evento_aluno: o aluno já está inscrito neste evento
+        db.rollback()
+        raise HTTPException(status_code=400, detail="Aluno já inscrito neste evento")
     db.refresh(db_inscricao)
     return db_inscricao
 
 @router.get("/evento/{evento_id}", response_model=List[InscricaoRead])
-def read_inscricoes_por_evento(evento_id: int, db: Session = Depends(get_db)):
+def read_inscricoes_por_evento(evento_id: int, db: Session = Depends(get_read_db)):
     inscricoes = db.query(Inscricao).options(joinedload(Inscricao.aluno)).filter(Inscricao.evento_id == evento_id).all()
     return inscricoes
 
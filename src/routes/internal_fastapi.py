@@ -0,0 +1,164 @@
+# -*- coding: utf-8 -*-
+"""
+Rotas internas de diagnóstico (somente administradores).
+"""
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import FileResponse
+
+from src import (continuous_profiler, database, db_pool, loop_monitor, memory_diagnostics, request_profiler,
+                 slow_query_log, sqlite_profile)
+from src.auth import get_admin_user
+
+router = APIRouter(
+    prefix="/api/v1/_internal",
+    tags=["Interno"],
+    dependencies=[Depends(get_admin_user)] # Protege TODAS as rotas neste arquivo
+)
+
+
+@router.get("/db-pool")
+def get_db_pool_status():
+    """
+    Estado do pool de conexões: conexões em uso, overflow, threads esperando
+    e histograma do tempo de espera no checkout, para o primário e a réplica de leitura.
+    Em SQLite, inclui a fila do escritor serializado.
+    """
+    response = {"sync": db_pool.pool_status(database.engine)}
+    async_engine = database.get_async_engine_if_created()
+    if async_engine is not None:
+        response["async"] = db_pool.pool_status(async_engine)
+    if database.read_engine is not None:
+        response["read"] = db_pool.pool_status(database.read_engine)
+        response["read"]["replica_available"] = database.replica_available()
+    async_read_engine = database.get_async_read_engine_if_created()
+    if async_read_engine is not None:
+        response["async_read"] = db_pool.pool_status(async_read_engine)
+    if sqlite_profile.is_enabled(database.DATABASE_URL):
+        response["sqlite_writer"] = sqlite_profile.writer_stats()
+    return response
+
+
+@router.get("/profiles")
+def list_request_profiles():
+    """
+    Perfis salvos pelo profiler sob demanda (requisições enviadas por um
+    administrador com `X-Profile: 1` ou `?_profile=1`), do mais recente ao mais antigo.
+    """
+    return {"max_files": request_profiler.PROFILE_MAX_FILES, "profiles": request_profiler.list_profiles()}
+
+
+@router.get("/profiles/{profile_id}")
+def download_request_profile(profile_id: str):
+    """Pilhas no formato collapsed (flamegraph.pl / speedscope)."""
+    path = request_profiler.profile_path(profile_id)
+    if path is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Perfil não encontrado")
+    return FileResponse(path, media_type="text/plain; charset=utf-8", filename=path.name)
+
+
+@router.get("/continuous-profiles")
+def get_continuous_profiles():
+    """
+    Estado do profiler contínuo deste worker e os arquivos horários (de todos os
+    workers) em CONTINUOUS_PROFILE_DIR.
+    """
+    return continuous_profiler.status()
+
+
+@router.get("/continuous-profiles/{name}")
+def download_continuous_profile(name: str):
+    """Arquivo horário no formato collapsed (flamegraph.pl / speedscope)."""
+    path = continuous_profiler.file_path(name)
+    if path is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Arquivo não encontrado")
+    return FileResponse(path, media_type="text/plain; charset=utf-8", filename=path.name)
+
+
+@router.get("/memory")
+def get_memory_report():
+    """
+    RSS, GC, sessões do SQLAlchemy abertas (e objetos nos identity maps), rotas
+    que mais aumentaram o RSS (MEMORY_TRACK_ROUTES=1) e estado do tracemalloc.
+    Os dados são do worker que atendeu esta requisição.
+    """
+    return memory_diagnostics.memory_report()
+
+
+@router.post("/memory/tracemalloc/start")
+def start_tracemalloc(nframes: int = Query(1, ge=1, le=50)):
+    """Liga o tracemalloc (nframes > 1 permite agrupar por traceback, com mais overhead)."""
+    memory_diagnostics.start_tracing(nframes)
+    return memory_diagnostics.tracemalloc_status()
+
+
+@router.post("/memory/tracemalloc/stop")
+def stop_tracemalloc():
+    memory_diagnostics.stop_tracing()
+    return memory_diagnostics.tracemalloc_status()
+
+
+@router.post("/memory/snapshots")
+def take_memory_snapshot(label: Optional[str] = None):
+    try:
+        return memory_diagnostics.take_snapshot(label)
+    except RuntimeError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+
+
+@router.get("/memory/diff")
+def diff_memory_snapshots(
+    base: int,
+    target: Optional[int] = Query(None, description="Sem target, compara com um snapshot tirado agora"),
+    group_by: str = Query("lineno", pattern="^(lineno|filename|traceback)$"),
+    limit: int = Query(25, ge=1, le=500),
+):
+    """Maiores diferenças de alocação entre dois snapshots, agrupadas por arquivo, linha ou traceback."""
+    base_snapshot = memory_diagnostics.get_snapshot(base)
+    if base_snapshot is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Snapshot {base} não encontrado")
+    if target is None:
+        try:
+            target = memory_diagnostics.take_snapshot("diff")["id"]
+        except RuntimeError as e:
+            raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+    target_snapshot = memory_diagnostics.get_snapshot(target)
+    if target_snapshot is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Snapshot {target} não encontrado")
+    return {
+        "base": base,
+        "target": target,
+        "group_by": group_by,
+        "stats": memory_diagnostics.compare(base_snapshot, target_snapshot, group_by, limit),
+    }
+
+
+@router.get("/event-loop")
+def get_event_loop_status():
+    """Maior atraso do event loop observado neste worker e episódios de bloqueio detectados."""
+    return loop_monitor.status()
+
+
+@router.get("/slow-queries")
+def get_slow_queries(
+    limit: int = Query(20, ge=1, le=200),
+    order_by: str = Query("total_ms", pattern="^(total_ms|count|max_ms)$"),
+):
+    """
+    Consultas acima de SLOW_QUERY_THRESHOLD_MS agrupadas por fingerprint (SQL sem
+    literais): contagem, tempo total/médio/máximo, rotas que as executaram,
+    parâmetros mascarados da execução mais lenta e o último plano (EXPLAIN).
+    Os dados são do worker que atendeu esta requisição.
+    """
+    return {
+        "enabled": slow_query_log.ENABLED,
+        "threshold_ms": slow_query_log.SLOW_QUERY_THRESHOLD_MS,
+        **slow_query_log.worker_stats(),
+        "queries": slow_query_log.stats.top(limit, order_by),
+    }
+
+
+@router.delete("/slow-queries", status_code=status.HTTP_204_NO_CONTENT)
+def reset_slow_queries():
+    slow_query_log.stats.reset()
@@ -9,10 +9,11 @@ from sqlalchemy.orm import Session
 from sqlalchemy.exc import IntegrityError
 import logging
 
-from src.database import get_db
+from src.database import get_db, get_read_db
 from src.models.matricula import Matricula
 from src.models.aluno import Aluno
 from src.models.turma import Turma
+from src import search
 from src.schemas.matricula import MatriculaCreate, MatriculaRead, MatriculaUpdate
 from src.models.plano import Plano
 
@@ -141,7 +142,7 @@ def read_matriculas(
     busca: Optional[str] = None, # Parâmetro de busca
     status: Optional[str] = None, # Parâmetro para filtrar por status (ativa/inativa)
     turma_id: Optional[int] = None,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """
     Lista matrículas com filtros por termo de busca e status.
@@ -155,7 +156,7 @@ def read_matriculas(
     if busca:
         # Filtra pelo nome do aluno OU nome da turma
         query = query.join(Aluno).join(Turma).filter(
-            (Aluno.nome.ilike(f"%{busca}%")) |
+            search.matches(Aluno, busca) |
             (Turma.nome.ilike(f"%{busca}%"))
         )
     
@@ -4,11 +4,12 @@ Rotas FastAPI para o CRUD de Mensalidades.
 """
 from typing import List, Optional
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session, joinedload
+from sqlalchemy.orm import Session, joinedload, selectinload
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import date, datetime
-from sqlalchemy import desc
+from sqlalchemy import desc, func, select
 
-from src.database import get_db
+from src.database import get_db, get_async_read_db
 from src.models.mensalidade import Mensalidade
 from src.schemas.mensalidade import MensalidadeCreate, MensalidadeRead
 from src.models.aluno import Aluno
@@ -16,6 +17,8 @@ from src.models.plano import Plano
 from src.models.financeiro import Financeiro
 from src.schemas.mensalidade import MensalidadePaginated
 from src.models.matricula import Matricula
+from src.models.turma import Turma
+from src import search
 
 
 router = APIRouter(
@@ -40,38 +43,51 @@ def create_mensalidade(mensalidade: MensalidadeCreate, db: Session = Depends(get
     return db_mensalidade
 
 @router.get("", response_model=MensalidadePaginated) # Altera o response_model
-def read_mensalidades(
+async def read_mensalidades(
     skip: int = 0,
     limit: int = 20, # Define um limite padrão menor para paginação
     status: Optional[str] = None,
     busca_aluno: Optional[str] = None, # Novo parâmetro de busca
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_read_db)
 ):
     """
     Lista mensalidades com filtros, busca por nome do aluno,
     ordenação por nome e paginação.
     """
-    query = db.query(Mensalidade).options(
-        joinedload(Mensalidade.aluno),
-        joinedload(Mensalidade.plano),
-        joinedload(Mensalidade.matricula).joinedload(Matricula.turma) # Carrega matricula e DEPOIS turma
-    ).join(Aluno, Mensalidade.aluno_id == Aluno.id)
+    query = select(Mensalidade).join(Aluno, Mensalidade.aluno_id == Aluno.id)
 
     if status:
-        query = query.filter(Mensalidade.status == status)
+        query = query.where(Mensalidade.status == status)
     if busca_aluno:
-        # Filtra pelo nome do aluno (case-insensitive)
-        query = query.filter(Aluno.nome.ilike(f"%{busca_aluno}%"))
+        # Filtra pelo nome do aluno (sem acento, por prefixo e aproximado: src/search.py)
+        query = query.where(search.matches(Aluno, busca_aluno))
 
     # Conta o total ANTES de aplicar limit/offset
-    total = query.count()
+    total = await db.scalar(select(func.count()).select_from(query.subquery()))
+
+    # Sessão async não faz lazy load: tudo que o MensalidadeRead serializa é carregado aqui
+    # (matricula -> aluno/plano/turma -> professor), em vez de uma consulta por linha.
+    query = query.options(
+        joinedload(Mensalidade.aluno),
+        joinedload(Mensalidade.plano),
+        joinedload(Mensalidade.matricula).options(
+            selectinload(Matricula.aluno),
+            selectinload(Matricula.plano),
+            joinedload(Matricula.turma).selectinload(Turma.professor),
+        )
+    )
 
     # Ordena pelo nome do aluno e depois pela data de vencimento
-    mensalidades_paginadas = query.order_by(desc(Mensalidade.status), Aluno.nome.asc())\
-                                  .offset(skip).limit(limit).all()
+    result = await db.scalars(
+        query.order_by(desc(Mensalidade.status), Aluno.nome.asc()).offset(skip).limit(limit)
+    )
+    mensalidades_paginadas = result.unique().all()
 
     # Filtra mensalidades com aluno/plano None para evitar erro de validação (mantido)
-    mensalidades_validas = [m for m in mensalidades_paginadas if m.aluno is not None and m.plano is not None]
+    mensalidades_validas = [
+        MensalidadeRead.from_orm(m) for m in mensalidades_paginadas
+        if m.aluno is not None and m.plano is not None
+    ]
 
     return {"total": total, "mensalidades": mensalidades_validas}
 
@@ -0,0 +1,44 @@
+# -*- coding: utf-8 -*-
+"""
+Endpoint /metrics (formato texto do Prometheus).
+
+O coletor envia `Authorization: Bearer <METRICS_TOKEN>`. Sem METRICS_TOKEN
+definido (ou com outro token), só um administrador logado (JWT) vê as
+métricas: elas expõem rotas, volume de requisições, estado do pool e das
+chamadas externas, e não devem ficar abertas por padrão.
+"""
+import os
+import secrets
+
+from fastapi import APIRouter, HTTPException, Request, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import PlainTextResponse
+
+from src import auth, metrics
+
+METRICS_TOKEN = os.environ.get("METRICS_TOKEN")
+
+router = APIRouter(tags=["Métricas"])
+
+
+async def _require_metrics_access(request: Request):
+    authorization = request.headers.get("authorization", "")
+    if METRICS_TOKEN and secrets.compare_digest(authorization, f"Bearer {METRICS_TOKEN}"):
+        return
+    scheme, _, token = authorization.partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Token de métricas inválido",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    # Mesma regra das rotas /api/v1/_internal (auth.get_admin_user)
+    user = await auth.get_current_user(token)
+    await auth.get_admin_user(await auth.get_current_active_user(user))
+
+
+@router.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+async def get_metrics(request: Request):
+    await _require_metrics_access(request)
+    body = await run_in_threadpool(metrics.render)
+    return PlainTextResponse(body, media_type="text/plain; version=0.0.4; charset=utf-8")
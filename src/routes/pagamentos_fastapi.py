@@ -11,6 +11,7 @@ import re
 from src.database import get_db
 from src import auth
 from src.models import usuario as models_usuario
+from src.models.aluno import Aluno
 from src.models.mensalidade import Mensalidade
 from src.models.inscricao import Inscricao
 
@@ -39,18 +40,19 @@ def gerar_pix_transparente(
     item_type: str, 
     item_id: int, 
     db: Session = Depends(get_db), 
-    current_user: models_usuario.Usuario = Depends(auth.get_current_active_user)
+    current_user: auth.UsuarioPrincipal = Depends(auth.get_current_active_user)
 ):
     """
     Gera um QR Code PIX direto para o item especificado.
     item_type: 'mensalidade' ou 'inscricao'
     """
     # Valida se o usuário tem perfil de aluno
-    if not current_user.aluno:
+    aluno = db.query(Aluno).filter(Aluno.id == current_user.aluno_id).first() if current_user.aluno_id else None
+    if not aluno:
          raise HTTPException(status_code=400, detail="Usuário não vinculado a um aluno.")
     
     # Limpa o CPF (remove pontos e traços) para enviar ao MP
-    cpf_limpo = re.sub(r'[^0-9]', '', current_user.aluno.cpf or "")
+    cpf_limpo = re.sub(r'[^0-9]', '', aluno.cpf or "")
     
     if not cpf_limpo:
         raise HTTPException(status_code=400, detail="O CPF é obrigatório para gerar o PIX. Atualize seu perfil.")
@@ -61,7 +63,7 @@ def gerar_pix_transparente(
         item_id=item_id,
         item_type=item_type,
         payer_email=current_user.email,
-        payer_first_name=current_user.nome.split()[0], # Pega o primeiro nome
+        payer_first_name=(current_user.nome or aluno.nome).split()[0], # Pega o primeiro nome
         doc_number=cpf_limpo
     )
 
@@ -70,7 +72,7 @@ def check_payment_status(
     item_type: str, 
     item_id: int, 
     db: Session = Depends(get_db),
-    current_user: models_usuario.Usuario = Depends(auth.get_current_active_user)
+    current_user: auth.UsuarioPrincipal = Depends(auth.get_current_active_user)
 ):
     """
     Verifica o status de um pagamento (usado pelo polling do frontend).
@@ -2,10 +2,10 @@
 # -*- coding: utf-8 -*-
 
 import os
-import mercadopago
 import logging
 import uuid
 from fastapi import APIRouter, Request, HTTPException, status
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session, joinedload
 from datetime import date, datetime, timedelta
 
@@ -13,13 +13,15 @@ from src.models.mensalidade import Mensalidade
 from src.models.inscricao import Inscricao
 from src.models.financeiro import Financeiro
 from src.models.evento import Evento
+from src import metrics
 
-# Inicializa o SDK
+# Inicializa o SDK (importado só no primeiro pagamento, para não pesar no boot dos workers)
 def get_sdk():
     access_token = os.getenv("MP_ACCESS_TOKEN")
     if not access_token:
         logging.error("MP_ACCESS_TOKEN não configurado no ambiente.")
         return None
+    import mercadopago
     return mercadopago.SDK(access_token)
 
 def create_pix_payment(db: Session, item_id: int, item_type: str, payer_email: str, payer_first_name: str, doc_number: str):
@@ -53,6 +55,7 @@ def create_pix_payment(db: Session, item_id: int, item_type: str, payer_email: s
             raise HTTPException(status_code=400, detail="Tipo de item inválido.")
 
         # 2. Prepara a chave de idempotência e URLs
+        import mercadopago
         request_options = mercadopago.config.RequestOptions()
         request_options.custom_headers = {
             'x-idempotency-key': str(uuid.uuid4())
@@ -82,7 +85,8 @@ def create_pix_payment(db: Session, item_id: int, item_type: str, payer_email: s
         }
 
         # 4. Envia para o Mercado Pago
-        payment_response = sdk.payment().create(payment_data, request_options)
+        with metrics.external_call("mercadopago", "create_payment"):
+            payment_response = sdk.payment().create(payment_data, request_options)
         payment = payment_response["response"]
 
         if payment_response["status"] != 201:
@@ -107,6 +111,63 @@ def create_pix_payment(db: Session, item_id: int, item_type: str, payer_email: s
         logging.error(f"Erro interno ao gerar PIX: {str(e)}")
         raise HTTPException(status_code=500, detail="Erro interno ao processar pagamento.")
 
+def _confirm_mp_payment(db: Session, sdk, data_id):
+    """Parte síncrona do webhook (SDK HTTP + banco): roda no threadpool, fora do event loop."""
+    # Busca informações atualizadas do pagamento
+    with metrics.external_call("mercadopago", "get_payment"):
+        payment_info = sdk.payment().get(data_id)
+    payment = payment_info.get("response", {})
+    
+    status_pag = payment.get("status")
+    external_ref = payment.get("external_reference")
+    
+    if status_pag == "approved" and external_ref:
+        try:
+            tipo, item_id_str = external_ref.split("_")
+            item_id = int(item_id_str)
+            
+            if tipo == "mensalidade":
+                mensalidade = db.query(Mensalidade).filter(Mensalidade.id == item_id).first()
+                if mensalidade and mensalidade.status == 'pendente':
+                    mensalidade.status = 'pago'
+                    mensalidade.data_pagamento = date.today()
+                    
+                    transacao = Financeiro(
+                        tipo="receita", 
+                        categoria="Mensalidade", 
+                        valor=mensalidade.valor, 
+                        descricao=f"Pix MP - Mensalidade #{mensalidade.id}",
+                        status="confirmado", 
+                        data=datetime.utcnow(), 
+                        forma_pagamento="Pix Mercado Pago"
+                    )
+                    db.add(transacao)
+                    db.commit()
+
+            elif tipo == "inscricao":
+                inscricao = db.query(Inscricao).filter(Inscricao.id == item_id).first()
+                if inscricao and inscricao.status == 'pendente':
+                    inscricao.status = 'pago'
+                    inscricao.metodo_pagamento = "Pix Mercado Pago"
+                    
+                    evento = db.query(Evento).filter(Evento.id == inscricao.evento_id).first()
+                    valor = evento.valor_inscricao if evento else 0.0
+                    inscricao.valor_pago = valor
+
+                    transacao = Financeiro(
+                        tipo="receita", 
+                        categoria="Evento", 
+                        valor=valor, 
+                        descricao=f"Pix MP - Inscrição #{inscricao.id}",
+                        status="confirmado", 
+                        data=datetime.utcnow(), 
+                        forma_pagamento="Pix Mercado Pago"
+                    )
+                    db.add(transacao)
+                    db.commit()
+        except ValueError:
+            logging.error(f"Erro ao processar external_reference: {external_ref}")
+
 async def handle_mp_webhook(request: Request, db: Session):
     """
     Recebe o aviso do Mercado Pago e confirma o pagamento no banco.
@@ -120,59 +181,7 @@ async def handle_mp_webhook(request: Request, db: Session):
         data_id = params.get("id") or params.get("data.id")
 
         if topic == "payment" and data_id:
-            # Busca informações atualizadas do pagamento
-            payment_info = sdk.payment().get(data_id)
-            payment = payment_info.get("response", {})
-            
-            status_pag = payment.get("status")
-            external_ref = payment.get("external_reference")
-            
-            if status_pag == "approved" and external_ref:
-                try:
-                    tipo, item_id_str = external_ref.split("_")
-                    item_id = int(item_id_str)
-                    
-                    if tipo == "mensalidade":
-                        mensalidade = db.query(Mensalidade).filter(Mensalidade.id == item_id).first()
-                        if mensalidade and mensalidade.status == 'pendente':
-                            mensalidade.status = 'pago'
-                            mensalidade.data_pagamento = date.today()
-                            
-                            transacao = Financeiro(
-                                tipo="receita", 
-                                categoria="Mensalidade", 
-                                valor=mensalidade.valor, 
-                                descricao=f"Pix MP - Mensalidade #{mensalidade.id}",
-                                status="confirmado", 
-                                data=datetime.utcnow(), 
-                                forma_pagamento="Pix Mercado Pago"
-                            )
-                            db.add(transacao)
-                            db.commit()
-
-                    elif tipo == "inscricao":
-                        inscricao = db.query(Inscricao).filter(Inscricao.id == item_id).first()
-                        if inscricao and inscricao.status == 'pendente':
-                            inscricao.status = 'pago'
-                            inscricao.metodo_pagamento = "Pix Mercado Pago"
-                            
-                            evento = db.query(Evento).filter(Evento.id == inscricao.evento_id).first()
-                            valor = evento.valor_inscricao if evento else 0.0
-                            inscricao.valor_pago = valor
-
-                            transacao = Financeiro(
-                                tipo="receita", 
-                                categoria="Evento", 
-                                valor=valor, 
-                                descricao=f"Pix MP - Inscrição #{inscricao.id}",
-                                status="confirmado", 
-                                data=datetime.utcnow(), 
-                                forma_pagamento="Pix Mercado Pago"
-                            )
-                            db.add(transacao)
-                            db.commit()
-                except ValueError:
-                    logging.error(f"Erro ao processar external_reference: {external_ref}")
+            await run_in_threadpool(_confirm_mp_payment, db, sdk, data_id)
 
         return {"status": "ok"}
 
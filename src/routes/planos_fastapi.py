@@ -9,7 +9,7 @@ from sqlalchemy.orm import Session
 from sqlalchemy.exc import IntegrityError
 import logging
 
-from src.database import get_db
+from src.database import get_db, get_read_db
 from src.models.plano import Plano
 from src.schemas.plano import PlanoCreate, PlanoRead, PlanoUpdate
 
@@ -43,7 +43,7 @@ def read_planos(
     skip: int = 0,
     limit: int = 100,
     nome: Optional[str] = None,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """
     Lista planos com filtros opcionais.
@@ -56,7 +56,7 @@ def read_planos(
     return planos
 
 @router.get("/{plano_id}", response_model=PlanoRead)
-def read_plano(plano_id: int, db: Session = Depends(get_db)):
+def read_plano(plano_id: int, db: Session = Depends(get_read_db)):
     """
     Obtém os detalhes de um plano específico pelo ID.
     """
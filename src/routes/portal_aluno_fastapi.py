@@ -1,4 +1,5 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Form, File, UploadFile, Response
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 from typing import Optional, List
 from datetime import datetime
@@ -6,9 +7,7 @@ import shutil
 from pathlib import Path
 import logging
 import os
-import boto3
-from botocore.client import Config
-from src import auth
+from src import auth, password_hashing, storage
 from pydantic import BaseModel, Field # Garanta que BaseModel e Field estão importados
 
 from src import database, models, auth
@@ -23,8 +22,10 @@ from src.models.evento import Evento
 from src.schemas.portal_aluno import PendenciaFinanceira
 from src.models.matricula import Matricula
 from src.schemas.matricula import MatriculaRead
-from src.image_utils import process_avatar_image
-from sqlalchemy.orm import joinedload
+from sqlalchemy.orm import joinedload, selectinload
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
 from src.schemas import portal_aluno as schemas_portal
 
 
@@ -34,11 +35,7 @@ router = APIRouter(
     tags=["Portal do Aluno"]
 )
 
-@router.post("/register", response_model=schemas_aluno.AlunoRead, status_code=status.HTTP_201_CREATED)
-def register_aluno(aluno_data: schemas_portal.AlunoRegistration, db: Session = Depends(database.get_db)):
-    """
-    Cria um novo Aluno E um novo Usuário (com username).
-    """
+def _check_registration(db: Session, aluno_data: schemas_portal.AlunoRegistration):
     # Verifica se o USERNAME já existe
     db_user_check = db.query(models.usuario.Usuario).filter(models.usuario.Usuario.username == aluno_data.username).first()
     if db_user_check:
@@ -54,9 +51,8 @@ def register_aluno(aluno_data: schemas_portal.AlunoRegistration, db: Session = D
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Este email já está cadastrado no sistema."
         )
-    
-    hashed_password = auth.get_password_hash(aluno_data.password)
-    
+
+def _insert_registration(db: Session, aluno_data: schemas_portal.AlunoRegistration, hashed_password: str):
     # Cria o novo Usuário com username
     new_user = models.usuario.Usuario(
         username=aluno_data.username, # <--- NOVO
@@ -90,19 +86,32 @@ def register_aluno(aluno_data: schemas_portal.AlunoRegistration, db: Session = D
         )
     return new_aluno
 
+@router.post("/register", response_model=schemas_aluno.AlunoRead, status_code=status.HTTP_201_CREATED)
+async def register_aluno(aluno_data: schemas_portal.AlunoRegistration, db: Session = Depends(database.get_db)):
+    """
+    Cria um novo Aluno E um novo Usuário (com username).
+    """
+    # Consultas no threadpool; o bcrypt no pool dedicado, sem prender uma thread esperando por ele
+    await run_in_threadpool(_check_registration, db, aluno_data)
+    hashed_password = await password_hashing.hash_password_async(aluno_data.password)
+    return await run_in_threadpool(_insert_registration, db, aluno_data, hashed_password)
+
 @router.get("/me", response_model=schemas_aluno.AlunoRead)
-def get_current_aluno_profile(
-    current_user: models.usuario.Usuario = Depends(auth.get_current_active_user),
-    db: Session = Depends(database.get_db)
+async def get_current_aluno_profile(
+    current_user: auth.UsuarioPrincipal = Depends(auth.get_current_active_user),
+    db: AsyncSession = Depends(database.get_async_read_db)
 ):
     if current_user.role != "aluno":
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Acesso negado.")
 
     # --- LÓGICA DE CONTA FAMILIAR ---
     # 1. Busca TODOS os perfis de aluno vinculados a este login
-    alunos_vinculados = db.query(models.aluno.Aluno).options(
-        joinedload(models.aluno.Aluno.matriculas)
-    ).filter(models.aluno.Aluno.usuario_id == current_user.id).order_by(models.aluno.Aluno.id.asc()).all() # Ordena pelo ID (mais antigo primeiro)
+    result = await db.scalars(
+        select(models.aluno.Aluno).options(
+            selectinload(models.aluno.Aluno.matriculas)
+        ).where(models.aluno.Aluno.usuario_id == current_user.id).order_by(models.aluno.Aluno.id.asc()) # Ordena pelo ID (mais antigo primeiro)
+    )
+    alunos_vinculados = result.all()
 
     if not alunos_vinculados:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Nenhum perfil de aluno encontrado para este usuário.")
@@ -127,7 +136,7 @@ def get_current_aluno_profile(
 @router.put("/me", response_model=schemas_aluno.AlunoRead)
 def update_current_aluno_profile(
     db: Session = Depends(database.get_db),
-    current_user: models.usuario.Usuario = Depends(auth.get_current_active_user),
+    current_user: auth.UsuarioPrincipal = Depends(auth.get_current_active_user),
     nome: str = Form(...),
     cpf: Optional[str] = Form(None),
     telefone: Optional[str] = Form(None),
@@ -160,37 +169,22 @@ def update_current_aluno_profile(
             db_aluno.data_nascimento = datetime.strptime(data_nascimento, '%Y-%m-%d').date()
         except ValueError: pass
 
-    if foto and foto.filename:
-        processed_image, mime_type = process_avatar_image(foto.file)
-        if processed_image:
-            s3_endpoint_url = os.getenv("S3_ENDPOINT_URL")
-            s3_access_key_id = os.getenv("AWS_ACCESS_KEY_ID")
-            s3_secret_access_key = os.getenv("AWS_SECRET_ACCESS_KEY")
-            s3_bucket_name = os.getenv("S3_BUCKET_NAME")
-            public_bucket_url = os.getenv("PUBLIC_BUCKET_URL")
-
-            if not all([s3_endpoint_url, s3_access_key_id, s3_secret_access_key, s3_bucket_name, public_bucket_url]):
-                raise HTTPException(status_code=500, detail="Configuração de armazenamento na nuvem incompleta.")
-
-            try:
-                s3_client = boto3.client('s3', endpoint_url=s3_endpoint_url, aws_access_key_id=s3_access_key_id, aws_secret_access_key=s3_secret_access_key, region_name="auto")
-                base_filename, _ = os.path.splitext(foto.filename)
-                safe_filename = f"aluno_{db_aluno.id}_{datetime.utcnow().timestamp()}_{base_filename.replace(' ', '_')}.jpg"
-                s3_client.upload_fileobj(processed_image, s3_bucket_name, safe_filename, ExtraArgs={'ContentType': mime_type})
-                db_aluno.foto = f"{public_bucket_url.rstrip('/')}/{safe_filename}"
-            except Exception as e:
-                logging.error(f"Erro no upload para o R2 (portal): {e}")
-                raise HTTPException(status_code=500, detail="Falha ao fazer upload da foto.")
+    # Validada já (tamanho, formato, pixels); o processamento fica para a fila
+    foto_bytes = storage.read_photo(foto)
 
     db.commit()
     db.refresh(db_aluno)
+
+    if foto_bytes:
+        # Processamento e upload rodam em segundo plano (src/storage.py); `foto` é gravada quando terminarem
+        storage.enqueue_photo(models.aluno.Aluno, db_aluno.id, foto_bytes, foto.filename, "aluno")
     return db_aluno
 
 # --- SUAS OUTRAS ROTAS DO PORTAL (sem alteração) ---
 @router.get("/matriculas", response_model=List[MatriculaRead])
 def get_aluno_matriculas(
-    current_user: models.usuario.Usuario = Depends(auth.get_current_active_user),
-    db: Session = Depends(database.get_db)
+    current_user: auth.UsuarioPrincipal = Depends(auth.get_current_active_user),
+    db: Session = Depends(database.get_read_db)
 ):
     if current_user.role != "aluno":
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Acesso negado.")
@@ -204,23 +198,32 @@ def get_aluno_matriculas(
     return matriculas
 
 @router.get("/pendencias", response_model=List[PendenciaFinanceira])
-def get_aluno_pendencias_financeiras(
-    current_user: models.usuario.Usuario = Depends(auth.get_current_active_user),
-    db: Session = Depends(database.get_db)
+async def get_aluno_pendencias_financeiras(
+    current_user: auth.UsuarioPrincipal = Depends(auth.get_current_active_user),
+    db: AsyncSession = Depends(database.get_async_read_db)
 ):
     if current_user.role != "aluno":
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Acesso negado.")
-    aluno_profile = db.query(models.aluno.Aluno).filter(models.aluno.Aluno.usuario_id == current_user.id).first()
+    aluno_profile = await db.scalar(
+        select(models.aluno.Aluno).where(models.aluno.Aluno.usuario_id == current_user.id).limit(1)
+    )
     if not aluno_profile:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Perfil de aluno não encontrado.")
     pendencias = []
-    mensalidades = db.query(Mensalidade).filter(Mensalidade.aluno_id == aluno_profile.id).all()
+    # Plano e evento vêm na mesma consulta (sessão async não faz lazy load)
+    result = await db.scalars(
+        select(Mensalidade).options(joinedload(Mensalidade.plano)).where(Mensalidade.aluno_id == aluno_profile.id)
+    )
+    mensalidades = result.unique().all()
     for m in mensalidades:
         pendencias.append(PendenciaFinanceira(
             tipo='mensalidade', id=m.id, descricao=f"Mensalidade - {m.plano.nome}",
             data_vencimento=m.data_vencimento, valor=m.valor, status=m.status
         ))
-    inscricoes = db.query(Inscricao).filter(Inscricao.aluno_id == aluno_profile.id).all()
+    result = await db.scalars(
+        select(Inscricao).options(joinedload(Inscricao.evento)).where(Inscricao.aluno_id == aluno_profile.id)
+    )
+    inscricoes = result.unique().all()
     for i in inscricoes:
         pendencias.append(PendenciaFinanceira(
             tipo='inscricao', id=i.id, descricao=f"Inscrição - {i.evento.nome}",
@@ -231,13 +234,16 @@ def get_aluno_pendencias_financeiras(
 
 @router.get("/eventos", response_model=List[SchemasEventoRead])
 def get_portal_eventos(
-    current_user: models.usuario.Usuario = Depends(auth.get_current_active_user),
-    db: Session = Depends(database.get_db)
+    current_user: auth.UsuarioPrincipal = Depends(auth.get_current_active_user),
+    db: Session = Depends(database.get_read_db)
 ):
     aluno_profile = db.query(models.aluno.Aluno).filter(models.aluno.Aluno.usuario_id == current_user.id).first()
     if not aluno_profile:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Perfil de aluno não encontrado.")
-    todos_eventos = db.query(Evento).order_by(Evento.data_evento.desc()).all()
+    # EventoRead serializa inscricoes -> aluno: carrega tudo em lote em vez de uma consulta por evento/inscrição
+    todos_eventos = db.query(Evento).options(
+        selectinload(Evento.inscricoes).joinedload(Inscricao.aluno)
+    ).order_by(Evento.data_evento.desc()).all()
     inscricoes_aluno = db.query(Inscricao.evento_id).filter(Inscricao.aluno_id == aluno_profile.id).all()
     eventos_inscritos_ids = {inscricao.evento_id for inscricao in inscricoes_aluno}
     eventos_com_status = []
@@ -250,7 +256,7 @@ def get_portal_eventos(
 @router.post("/eventos/{evento_id}/inscrever", response_model=InscricaoRead)
 def inscrever_aluno_evento(
     evento_id: int,
-    current_user: models.usuario.Usuario = Depends(auth.get_current_active_user),
+    current_user: auth.UsuarioPrincipal = Depends(auth.get_current_active_user),
     db: Session = Depends(database.get_db)
 ):
     aluno_profile = db.query(models.aluno.Aluno).filter(models.aluno.Aluno.usuario_id == current_user.id).first()
@@ -269,7 +275,12 @@ def inscrever_aluno_evento(
         db_inscricao.status = "pago"
         db_inscricao.metodo_pagamento = "Gratuito"
     db.add(db_inscricao)
-    db.commit()
+    try:
+        db.commit()
+    except IntegrityError:
+        # Dois cliques simultâneos passam pela verificação acima; o índice único barra o segundo
+        db.rollback()
+        raise HTTPException(status_code=400, detail="Você já está inscrito neste evento.")
     db.refresh(db_inscricao)
     return db_inscricao
 
@@ -278,24 +289,35 @@ class PasswordUpdate(BaseModel):
     new_password: str = Field(..., min_length=6, title="Nova Senha")
     
     
+def _get_db_user(db: Session, user_id: int):
+    return db.query(models.usuario.Usuario).filter(models.usuario.Usuario.id == user_id).first()
+
+def _save_new_password(db: Session, db_user, hashed_password: str):
+    db_user.hashed_password = hashed_password
+    db.add(db_user)
+    db.commit()
+    auth.invalidate_user_cache(db_user.id)
+    auth.revoke_user_refresh_tokens(db, db_user.id)
+
 @router.put("/me/update-password", status_code=status.HTTP_204_NO_CONTENT)
-def update_current_aluno_password(
+async def update_current_aluno_password(
     password_data: PasswordUpdate,
-    current_user: models.usuario.Usuario = Depends(auth.get_current_active_user),
+    current_user: auth.UsuarioPrincipal = Depends(auth.get_current_active_user),
     db: Session = Depends(database.get_db)
 ):
     """
     Permite ao aluno logado atualizar sua própria senha.
     """
-    if not auth.verify_password(password_data.current_password, current_user.hashed_password):
+    # current_user é um snapshot em cache; a senha é lida/gravada no registro real
+    db_user = await run_in_threadpool(_get_db_user, db, current_user.id)
+    if not db_user or not db_user.hashed_password or not await password_hashing.verify_password_async(password_data.current_password, db_user.hashed_password):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="A senha atual está incorreta."
         )
     
-    current_user.hashed_password = auth.get_password_hash(password_data.new_password)
-    db.add(current_user)
-    db.commit()
+    hashed_password = await password_hashing.hash_password_async(password_data.new_password)
+    await run_in_threadpool(_save_new_password, db, db_user, hashed_password)
     
     # Agora retorna o Response correto do FastAPI
     return Response(status_code=status.HTTP_204_NO_CONTENT)
\ No newline at end of file
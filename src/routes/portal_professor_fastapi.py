@@ -5,8 +5,8 @@ from datetime import datetime
 from typing import List, Optional
 from pydantic import BaseModel
 
-from src.database import get_db
-from src import auth, models
+from src.database import get_db, get_read_db
+from src import auth, models, search
 from src.models.mensalidade import Mensalidade
 from src.models.financeiro import Financeiro
 from src.models.aluno import Aluno
@@ -20,7 +20,7 @@ router = APIRouter(
 )
 
 # Dependência para garantir que é Staff (Professor ou Atendente)
-async def get_current_staff(current_user: Usuario = Depends(auth.get_current_active_user)):
+async def get_current_staff(current_user: auth.UsuarioPrincipal = Depends(auth.get_current_active_user)):
     if current_user.role not in ['administrador', 'gerente', 'atendente', 'professor']:
         raise HTTPException(status_code=403, detail="Acesso restrito a equipe.")
     return current_user
@@ -34,8 +34,8 @@ async def get_current_staff(current_user: Usuario = Depends(auth.get_current_act
 @router.get("/mensalidades-pendentes")
 def list_mensalidades_pendentes(
     busca: str = None,
-    db: Session = Depends(get_db),
-    current_user: Usuario = Depends(get_current_staff)
+    db: Session = Depends(get_read_db),
+    current_user: auth.UsuarioPrincipal = Depends(get_current_staff)
 ):
     query = db.query(Mensalidade).options(
         joinedload(Mensalidade.aluno),
@@ -43,7 +43,7 @@ def list_mensalidades_pendentes(
     ).filter(Mensalidade.status == 'pendente')
 
     if busca:
-        query = query.join(Aluno).filter(Aluno.nome.ilike(f"%{busca}%"))
+        query = query.join(Aluno).filter(search.matches(Aluno, busca))
     
     mensalidades = query.order_by(Mensalidade.data_vencimento).limit(50).all()
     return mensalidades
@@ -53,7 +53,7 @@ def list_mensalidades_pendentes(
 def receber_mensalidade_dinheiro(
     id: int,
     db: Session = Depends(get_db),
-    current_user: Usuario = Depends(get_current_staff)
+    current_user: auth.UsuarioPrincipal = Depends(get_current_staff)
 ):
     mensalidade = db.query(Mensalidade).filter(Mensalidade.id == id).first()
     if not mensalidade:
@@ -9,7 +9,7 @@ from sqlalchemy.orm import Session
 from sqlalchemy.exc import IntegrityError
 import logging
 
-from src.database import get_db
+from src.database import get_db, get_read_db
 from src.models.produto import Produto
 from src.schemas.produto import ProdutoCreate, ProdutoRead, ProdutoUpdate
 
@@ -44,7 +44,7 @@ def read_produtos(
     limit: int = 100,
     nome: Optional[str] = None,
     codigo: Optional[str] = None,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """
     Lista produtos com filtros opcionais.
@@ -59,7 +59,7 @@ def read_produtos(
     return produtos
 
 @router.get("/{produto_id}", response_model=ProdutoRead)
-def read_produto(produto_id: int, db: Session = Depends(get_db)):
+def read_produto(produto_id: int, db: Session = Depends(get_read_db)):
     """
     Obtém os detalhes de um produto específico pelo ID.
     """
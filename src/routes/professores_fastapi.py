@@ -15,15 +15,13 @@ from sqlalchemy.exc import IntegrityError
 import logging
 
 # Imports para o Armazenamento Externo
-import boto3
-from botocore.client import Config
 
-from src.database import get_db
+from src.database import get_db, get_read_db
 from src.models.professor import Professor
 from src.schemas.professor import ProfessorCreate, ProfessorRead, ProfessorUpdate
 from src.auth import get_admin_or_gerente
 from src.models.usuario import Usuario as models_usuario
-from src.image_utils import process_avatar_image
+from src import search, storage
 
 router = APIRouter(
     tags=["Professores"],
@@ -52,6 +50,8 @@ def create_professor(
     """
     Cria um novo professor com upload de foto otimizada para o R2.
     """
+    # Foto inválida/grande demais é recusada antes de criar qualquer registro
+    foto_bytes = storage.read_photo(foto)
     # ... (validações de CPF/Email existentes) ...
     parsed_data_nascimento = None
     if data_nascimento:
@@ -78,33 +78,9 @@ def create_professor(
     db.commit()
     db.refresh(db_professor)
 
-    if foto and foto.filename:
-        processed_image, mime_type = process_avatar_image(foto.file)
-        
-        if processed_image:
-            s3_endpoint_url = os.getenv("S3_ENDPOINT_URL")
-            s3_access_key_id = os.getenv("AWS_ACCESS_KEY_ID")
-            s3_secret_access_key = os.getenv("AWS_SECRET_ACCESS_KEY")
-            s3_bucket_name = os.getenv("S3_BUCKET_NAME")
-            public_bucket_url = os.getenv("PUBLIC_BUCKET_URL")
-
-            if not all([s3_endpoint_url, s3_access_key_id, s3_secret_access_key, s3_bucket_name, public_bucket_url]):
-                raise HTTPException(status_code=500, detail="Configuração de armazenamento na nuvem incompleta.")
-
-            try:
-                s3_client = boto3.client('s3', endpoint_url=s3_endpoint_url, aws_access_key_id=s3_access_key_id, aws_secret_access_key=s3_secret_access_key, region_name="auto")
-                
-                base_filename, _ = os.path.splitext(foto.filename)
-                safe_filename = f"professor_{db_professor.id}_{datetime.utcnow().timestamp()}_{base_filename.replace(' ', '_')}.jpg"
-
-                s3_client.upload_fileobj(processed_image, s3_bucket_name, safe_filename, ExtraArgs={'ContentType': mime_type})
-                
-                db_professor.foto = f"{public_bucket_url.rstrip('/')}/{safe_filename}"
-                db.commit()
-                db.refresh(db_professor)
-            except Exception as e:
-                logging.error(f"Erro no upload para o R2 (professor): {e}")
-                # Não quebra a criação do professor, apenas loga o erro da foto.
+    if foto_bytes:
+        # Processamento e upload rodam em segundo plano (src/storage.py); `foto` é gravada quando terminarem
+        storage.enqueue_photo(Professor, db_professor.id, foto_bytes, foto.filename, "professor")
     return db_professor
 
 @router.put("/{professor_id}", response_model=ProfessorRead)
@@ -145,29 +121,15 @@ def update_professor(
             db_professor.data_contratacao = datetime.strptime(data_contratacao, '%Y-%m-%d').date()
         except (ValueError, TypeError): pass
 
-    if foto and foto.filename:
-        processed_image, mime_type = process_avatar_image(foto.file)
-        if processed_image:
-            s3_endpoint_url = os.getenv("S3_ENDPOINT_URL")
-            s3_access_key_id = os.getenv("AWS_ACCESS_KEY_ID")
-            s3_secret_access_key = os.getenv("AWS_SECRET_ACCESS_KEY")
-            s3_bucket_name = os.getenv("S3_BUCKET_NAME")
-            public_bucket_url = os.getenv("PUBLIC_BUCKET_URL")
-
-            if not all([s3_endpoint_url, s3_access_key_id, s3_secret_access_key, s3_bucket_name, public_bucket_url]):
-                raise HTTPException(status_code=500, detail="Configuração de armazenamento na nuvem incompleta.")
-
-            try:
-                s3_client = boto3.client('s3', endpoint_url=s3_endpoint_url, aws_access_key_id=s3_access_key_id, aws_secret_access_key=s3_secret_access_key, region_name="auto")
-                base_filename, _ = os.path.splitext(foto.filename)
-                safe_filename = f"professor_{db_professor.id}_{datetime.utcnow().timestamp()}_{base_filename.replace(' ', '_')}.jpg"
-                s3_client.upload_fileobj(processed_image, s3_bucket_name, safe_filename, ExtraArgs={'ContentType': mime_type})
-                db_professor.foto = f"{public_bucket_url.rstrip('/')}/{safe_filename}"
-            except Exception as e:
-                logging.error(f"Erro no upload para o R2 (professor): {e}")
+    # Validada já (tamanho, formato, pixels); o processamento fica para a fila
+    foto_bytes = storage.read_photo(foto)
 
     db.commit()
     db.refresh(db_professor)
+
+    if foto_bytes:
+        # Processamento e upload rodam em segundo plano (src/storage.py); `foto` é gravada quando terminarem
+        storage.enqueue_photo(Professor, db_professor.id, foto_bytes, foto.filename, "professor")
     return db_professor
 
 # --- SUAS OUTRAS ROTAS DE PROFESSOR (read_professores, etc.) PERMANECEM AQUI SEM ALTERAÇÃO ---
@@ -178,14 +140,14 @@ def read_professores(
     limit: int = 100,
     nome: Optional[str] = None,
     especialidade: Optional[str] = None,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """
     Lista professores com filtros opcionais.
     """
     query = db.query(Professor)
     if nome:
-        query = query.filter(Professor.nome.ilike(f"%{nome}%"))
+        query = query.filter(search.matches(Professor, nome))
     if especialidade:
         query = query.filter(Professor.especialidade.ilike(f"%{especialidade}%"))
         
@@ -193,7 +155,7 @@ def read_professores(
     return professores
 
 @router.get("/{professor_id}", response_model=ProfessorRead)
-def read_professor(professor_id: int, db: Session = Depends(get_db)):
+def read_professor(professor_id: int, db: Session = Depends(get_read_db)):
     """
     Obtém os detalhes de um professor específico pelo ID.
     """
@@ -213,15 +175,9 @@ def delete_professor(professor_id: int, db: Session = Depends(get_db), current_u
     if db_professor is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Professor não encontrado")
 
-    # Remove a foto se existir - CORRIGIDO
     if db_professor.foto:
-        if "r2.dev" not in db_professor.foto: # Deleta apenas se for arquivo local
-            foto_path = Path(str(BASE_DIR) + db_professor.foto)
-            if foto_path.exists():
-                try:
-                    foto_path.unlink()
-                except OSError as e:
-                    print(f"Erro ao remover foto {foto_path}: {e}")
+        # Não impede a exclusão do professor; falhas ao apagar a foto só são logadas
+        storage.delete_file(db_professor.foto)
 
     db.delete(db_professor)
     db.commit()
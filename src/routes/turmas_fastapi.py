@@ -8,7 +8,7 @@ from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session, joinedload
 import logging
 
-from src.database import get_db
+from src.database import get_db, get_read_db
 from src.models.turma import Turma
 from src.models.professor import Professor
 from src.schemas.turma import TurmaCreate, TurmaRead, TurmaUpdate
@@ -57,7 +57,7 @@ def read_turmas(
     modalidade: Optional[str] = None,
     professor_id: Optional[int] = None,
     nivel: Optional[str] = None,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """
     Lista turmas com filtros e contagem de alunos ativos.
@@ -81,7 +81,7 @@ def read_turmas(
     return turmas
 
 @router.get("/{turma_id}", response_model=TurmaRead)
-def read_turma(turma_id: int, db: Session = Depends(get_db)):
+def read_turma(turma_id: int, db: Session = Depends(get_read_db)):
     """
     Obtém os detalhes de uma turma, incluindo a contagem de alunos ativos.
     """
@@ -145,7 +145,7 @@ def list_modalidades():
     return ["Jiu-Jitsu", "Judô", "Muay Thai", "Boxe", "MMA", "Karate", "Taekwondo", "Judo"]
 
 @router.get("/utils/professores", response_model=List[dict])
-def list_professores_ativos(db: Session = Depends(get_db)):
+def list_professores_ativos(db: Session = Depends(get_read_db)):
     professores = db.query(Professor).order_by(Professor.nome).all()
     return [
         {"id": prof.id, "nome": prof.nome, "especialidade": prof.especialidade} for prof in professores
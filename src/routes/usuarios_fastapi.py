@@ -2,11 +2,11 @@
 
 from typing import List, Optional
 from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
-from sqlalchemy import or_ # <--- IMPORTANTE: Import para a busca
 
-from src import database, models, schemas
-from src.auth import get_password_hash, get_admin_user
+from src import database, models, password_hashing, schemas, search
+from src.auth import get_admin_user, invalidate_user_cache, revoke_user_refresh_tokens
 
 router = APIRouter(
     prefix="/api/v1/usuarios",
@@ -14,8 +14,7 @@ router = APIRouter(
     dependencies=[Depends(get_admin_user)] # Protege TODAS as rotas neste arquivo
 )
 
-@router.post("", response_model=schemas.usuario.UsuarioRead, status_code=status.HTTP_201_CREATED)
-def create_user(user: schemas.usuario.UsuarioCreate, db: Session = Depends(database.get_db)):
+def _check_new_user(db: Session, user: schemas.usuario.UsuarioCreate):
     # Verifica se email já existe
     if db.query(models.usuario.Usuario).filter(models.usuario.Usuario.email == user.email).first():
         raise HTTPException(status_code=400, detail="Email já registrado")
@@ -23,8 +22,8 @@ def create_user(user: schemas.usuario.UsuarioCreate, db: Session = Depends(datab
     # Verifica se username já existe
     if db.query(models.usuario.Usuario).filter(models.usuario.Usuario.username == user.username).first():
         raise HTTPException(status_code=400, detail="Nome de usuário já registrado")
-    
-    hashed_password = get_password_hash(user.password)
+
+def _insert_user(db: Session, user: schemas.usuario.UsuarioCreate, hashed_password: str):
     db_user = models.usuario.Usuario(
         email=user.email,
         username=user.username,
@@ -37,6 +36,13 @@ def create_user(user: schemas.usuario.UsuarioCreate, db: Session = Depends(datab
     db.refresh(db_user)
     return db_user
 
+@router.post("", response_model=schemas.usuario.UsuarioRead, status_code=status.HTTP_201_CREATED)
+async def create_user(user: schemas.usuario.UsuarioCreate, db: Session = Depends(database.get_db)):
+    # Consultas no threadpool; o bcrypt no pool dedicado, sem prender uma thread esperando por ele
+    await run_in_threadpool(_check_new_user, db, user)
+    hashed_password = await password_hashing.hash_password_async(user.password)
+    return await run_in_threadpool(_insert_user, db, user, hashed_password)
+
 # --- ROTA DE LEITURA ATUALIZADA COM BUSCA ---
 @router.get("", response_model=schemas.usuario.UsuarioPaginated)
 def read_users(
@@ -51,13 +57,8 @@ def read_users(
     query = db.query(models.usuario.Usuario)
 
     if busca:
-        query = query.filter(
-            or_(
-                models.usuario.Usuario.nome.ilike(f"%{busca}%"),
-                models.usuario.Usuario.email.ilike(f"%{busca}%"),
-                models.usuario.Usuario.username.ilike(f"%{busca}%")
-            )
-        )
+        # nome_busca junta nome, username e e-mail (src/search.py)
+        query = query.filter(search.matches(models.usuario.Usuario, busca))
 
     # 1. Conta o total de resultados (antes da paginação)
     total = query.count()
@@ -76,21 +77,19 @@ def read_user(user_id: int, db: Session = Depends(database.get_db)):
         raise HTTPException(status_code=404, detail="Usuário não encontrado")
     return db_user
 
-@router.put("/{user_id}", response_model=schemas.usuario.UsuarioRead)
-def update_user(user_id: int, user: schemas.usuario.UsuarioUpdate, db: Session = Depends(database.get_db)):
+def _get_user_for_update(db: Session, user_id: int, update_data: dict):
     db_user = db.query(models.usuario.Usuario).filter(models.usuario.Usuario.id == user_id).first()
     if not db_user:
         raise HTTPException(status_code=404, detail="Usuário não encontrado")
 
-    update_data = user.dict(exclude_unset=True)
-    
     if "username" in update_data and update_data["username"] != db_user.username:
          if db.query(models.usuario.Usuario).filter(models.usuario.Usuario.username == update_data["username"]).first():
             raise HTTPException(status_code=400, detail="Nome de usuário já está em uso.")
+    return db_user
 
-    if "password" in update_data:
-        db_user.hashed_password = get_password_hash(update_data["password"])
-        del update_data["password"]
+def _apply_user_update(db: Session, db_user, update_data: dict, hashed_password: Optional[str]):
+    if hashed_password:
+        db_user.hashed_password = hashed_password
         
     for key, value in update_data.items():
         setattr(db_user, key, value)
@@ -98,8 +97,24 @@ def update_user(user_id: int, user: schemas.usuario.UsuarioUpdate, db: Session =
     db.add(db_user)
     db.commit()
     db.refresh(db_user)
+    # Tokens já emitidos passam a enxergar o novo role/nome/senha imediatamente
+    invalidate_user_cache(db_user.id)
+    if hashed_password:
+        # Senha nova derruba as sessões abertas em outros aparelhos
+        revoke_user_refresh_tokens(db, db_user.id)
     return db_user
 
+@router.put("/{user_id}", response_model=schemas.usuario.UsuarioRead)
+async def update_user(user_id: int, user: schemas.usuario.UsuarioUpdate, db: Session = Depends(database.get_db)):
+    update_data = user.dict(exclude_unset=True)
+    db_user = await run_in_threadpool(_get_user_for_update, db, user_id, update_data)
+
+    hashed_password = None
+    if "password" in update_data:
+        hashed_password = await password_hashing.hash_password_async(update_data.pop("password"))
+
+    return await run_in_threadpool(_apply_user_update, db, db_user, update_data, hashed_password)
+
 @router.delete("/{user_id}", status_code=status.HTTP_204_NO_CONTENT)
 def delete_user(user_id: int, db: Session = Depends(database.get_db)):
     db_user = db.query(models.usuario.Usuario).filter(models.usuario.Usuario.id == user_id).first()
@@ -107,4 +122,5 @@ def delete_user(user_id: int, db: Session = Depends(database.get_db)):
         raise HTTPException(status_code=404, detail="Usuário não encontrado")
     db.delete(db_user)
     db.commit()
+    invalidate_user_cache(user_id)
     return None
\ No newline at end of file
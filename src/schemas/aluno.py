@@ -6,8 +6,10 @@ Schemas Pydantic para a entidade Aluno.
 """
 
 import datetime
-from typing import Optional, List
-from pydantic import BaseModel, Field, HttpUrl
+from typing import Dict, Optional, List
+from pydantic import BaseModel, Field, HttpUrl, computed_field
+
+from src import storage
 
 class AlunoBase(BaseModel):
     nome: str = Field(..., example="João da Silva")
@@ -36,7 +38,13 @@ class AlunoRead(AlunoBase):
     foto: Optional[str] = None # Garante que o campo 'foto' está aqui
     data_cadastro: datetime.datetime
     status_geral: str = "Inativo"
-    
+    inadimplente: bool = False  # preenchido na listagem (aluno_resumo)
+
+    @computed_field
+    @property
+    def foto_variantes(self) -> Optional[Dict[str, Dict[int, str]]]:
+        # {"webp": {64: url, 128: url, 250: url}, "jpeg": {...}} para <picture>/srcset
+        return storage.photo_variants(self.foto)
 
     class Config:
         from_attributes = True 
@@ -60,5 +68,6 @@ class AlunoUpdate(BaseModel):
 
 
 class AlunoPaginated(BaseModel):
-    total: int
-    alunos: List[AlunoRead]
\ No newline at end of file
+    total: Optional[int] = None  # só com include_total=true
+    alunos: List[AlunoRead]
+    next_cursor: Optional[str] = None  # None na última página
\ No newline at end of file
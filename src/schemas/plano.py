@@ -29,4 +29,4 @@ class PlanoRead(PlanoBase):
     id: int
 
     class Config:
-        orm_mode = True
\ No newline at end of file
+        from_attributes = True # Atualizado para Pydantic v2 (era orm_mode)
\ No newline at end of file
@@ -3,10 +3,12 @@
 Schemas Pydantic para a entidade Professor.
 """
 
-from pydantic import BaseModel, Field, EmailStr
-from typing import Optional
+from pydantic import BaseModel, Field, EmailStr, computed_field
+from typing import Dict, Optional
 from datetime import date
 
+from src import storage
+
 # Schema base para Professor
 class ProfessorBase(BaseModel):
     nome: str = Field(..., max_length=100)
@@ -43,6 +45,12 @@ class ProfessorUpdate(BaseModel):
 class ProfessorRead(ProfessorBase):
     id: int
 
+    @computed_field
+    @property
+    def foto_variantes(self) -> Optional[Dict[str, Dict[int, str]]]:
+        # {"webp": {64: url, 128: url, 250: url}, "jpeg": {...}} para <picture>/srcset
+        return storage.photo_variants(self.foto)
+
     class Config:
-        orm_mode = True
+        from_attributes = True # Atualizado para Pydantic v2 (era orm_mode)
 
@@ -54,5 +54,5 @@ class TurmaRead(TurmaBase):
     professor: Optional[ProfessorRead] = None
     
     class Config:
-        orm_mode = True
+        from_attributes = True # Atualizado para Pydantic v2 (era orm_mode)
 
@@ -25,7 +25,14 @@ class UsuarioRead(UsuarioBase):
 class Token(BaseModel):
     access_token: str
     token_type: str
+    refresh_token: Optional[str] = None
     user_info: UsuarioRead
+
+class RefreshTokenRequest(BaseModel):
+    refresh_token: str
+
+class LoginCodeRequest(BaseModel):
+    code: str
     
 class UsuarioPaginated(BaseModel):
     total: int
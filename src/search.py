@@ -0,0 +1,203 @@
+# -*- coding: utf-8 -*-
+"""
+Busca por nome sem acento, com prefixo e tolerância a erro de digitação.
+
+Cada entidade pesquisável (alunos, professores, usuários) tem a coluna
+`nome_busca`: o texto normalizado (minúsculo, sem acentos nem pontuação),
+preenchido no flush pelo ORM (register()). Assim "joao" encontra "João".
+
+O índice depende do banco (migração 003):
+
+- SQLite: tabela FTS5 `<tabela>_busca_fts` sobre `nome_busca` (mantida por
+  triggers) e `<tabela>_busca_vocab` (fts5vocab). Cada palavra digitada casa
+  como prefixo ("sil" -> "silva") ou, a partir de 4 letras, com palavras do
+  vocabulário a 1-2 edições de distância ("slva" -> "silva").
+- PostgreSQL: índice GIN pg_trgm em `nome_busca`; cada palavra casa como
+  substring (LIKE '%sil%') ou por similaridade de palavra (operador %>).
+- Outros bancos: LIKE na coluna normalizada (sem índice).
+
+As rotas usam apenas matches(Modelo, termo), que devolve a condição SQL.
+Para recalcular a coluna e os índices: python manage.py reindex-search
+"""
+import re
+import unicodedata
+
+from sqlalchemy import Integer, event, literal, or_, and_, text
+from sqlalchemy.pool import Pool
+
+SEARCH_COLUMN = "nome_busca"
+FUZZY_MIN_LENGTH = 4
+
+_NON_WORD_RE = re.compile(r"[^0-9a-z]+")
+
+# tabela -> (modelo, campos de origem)
+SEARCHABLE = {}
+
+
+def normalize(value) -> str:
+    """'João  da Silva-Sauro' -> 'joao da silva sauro'."""
+    if not value:
+        return ""
+    decomposed = unicodedata.normalize("NFKD", str(value))
+    without_accents = "".join(ch for ch in decomposed if not unicodedata.combining(ch))
+    return _NON_WORD_RE.sub(" ", without_accents.lower()).strip()
+
+
+def search_text(target, fields) -> str:
+    return normalize(" ".join(str(getattr(target, field) or "") for field in fields))
+
+
+def register(model, *fields):
+    """Mantém `nome_busca` a partir de `fields` em todo INSERT/UPDATE feito pelo ORM."""
+    SEARCHABLE[model.__tablename__] = (model, fields)
+
+    def _fill(mapper, connection, target):
+        setattr(target, SEARCH_COLUMN, search_text(target, fields))
+
+    event.listen(model, "before_insert", _fill)
+    event.listen(model, "before_update", _fill)
+
+
+def backend() -> str:
+    from src.database import DATABASE_URL
+
+    if DATABASE_URL.startswith("sqlite"):
+        return "fts5"
+    if DATABASE_URL.startswith("postgresql"):
+        return "pg_trgm"
+    return "like"
+
+
+def max_distance(token: str) -> int:
+    if len(token) < FUZZY_MIN_LENGTH:
+        return 0
+    return 1 if len(token) < 8 else 2
+
+
+def edit_distance(a: str, b: str, limit: int) -> int:
+    """Levenshtein com corte: devolve limit + 1 assim que a distância passa de `limit`."""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i]
+        for j, char_b in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (char_a != char_b)))
+        if min(current) > limit:
+            return limit + 1
+        previous = current
+    return previous[-1]
+
+
+# --- CONDIÇÕES SQL ---
+
+def _fts5_token_clause(model, token, index):
+    table = model.__tablename__
+    params = {f"{table}_busca_{index}": token}
+    match = f"'\"' || :{table}_busca_{index} || '\"*'"
+    distance = max_distance(token)
+    if distance:
+        # Palavras do vocabulário a até `distance` edições (vocabulário = palavras distintas, bem menor que a tabela)
+        params.update({f"{table}_busca_d{index}": distance,
+                       f"{table}_busca_min{index}": len(token) - distance,
+                       f"{table}_busca_max{index}": len(token) + distance})
+        match += (
+            f" || coalesce((SELECT ' OR ' || group_concat('\"' || term || '\"', ' OR ') FROM {table}_busca_vocab"
+            f" WHERE length(term) BETWEEN :{table}_busca_min{index} AND :{table}_busca_max{index}"
+            f" AND busca_fuzzy(term, :{table}_busca_{index}, :{table}_busca_d{index})), '')"
+        )
+    subquery = text(
+        f"SELECT rowid FROM {table}_busca_fts WHERE {table}_busca_fts MATCH ({match})"
+    ).bindparams(**params).columns(rowid=Integer)
+    return model.id.in_(subquery)
+
+
+def _trgm_token_clause(model, token):
+    column = getattr(model, SEARCH_COLUMN)
+    clause = column.like(f"%{token}%")
+    if max_distance(token):
+        clause = or_(clause, column.op("%>")(literal(token)))
+    return clause
+
+
+def matches(model, termo: str):
+    """Condição para .where()/.filter(): todas as palavras de `termo` precisam casar."""
+    tokens = normalize(termo).split()
+    if not tokens:
+        # Sem termo, não filtra; termo só com símbolos ("@@", "-") não casa com nada (como o ilike antigo)
+        return literal(True) if not termo else literal(False)
+    kind = backend()
+    if kind == "fts5":
+        clauses = [_fts5_token_clause(model, token, i) for i, token in enumerate(tokens)]
+    elif kind == "pg_trgm":
+        clauses = [_trgm_token_clause(model, token) for token in tokens]
+    else:
+        clauses = [getattr(model, SEARCH_COLUMN).like(f"%{token}%") for token in tokens]
+    return and_(*clauses)
+
+
+# --- SQLITE: função usada pela busca aproximada ---
+
+def _busca_fuzzy(term, token, distance):
+    return edit_distance(term, token, distance) <= distance
+
+
+@event.listens_for(Pool, "connect")
+def _register_sqlite_function(dbapi_connection, connection_record):
+    # sqlite3 e o adaptador do aiosqlite têm create_function; o psycopg2/asyncpg não
+    create_function = getattr(dbapi_connection, "create_function", None)
+    if create_function is not None:
+        create_function("busca_fuzzy", 3, _busca_fuzzy, deterministic=True)
+
+
+# --- ÍNDICES (migração 003 e reindex) ---
+
+def _fts5_ddl(table):
+    fts, column = f"{table}_busca_fts", SEARCH_COLUMN
+    return [
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5("
+        f"{column}, content='{table}', content_rowid='id', tokenize='unicode61 remove_diacritics 2')",
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {table}_busca_vocab USING fts5vocab({fts}, 'row')",
+        f"CREATE TRIGGER IF NOT EXISTS {table}_busca_ai AFTER INSERT ON {table} BEGIN "
+        f"INSERT INTO {fts}(rowid, {column}) VALUES (new.id, new.{column}); END",
+        f"CREATE TRIGGER IF NOT EXISTS {table}_busca_ad AFTER DELETE ON {table} BEGIN "
+        f"INSERT INTO {fts}({fts}, rowid, {column}) VALUES ('delete', old.id, old.{column}); END",
+        f"CREATE TRIGGER IF NOT EXISTS {table}_busca_au AFTER UPDATE OF {column} ON {table} BEGIN "
+        f"INSERT INTO {fts}({fts}, rowid, {column}) VALUES ('delete', old.id, old.{column}); "
+        f"INSERT INTO {fts}(rowid, {column}) VALUES (new.id, new.{column}); END",
+    ]
+
+
+def backfill(conn, table):
+    """Recalcula nome_busca de todas as linhas da tabela (em lotes)."""
+    _, fields = SEARCHABLE[table]
+    rows = conn.execute(text(f"SELECT id, {', '.join(fields)} FROM {table}")).fetchall()
+    updates = [{"id": row[0], "valor": normalize(" ".join(str(v or "") for v in row[1:]))} for row in rows]
+    for start in range(0, len(updates), 1000):
+        conn.execute(text(f"UPDATE {table} SET {SEARCH_COLUMN} = :valor WHERE id = :id"), updates[start:start + 1000])
+    return len(updates)
+
+
+def create_indexes(conn):
+    """Índices de busca do banco conectado (idempotente)."""
+    dialect = conn.dialect.name
+    if dialect == "postgresql":
+        conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+    for table in SEARCHABLE:
+        if dialect == "sqlite":
+            for statement in _fts5_ddl(table):
+                conn.execute(text(statement))
+        elif dialect == "postgresql":
+            conn.execute(text(
+                f"CREATE INDEX IF NOT EXISTS ix_{table}_{SEARCH_COLUMN}_trgm "
+                f"ON {table} USING gin ({SEARCH_COLUMN} gin_trgm_ops)"
+            ))
+
+
+def rebuild(conn):
+    """Recalcula nome_busca e reconstrói o FTS5 (após UPDATE em massa fora do ORM)."""
+    counts = {table: backfill(conn, table) for table in SEARCHABLE}
+    if conn.dialect.name == "sqlite":
+        for table in SEARCHABLE:
+            conn.execute(text(f"INSERT INTO {table}_busca_fts({table}_busca_fts) VALUES ('rebuild')"))
+    return counts
@@ -0,0 +1,302 @@
+# -*- coding: utf-8 -*-
+"""
+Log de consultas lentas com EXPLAIN automático.
+
+Desligado por padrão (SLOW_QUERY_THRESHOLD_MS=0). Com um limite configurado,
+todo comando SQL que passa dele é entregue a uma thread, que:
+
+- agrupa por "fingerprint" (o SQL normalizado de sql_instrumentation, sem
+  literais): contagem, tempo total/máximo e as rotas que o executaram;
+- roda o plano de execução do comando (SQLite: EXPLAIN QUERY PLAN; PostgreSQL:
+  EXPLAIN, sem ANALYZE, então nada é reexecutado), no máximo uma vez por
+  fingerprint a cada SLOW_QUERY_EXPLAIN_INTERVAL_SECONDS;
+- grava uma linha JSON em SLOW_QUERY_LOG_FILE (log próprio, com rotação; o
+  padrão logs/slow_queries.log fica fora do git).
+
+O EXPLAIN roda no banco da aplicação: em produção, SLOW_QUERY_EXPLAIN=0 mantém
+só o log e o agrupamento.
+
+Os parâmetros são registrados mascarados: só o tipo e o tamanho, preservando os
+curingas de LIKE ('%<str:4>%'), o que basta para ver por que o índice não foi usado.
+
+Top-N por fingerprint: GET /api/v1/_internal/slow-queries (por worker).
+"""
+import hashlib
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import re
+import threading
+import time
+from datetime import datetime, timezone
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from src import logging_config
+from src.sql_instrumentation import statement_shape
+
+SLOW_QUERY_THRESHOLD_MS = float(os.environ.get("SLOW_QUERY_THRESHOLD_MS", "0"))
+SLOW_QUERY_LOG_FILE = os.environ.get("SLOW_QUERY_LOG_FILE", os.path.join("logs", "slow_queries.log"))
+SLOW_QUERY_EXPLAIN = os.environ.get("SLOW_QUERY_EXPLAIN", "1") == "1"
+SLOW_QUERY_EXPLAIN_INTERVAL_SECONDS = float(os.environ.get("SLOW_QUERY_EXPLAIN_INTERVAL_SECONDS", "300"))
+SLOW_QUERY_MAX_FINGERPRINTS = int(os.environ.get("SLOW_QUERY_MAX_FINGERPRINTS", "500"))
+
+ENABLED = SLOW_QUERY_THRESHOLD_MS > 0
+
+logger = logging.getLogger("academia.slow_query")
+
+_EXPLAINABLE_RE = re.compile(r"^\s*(?:SELECT|WITH|UPDATE|DELETE)\b", re.IGNORECASE)
+_ASYNCPG_PARAM_RE = re.compile(r"\$\d+")
+
+
+def redact(value):
+    """Tipo e tamanho no lugar do valor (curingas de LIKE nas pontas são mantidos)."""
+    if value is None or isinstance(value, bool):
+        return value
+    if isinstance(value, str):
+        core = value.strip("%")
+        prefix = "%" if value.startswith("%") else ""
+        suffix = "%" if value.endswith("%") and core else ""
+        return f"{prefix}<str:{len(core)}>{suffix}"
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return f"<bytes:{len(value)}>"
+    return f"<{type(value).__name__}>"
+
+
+def redact_parameters(parameters):
+    if isinstance(parameters, list) and parameters and isinstance(parameters[0], (dict, list, tuple)):
+        # executemany: só a quantidade de linhas e a primeira
+        return {"rows": len(parameters), "first": redact_parameters(parameters[0])}
+    if isinstance(parameters, dict):
+        return {key: redact(value) for key, value in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        return [redact(value) for value in parameters]
+    return redact(parameters)
+
+
+def fingerprint(shape: str) -> str:
+    return hashlib.sha1(shape.encode("utf-8")).hexdigest()[:12]
+
+
+class SlowQueryStats:
+    """Agregado por fingerprint (só a thread do log escreve; as rotas leem uma cópia)."""
+
+    def __init__(self, max_fingerprints=SLOW_QUERY_MAX_FINGERPRINTS):
+        self.max_fingerprints = max_fingerprints
+        self.entries = {}
+        self.evicted = 0
+        self._lock = threading.Lock()
+
+    def add(self, item) -> dict:
+        with self._lock:
+            entry = self.entries.get(item["fingerprint"])
+            if entry is None:
+                if len(self.entries) >= self.max_fingerprints:
+                    # Descarta o fingerprint que menos pesou no total
+                    del self.entries[min(self.entries, key=lambda key: self.entries[key]["total_ms"])]
+                    self.evicted += 1
+                entry = self.entries[item["fingerprint"]] = {
+                    "fingerprint": item["fingerprint"],
+                    "statement": item["shape"],
+                    "count": 0,
+                    "total_ms": 0.0,
+                    "max_ms": 0.0,
+                    "routes": {},
+                    "explain": None,
+                    "explained_at": 0.0,
+                }
+            entry["count"] += 1
+            entry["total_ms"] += item["duration_ms"]
+            if item["duration_ms"] >= entry["max_ms"]:
+                entry["max_ms"] = item["duration_ms"]
+                entry["slowest_parameters"] = item["parameters"]
+            route = item["route"] or "<fora de requisição>"
+            entry["routes"][route] = entry["routes"].get(route, 0) + 1
+            entry["last_seen"] = item["ts"]
+            return entry
+
+    def top(self, limit=20, order_by="total_ms") -> list:
+        with self._lock:
+            entries = sorted(self.entries.values(), key=lambda entry: -entry[order_by])[:limit]
+            result = []
+            for entry in entries:
+                item = {key: value for key, value in entry.items() if key != "explained_at"}
+                item["total_ms"] = round(entry["total_ms"], 1)
+                item["max_ms"] = round(entry["max_ms"], 1)
+                item["avg_ms"] = round(entry["total_ms"] / entry["count"], 1)
+                item["routes"] = dict(sorted(entry["routes"].items(), key=lambda kv: -kv[1]))
+                result.append(item)
+            return result
+
+    def reset(self):
+        with self._lock:
+            self.entries.clear()
+            self.evicted = 0
+
+
+stats = SlowQueryStats()
+
+
+# --- EXPLAIN ---
+
+def _sync_engine_for(engine):
+    """Engine síncrona equivalente (o EXPLAIN roda na thread do log, fora do event loop)."""
+    if not engine.dialect.is_async:
+        return engine
+    from src import database
+
+    async_engine = database.get_async_engine_if_created()
+    if async_engine is not None and async_engine.sync_engine is engine:
+        return database.engine
+    async_read_engine = database.get_async_read_engine_if_created()
+    if async_read_engine is not None and async_read_engine.sync_engine is engine:
+        return database.read_engine
+    return None
+
+
+def explain(engine, statement, parameters) -> list:
+    target = _sync_engine_for(engine)
+    if target is None:
+        return ["(engine sem equivalente síncrono)"]
+    if engine.dialect.driver == "asyncpg" and target.dialect.name == "postgresql":
+        # asyncpg usa $1, $2...; o psycopg2 usa %s (os parâmetros já estão na ordem)
+        statement = _ASYNCPG_PARAM_RE.sub("%s", statement.replace("%", "%%"))
+    if target.dialect.name == "sqlite":
+        with target.connect() as conn:
+            rows = conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters).fetchall()
+        # (id, parent, notused, detail): indenta pelo nível na árvore do plano
+        depth = {0: -1}
+        lines = []
+        for row in rows:
+            depth[row[0]] = depth.get(row[1], -1) + 1
+            lines.append("  " * depth[row[0]] + row[3])
+        return lines
+    with target.connect() as conn:
+        return [row[0] for row in conn.exec_driver_sql(f"EXPLAIN {statement}", parameters).fetchall()]
+
+
+# --- THREAD DO LOG ---
+
+class _SlowQueryWorker:
+    def __init__(self, max_queue=1000):
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.dropped = 0
+        self.thread_id = None
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def submit(self, item):
+        if self._thread is None:
+            self._start()
+        try:
+            self.queue.put_nowait(item)
+        except queue.Full:
+            self.dropped += 1
+
+    def _start(self):
+        with self._lock:
+            if self._thread is None:
+                _configure_logger()
+                self._thread = threading.Thread(target=self._run, name="slow-query-log", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        self.thread_id = threading.get_ident()
+        while True:
+            item = self.queue.get()
+            try:
+                self._handle(item)
+            except Exception:
+                logger.exception("Falha ao registrar consulta lenta")
+
+    def _handle(self, item):
+        entry = stats.add(item)
+        record = {
+            "event": "slow_query",
+            "fingerprint": item["fingerprint"],
+            "duration_ms": round(item["duration_ms"], 1),
+            "statement": item["statement"],
+            "parameters": item["parameters"],
+            "route": item["route"],
+            "request_id": item["request_id"],
+        }
+        now = time.monotonic()
+        if (SLOW_QUERY_EXPLAIN and item["explain_parameters"] is not None
+                and now - entry["explained_at"] >= SLOW_QUERY_EXPLAIN_INTERVAL_SECONDS):
+            entry["explained_at"] = now
+            try:
+                entry["explain"] = explain(item["engine"], item["statement"], item["explain_parameters"])
+            except Exception as e:
+                entry["explain"] = [f"(EXPLAIN falhou: {type(e).__name__}: {e})"]
+            record["explain"] = entry["explain"]
+        logger.warning(json.dumps(record, ensure_ascii=False, default=str))
+
+
+_worker = _SlowQueryWorker()
+
+
+def _configure_logger():
+    """Arquivo próprio (com a mesma rotação do app.log); não repete no log principal."""
+    if not SLOW_QUERY_LOG_FILE or logger.handlers:
+        return
+    log_dir = os.path.dirname(SLOW_QUERY_LOG_FILE)
+    if log_dir:
+        os.makedirs(log_dir, exist_ok=True)
+    handler = logging.handlers.RotatingFileHandler(
+        SLOW_QUERY_LOG_FILE, maxBytes=logging_config.LOG_MAX_BYTES,
+        backupCount=logging_config.LOG_BACKUP_COUNT, encoding="utf-8",
+    )
+    handler.setFormatter(logging_config.JsonFormatter())
+    logger.addHandler(handler)
+    logger.propagate = False
+
+
+def worker_stats() -> dict:
+    return {"queued": _worker.queue.qsize(), "dropped": _worker.dropped, "evicted_fingerprints": stats.evicted}
+
+
+# --- LISTENERS ---
+
+if ENABLED:
+    @event.listens_for(Engine, "before_cursor_execute")
+    def _slow_before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if _worker.thread_id == threading.get_ident():
+            return  # o próprio EXPLAIN
+        conn.info.setdefault("_slow_query_start", []).append(time.perf_counter())
+
+    @event.listens_for(Engine, "after_cursor_execute")
+    def _slow_after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        starts = conn.info.get("_slow_query_start")
+        if not starts:
+            return
+        duration_ms = (time.perf_counter() - starts.pop()) * 1000
+        if duration_ms < SLOW_QUERY_THRESHOLD_MS:
+            return
+        log_context = logging_config.current_context()
+        route = None
+        if log_context is not None:
+            route = f"{log_context.scope.get('method')} {log_context.route or log_context.scope.get('path')}"
+        explainable = not executemany and _EXPLAINABLE_RE.match(statement)
+        shape = statement_shape(statement)
+        _worker.submit({
+            "ts": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "engine": conn.engine,
+            "statement": statement,
+            "shape": shape,
+            "fingerprint": fingerprint(shape),
+            "duration_ms": duration_ms,
+            "parameters": redact_parameters(parameters),
+            "explain_parameters": parameters if explainable else None,
+            "route": route,
+            "request_id": log_context.request_id if log_context is not None else None,
+        })
+
+    @event.listens_for(Engine, "handle_error")
+    def _slow_handle_error(exception_context):
+        conn = exception_context.connection
+        starts = conn.info.get("_slow_query_start") if conn is not None else None
+        if starts:
+            starts.pop()
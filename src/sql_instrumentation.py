@@ -0,0 +1,162 @@
+# -*- coding: utf-8 -*-
+"""
+Instrumentação de SQL por requisição.
+
+Listeners before/after_cursor_execute (registrados na classe Engine, então valem
+para a engine síncrona e para a assíncrona) contam as consultas e o tempo de banco
+da requisição atual. O middleware publica o resultado no header `Server-Timing`
+(visível no DevTools do navegador) e em uma linha de log estruturada.
+
+Se o mesmo formato de SQL roda mais de SQL_N_PLUS_ONE_THRESHOLD vezes em uma
+requisição, ela é marcada como provável N+1 (típico de relacionamento lazy
+acessado dentro de um loop).
+"""
+import contextvars
+import json
+import logging
+import os
+import re
+import time
+from collections import Counter
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+SQL_N_PLUS_ONE_THRESHOLD = int(os.environ.get("SQL_N_PLUS_ONE_THRESHOLD", "10"))
+
+logger = logging.getLogger("academia.sql")
+
+_current_stats = contextvars.ContextVar("request_sql_stats", default=None)
+
+_WHITESPACE_RE = re.compile(r"\s+")
+# Listas de IN com quantidades variáveis de parâmetros viram um único formato
+_IN_LIST_RE = re.compile(r"\(\s*(?:\?|%\(\w+\)s|\$\d+|:\w+)(?:\s*,\s*(?:\?|%\(\w+\)s|\$\d+|:\w+))*\s*\)")
+_LITERAL_RE = re.compile(r"'(?:[^']|'')*'|\b\d+\b")
+
+
+def statement_shape(statement: str) -> str:
+    """Normaliza o SQL para agrupar execuções da mesma consulta com parâmetros diferentes."""
+    shape = _WHITESPACE_RE.sub(" ", statement).strip()
+    shape = _LITERAL_RE.sub("?", shape)
+    shape = _IN_LIST_RE.sub("(?)", shape)
+    return shape
+
+
+class RequestSqlStats:
+    __slots__ = ("query_count", "db_time", "shapes")
+
+    def __init__(self):
+        self.query_count = 0
+        self.db_time = 0.0
+        self.shapes = Counter()
+
+    def suspected_n_plus_one(self, threshold=None):
+        threshold = SQL_N_PLUS_ONE_THRESHOLD if threshold is None else threshold
+        return [(shape, count) for shape, count in self.shapes.most_common() if count > threshold]
+
+
+def current_stats():
+    """Estatísticas da requisição em andamento (None fora de uma requisição)."""
+    return _current_stats.get()
+
+
+def start_request_stats():
+    """Abre um escopo de contagem. Retorna (stats, token) — devolva o token em reset_request_stats."""
+    stats = RequestSqlStats()
+    return stats, _current_stats.set(stats)
+
+
+def reset_request_stats(token):
+    _current_stats.reset(token)
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current_stats.get() is not None:
+        conn.info.setdefault("_query_start", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = _current_stats.get()
+    if stats is None:
+        return
+    starts = conn.info.get("_query_start")
+    if not starts:
+        return
+    stats.db_time += time.perf_counter() - starts.pop()
+    stats.query_count += 1
+    stats.shapes[statement_shape(statement)] += 1
+
+
+@event.listens_for(Engine, "handle_error")
+def _handle_error(exception_context):
+    # after_cursor_execute não roda quando a consulta falha: sem isso o início
+    # ficaria na pilha e a próxima consulta da conexão pegaria o tempo errado
+    conn = exception_context.connection
+    starts = conn.info.get("_query_start") if conn is not None else None
+    if not starts:
+        return
+    elapsed = time.perf_counter() - starts.pop()
+    stats = _current_stats.get()
+    if stats is not None and exception_context.statement is not None:
+        stats.db_time += elapsed
+        stats.query_count += 1
+        stats.shapes[statement_shape(exception_context.statement)] += 1
+
+
+class SqlInstrumentationMiddleware:
+    """Middleware ASGI: abre o escopo de contagem, escreve Server-Timing e registra o resumo."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats, token = start_request_stats()
+        start = time.perf_counter()
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                total_ms = (time.perf_counter() - start) * 1000
+                server_timing = (
+                    f'db;dur={stats.db_time * 1000:.1f};desc="{stats.query_count} queries", '
+                    f"app;dur={total_ms:.1f}"
+                )
+                message.setdefault("headers", [])
+                message["headers"] = list(message["headers"]) + [(b"server-timing", server_timing.encode("latin-1"))]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            reset_request_stats(token)
+            self._log(scope, stats, status_code, time.perf_counter() - start)
+
+    @staticmethod
+    def _log(scope, stats, status_code, duration):
+        if stats.query_count == 0:
+            return
+        route = scope.get("route")
+        suspects = stats.suspected_n_plus_one()
+        record = {
+            "event": "request_sql",
+            "method": scope.get("method"),
+            "path": scope.get("path"),
+            "route": getattr(route, "path", None),
+            "status": status_code,
+            "duration_ms": round(duration * 1000, 1),
+            "db_ms": round(stats.db_time * 1000, 1),
+            "queries": stats.query_count,
+        }
+        if suspects:
+            record["n_plus_one"] = [{"count": count, "statement": shape[:300]} for shape, count in suspects]
+            logger.warning(json.dumps(record, ensure_ascii=False))
+        else:
+            logger.info(json.dumps(record, ensure_ascii=False))
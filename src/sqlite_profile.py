@@ -0,0 +1,193 @@
+# -*- coding: utf-8 -*-
+"""
+Perfil de produção para SQLite (unidades menores rodam com o arquivo local).
+
+Com o modo de journal padrão (DELETE), um leitor segura o arquivo enquanto um
+escritor tenta gravar, e webhooks de pagamento + painel da recepção gravando ao
+mesmo tempo terminam em "database is locked". Aqui:
+
+- cada conexão nova recebe os PRAGMAs do perfil (evento `connect`): WAL,
+  synchronous=NORMAL, busy_timeout, mmap_size, cache_size e temp_store=MEMORY.
+  Em WAL, leitores nunca bloqueiam o escritor e vice-versa;
+- as escritas passam por um escritor serializado: a primeira instrução
+  INSERT/UPDATE/DELETE de uma transação espera a vez no lock do processo e abre
+  `BEGIN IMMEDIATE`, que reserva o lock de escrita do SQLite logo no início
+  (entre processos, a fila é a do busy_timeout). A vez é da conexão e dura só a
+  transação: volta no COMMIT/ROLLBACK/close. Sem o BEGIN IMMEDIATE, o BEGIN
+  implícito é DEFERRED e a transação que leu antes de gravar pode falhar na hora
+  com "database is locked" ao promover o lock. Leitores não entram na fila;
+- a mesma thread não espera por ela mesma: se outra conexão da thread já está
+  com a vez (duas sessões, ou rotas async intercalando requisições no event
+  loop), a nova escrita falha na hora em vez de travar o busy_timeout inteiro
+  esperando um COMMIT que nunca chegaria.
+
+O escritor serializado vale para a engine síncrona. As rotas async atuais só
+leem; escritas async continuam protegidas pelo WAL + busy_timeout.
+
+Configuração por variáveis de ambiente:
+- SQLITE_PROFILE: 'production' (padrão) ou 'off' (comportamento antigo).
+- SQLITE_BUSY_TIMEOUT_MS (padrão 5000), SQLITE_MMAP_SIZE (padrão 268435456 = 256 MB),
+  SQLITE_CACHE_SIZE (padrão -65536 = 64 MB; negativo = KiB), SQLITE_SYNCHRONOUS (padrão NORMAL).
+- SQLITE_SERIALIZE_WRITES: '1' (padrão) ou '0'.
+"""
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+
+from sqlalchemy import event
+
+SQLITE_PROFILE = os.environ.get("SQLITE_PROFILE", "production")
+SQLITE_BUSY_TIMEOUT_MS = int(os.environ.get("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+SQLITE_MMAP_SIZE = int(os.environ.get("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+SQLITE_CACHE_SIZE = int(os.environ.get("SQLITE_CACHE_SIZE", "-65536"))
+SQLITE_SYNCHRONOUS = os.environ.get("SQLITE_SYNCHRONOUS", "NORMAL")
+SQLITE_SERIALIZE_WRITES = os.environ.get("SQLITE_SERIALIZE_WRITES", "1") == "1"
+
+logger = logging.getLogger("academia.sqlite")
+
+_WRITE_RE = re.compile(r"^\s*(INSERT|UPDATE|DELETE|REPLACE)\b", re.IGNORECASE)
+
+# Um escritor por vez no processo; _writer_holder é a conexão com a vez (e a thread dela)
+_writer_lock = threading.Lock()
+_writer_holder = None
+_writer_stats_lock = threading.Lock()
+_writer_stats = {"acquired_total": 0, "wait_seconds_total": 0.0, "timeouts_total": 0, "reentry_total": 0}
+
+
+def is_enabled(url: str) -> bool:
+    """O perfil vale para SQLite em arquivo (em memória não há WAL nem concorrência entre conexões)."""
+    if SQLITE_PROFILE == "off" or not url.startswith("sqlite"):
+        return False
+    return ":memory:" not in url and url.rstrip("/") not in ("sqlite:", "sqlite+aiosqlite:")
+
+
+class SerializedWriterConnection(sqlite3.Connection):
+    """Conexão sqlite3 que abre as transações de escrita com BEGIN IMMEDIATE, uma por vez no processo."""
+
+    holds_writer_lock = False
+    writer_thread = None
+
+    def begin_write(self):
+        if self.holds_writer_lock:
+            return
+        holder = _writer_holder
+        if holder is not None and holder is not self and holder.writer_thread == threading.get_ident():
+            # A própria thread segura a vez em outra conexão: esperar aqui nunca terminaria
+            with _writer_stats_lock:
+                _writer_stats["reentry_total"] += 1
+            raise sqlite3.OperationalError(
+                "database is locked (esta thread já tem uma transação de escrita aberta em outra conexão; "
+                "faça o commit dela antes de gravar por outra sessão)"
+            )
+        start = time.perf_counter()
+        if not _writer_lock.acquire(timeout=SQLITE_BUSY_TIMEOUT_MS / 1000):
+            with _writer_stats_lock:
+                _writer_stats["timeouts_total"] += 1
+            raise sqlite3.OperationalError("database is locked (fila de escrita esgotou o busy_timeout)")
+        self._hold_writer_lock()
+        try:
+            if not self.in_transaction:
+                # Entre processos, a fila é a do próprio SQLite (busy_timeout)
+                self.execute("BEGIN IMMEDIATE")
+        except sqlite3.OperationalError:
+            self._release_writer_lock()
+            with _writer_stats_lock:
+                _writer_stats["timeouts_total"] += 1
+            raise
+        with _writer_stats_lock:
+            _writer_stats["acquired_total"] += 1
+            _writer_stats["wait_seconds_total"] += time.perf_counter() - start
+
+    def _hold_writer_lock(self):
+        global _writer_holder
+        self.holds_writer_lock = True
+        self.writer_thread = threading.get_ident()
+        _writer_holder = self
+
+    def _release_writer_lock(self):
+        global _writer_holder
+        if self.holds_writer_lock:
+            self.holds_writer_lock = False
+            self.writer_thread = None
+            _writer_holder = None
+            _writer_lock.release()
+
+    def commit(self):
+        try:
+            super().commit()
+        finally:
+            self._release_writer_lock()
+
+    def rollback(self):
+        try:
+            super().rollback()
+        finally:
+            self._release_writer_lock()
+
+    def close(self):
+        try:
+            super().close()
+        finally:
+            self._release_writer_lock()
+
+
+def connect_args() -> dict:
+    """Argumentos extras do sqlite3.connect para a engine síncrona."""
+    args = {"timeout": SQLITE_BUSY_TIMEOUT_MS / 1000}
+    if SQLITE_SERIALIZE_WRITES:
+        args["factory"] = SerializedWriterConnection
+    return args
+
+
+def _apply_pragmas(dbapi_connection):
+    cursor = dbapi_connection.cursor()
+    try:
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute(f"PRAGMA synchronous={SQLITE_SYNCHRONOUS}")
+        cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+        cursor.execute(f"PRAGMA mmap_size={SQLITE_MMAP_SIZE}")
+        cursor.execute(f"PRAGMA cache_size={SQLITE_CACHE_SIZE}")
+        cursor.execute("PRAGMA temp_store=MEMORY")
+    finally:
+        cursor.close()
+
+
+def apply_profile(engine):
+    """Registra os PRAGMAs (e, na engine síncrona, o escritor serializado) em uma engine SQLite."""
+    target = engine.sync_engine if hasattr(engine, "sync_engine") else engine
+
+    @event.listens_for(target, "connect")
+    def _on_connect(dbapi_connection, connection_record):
+        _apply_pragmas(dbapi_connection)
+
+    if SQLITE_SERIALIZE_WRITES and not hasattr(engine, "sync_engine"):
+        # do_execute* (e não before_cursor_execute): rodam dentro do tratamento de erros do
+        # SQLAlchemy, então a falha vira sqlalchemy.exc.OperationalError e passa pelo handle_error
+        def _begin_write(cursor, statement):
+            if _WRITE_RE.match(statement) and isinstance(cursor.connection, SerializedWriterConnection):
+                cursor.connection.begin_write()
+
+        @event.listens_for(target, "do_execute")
+        def _do_execute(cursor, statement, parameters, context):
+            _begin_write(cursor, statement)
+
+        @event.listens_for(target, "do_executemany")
+        def _do_executemany(cursor, statement, parameters, context):
+            _begin_write(cursor, statement)
+
+        @event.listens_for(target, "do_execute_no_params")
+        def _do_execute_no_params(cursor, statement, context):
+            _begin_write(cursor, statement)
+
+    logger.info(f"Perfil SQLite '{SQLITE_PROFILE}' aplicado (WAL, busy_timeout={SQLITE_BUSY_TIMEOUT_MS}ms).")
+
+
+def writer_stats() -> dict:
+    """Contadores do escritor serializado (para telemetria)."""
+    with _writer_stats_lock:
+        snapshot = dict(_writer_stats)
+    snapshot["locked"] = _writer_lock.locked()
+    return snapshot
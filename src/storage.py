@@ -0,0 +1,369 @@
+# -*- coding: utf-8 -*-
+"""
+Armazenamento de arquivos (fotos de alunos e professores).
+
+Backends (STORAGE_BACKEND):
+- s3 (padrão): bucket S3/Cloudflare R2 (S3_ENDPOINT_URL, AWS_ACCESS_KEY_ID,
+  AWS_SECRET_ACCESS_KEY, S3_BUCKET_NAME, PUBLIC_BUCKET_URL). Um único cliente
+  boto3 por processo, criado no primeiro uso (o cliente é thread-safe), com pool
+  de até S3_MAX_POOL_CONNECTIONS conexões HTTP reaproveitadas entre uploads.
+- local: grava em STORAGE_LOCAL_DIR (servido pelo próprio app em /static/uploads);
+  o fluxo inteiro funciona sem rede nem credenciais.
+
+Fotos: as rotas validam o envio com read_photo() e chamam enqueue_photo(). O
+processamento da imagem (src/image_utils.py: variantes em WebP e JPEG), o
+upload e a gravação da URL em `foto` rodam num pool de STORAGE_UPLOAD_WORKERS
+threads, depois da resposta. Com a fila cheia (STORAGE_UPLOAD_MAX_QUEUE fotos
+ou STORAGE_UPLOAD_MAX_QUEUE_BYTES de fotos ainda não processadas) o trabalho
+roda na própria requisição, como antes. Se o mesmo registro recebe outra foto
+antes de a anterior terminar, só a mais recente é gravada; a foto substituída
+(todas as variantes) é apagada do armazenamento.
+"""
+import contextvars
+import io
+import itertools
+import logging
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+
+from fastapi import HTTPException, status
+
+from src import image_utils, metrics, tracing
+
+STORAGE_BACKEND = os.environ.get("STORAGE_BACKEND", "s3")
+STORAGE_LOCAL_DIR = os.environ.get("STORAGE_LOCAL_DIR", str(Path(__file__).parent / "static" / "uploads"))
+STORAGE_LOCAL_URL = os.environ.get(
+    "STORAGE_LOCAL_URL", os.environ.get("BACKEND_URL", "http://localhost:8000").rstrip("/") + "/static/uploads"
+)
+STORAGE_UPLOAD_WORKERS = int(os.environ.get("STORAGE_UPLOAD_WORKERS", "2"))
+STORAGE_UPLOAD_MAX_QUEUE = int(os.environ.get("STORAGE_UPLOAD_MAX_QUEUE", "100"))
+# Cada foto na fila guarda o arquivo original (até AVATAR_MAX_BYTES) na memória
+STORAGE_UPLOAD_MAX_QUEUE_BYTES = int(os.environ.get("STORAGE_UPLOAD_MAX_QUEUE_BYTES", str(200 * 1024 * 1024)))
+STORAGE_DRAIN_TIMEOUT_SECONDS = float(os.environ.get("STORAGE_DRAIN_TIMEOUT_SECONDS", "30"))
+S3_MAX_POOL_CONNECTIONS = int(os.environ.get("S3_MAX_POOL_CONNECTIONS", "10"))
+
+logger = logging.getLogger("academia.storage")
+
+# <base>.<tamanho>px.<webp|jpg>: `foto` guarda a variante JPEG maior; as outras saem de variant_url()/photo_variants()
+_VARIANT_RE = re.compile(r"\.(\d+)px\.(webp|jpg)$")
+
+
+# --- BACKENDS ---
+
+class S3Storage:
+    name = "s3"
+
+    def __init__(self):
+        self.endpoint_url = os.getenv("S3_ENDPOINT_URL")
+        self.access_key_id = os.getenv("AWS_ACCESS_KEY_ID")
+        self.secret_access_key = os.getenv("AWS_SECRET_ACCESS_KEY")
+        self.bucket = os.getenv("S3_BUCKET_NAME")
+        self.public_url = os.getenv("PUBLIC_BUCKET_URL")
+        self._client = None
+        self._lock = threading.Lock()
+
+    def is_configured(self) -> bool:
+        return all([self.endpoint_url, self.access_key_id, self.secret_access_key, self.bucket, self.public_url])
+
+    @property
+    def client(self):
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    # Importados sob demanda (boot mais rápido)
+                    import boto3
+                    from botocore.config import Config
+
+                    self._client = boto3.client(
+                        "s3", endpoint_url=self.endpoint_url, aws_access_key_id=self.access_key_id,
+                        aws_secret_access_key=self.secret_access_key, region_name="auto",
+                        config=Config(max_pool_connections=S3_MAX_POOL_CONNECTIONS),
+                    )
+        return self._client
+
+    def put(self, key, fileobj, content_type) -> str:
+        with metrics.external_call("s3", "upload"):
+            self.client.upload_fileobj(fileobj, self.bucket, key, ExtraArgs={"ContentType": content_type})
+        return f"{self.public_url.rstrip('/')}/{key}"
+
+    def delete(self, url):
+        # https://.../aluno_1_12345.jpg -> aluno_1_12345.jpg
+        with metrics.external_call("s3", "delete"):
+            self.client.delete_object(Bucket=self.bucket, Key=url.split("/")[-1])
+
+
+class LocalStorage:
+    name = "local"
+
+    def __init__(self, directory=None, public_url=None):
+        self.directory = Path(directory or STORAGE_LOCAL_DIR)
+        self.public_url = public_url or STORAGE_LOCAL_URL
+
+    def is_configured(self) -> bool:
+        return True
+
+    def put(self, key, fileobj, content_type) -> str:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        path = self.directory / key
+        # Escreve num temporário e renomeia: quem lê nunca vê o arquivo pela metade
+        tmp_path = path.with_name(path.name + ".tmp")
+        with open(tmp_path, "wb") as f:
+            f.write(fileobj.read())
+        os.replace(tmp_path, path)
+        return f"{self.public_url.rstrip('/')}/{key}"
+
+    def delete(self, url):
+        (self.directory / url.split("/")[-1]).unlink(missing_ok=True)
+
+
+BACKENDS = {"s3": S3Storage, "local": LocalStorage}
+
+_storage = None
+_storage_lock = threading.Lock()
+
+
+def get_storage():
+    """Backend do processo (criado no primeiro uso)."""
+    global _storage
+    if _storage is None:
+        with _storage_lock:
+            if _storage is None:
+                if STORAGE_BACKEND not in BACKENDS:
+                    raise RuntimeError(f"STORAGE_BACKEND inválido: {STORAGE_BACKEND} (use {', '.join(BACKENDS)})")
+                _storage = BACKENDS[STORAGE_BACKEND]()
+    return _storage
+
+
+def set_storage(backend):
+    """Troca o backend (benchmarks/scripts); devolve o anterior."""
+    global _storage
+    with _storage_lock:
+        previous, _storage = _storage, backend
+    return previous
+
+
+def is_configured() -> bool:
+    return get_storage().is_configured()
+
+
+def photo_base_key(prefix, obj_id, filename) -> str:
+    base_filename, _ = os.path.splitext(os.path.basename(filename or "foto"))
+    return f"{prefix}_{obj_id}_{datetime.utcnow().timestamp()}_{base_filename.replace(' ', '_')}"
+
+
+def variant_url(foto_url, size, fmt="webp"):
+    """URL de outra variante da mesma foto (fotos antigas, de arquivo único, voltam como estão)."""
+    if not foto_url or not _VARIANT_RE.search(foto_url):
+        return foto_url
+    return _VARIANT_RE.sub(f".{size}px.{image_utils.FORMATS[fmt][0]}", foto_url)
+
+
+def photo_variants(foto_url):
+    """
+    {"webp": {64: url, ...}, "jpeg": {...}} de uma foto, para montar <picture>/srcset
+    (campo foto_variantes dos schemas). None sem foto ou para fotos antigas, de arquivo único.
+    """
+    if not foto_url or not _VARIANT_RE.search(foto_url):
+        return None
+    return {
+        fmt: {size: variant_url(foto_url, size, fmt) for size in image_utils.AVATAR_SIZES}
+        for fmt in image_utils.FORMATS
+    }
+
+
+def _variant_urls(foto_url) -> list:
+    if not _VARIANT_RE.search(foto_url):
+        return [foto_url]
+    return [variant_url(foto_url, size, fmt) for size in image_utils.AVATAR_SIZES for fmt in image_utils.FORMATS]
+
+
+def read_photo(upload):
+    """
+    Bytes da foto enviada (None se não veio foto), validados só pelo cabeçalho.
+    Problemas que dá para ver na hora viram erro da própria requisição (400/413/500).
+    """
+    if upload is None or not upload.filename:
+        return None
+    if not is_configured():
+        raise HTTPException(status_code=500, detail="Configuração de armazenamento na nuvem incompleta.")
+    data = upload.file.read(image_utils.AVATAR_MAX_BYTES + 1)
+    if len(data) > image_utils.AVATAR_MAX_BYTES:
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                            detail=f"Foto muito grande (máximo {image_utils.AVATAR_MAX_BYTES // (1024 * 1024)} MB).")
+    try:
+        image_utils.inspect_avatar(data)
+    except image_utils.InvalidImage as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    return data
+
+
+def delete_file(url):
+    """Apaga uma foto (todas as variantes) pela URL pública; falhas só são logadas."""
+    storage = get_storage()
+    if not storage.is_configured():
+        logger.warning("Armazenamento não configurado. Não foi possível excluir %s.", url)
+        return
+    try:
+        for variant in _variant_urls(url):
+            storage.delete(variant)
+        logger.info("Arquivo %s excluído do armazenamento.", url)
+    except Exception as e:
+        logger.error(f"Erro ao excluir {url} do armazenamento: {e}")
+
+
+# --- FILA DE UPLOAD DE FOTOS ---
+
+_executor = ThreadPoolExecutor(max_workers=STORAGE_UPLOAD_WORKERS, thread_name_prefix="storage-upload")
+_sequence = itertools.count(1)
+_latest = {}  # (tabela, id) -> número da foto mais recente
+_state = threading.Condition()
+# Gravação de `foto` serializada por registro (lock escolhido pelo hash do registro), fora do _state
+_commit_locks = [threading.Lock() for _ in range(32)]
+_metrics = {
+    "pending": 0,
+    "pending_bytes": 0,
+    "submitted_total": 0,
+    "inline_total": 0,
+    "completed_total": 0,
+    "failed_total": 0,
+    "superseded_total": 0,
+    "run_seconds_total": 0.0,
+}
+
+
+def _count(key, amount=1):
+    with _state:
+        _metrics[key] += amount
+
+
+def _is_latest(job) -> bool:
+    return _latest.get(job["target"]) == job["sequence"]
+
+
+def _commit_lock(target):
+    return _commit_locks[hash(target) % len(_commit_locks)]
+
+
+def _upload_variants(storage, base_key, variants) -> str:
+    """Envia todas as variantes; devolve a URL da JPEG maior (a que vai para `foto`)."""
+    urls = {}
+    for (size, fmt), content in variants.items():
+        extension, content_type = image_utils.FORMATS[fmt]
+        urls[(size, fmt)] = storage.put(f"{base_key}.{size}px.{extension}", io.BytesIO(content), content_type)
+    return urls[(max(size for size, _ in variants), "jpeg")]
+
+
+def _process_photo(job):
+    from src.database import SessionLocal
+
+    model, obj_id = job["model"], job["id"]
+    start = time.perf_counter()
+    try:
+        with tracing.span("storage.photo", **{"storage.target": f"{model.__tablename__}/{obj_id}"}):
+            try:
+                variants = image_utils.render_avatar_variants(job["data"])
+            except image_utils.InvalidImage as e:
+                logger.warning("Foto inválida para %s %s: %s", model.__tablename__, obj_id, e)
+                _count("failed_total")
+                return
+            with _state:
+                superseded = not _is_latest(job)
+            if superseded:
+                _count("superseded_total")
+                return
+            storage = get_storage()
+            url = _upload_variants(storage, job["key"], variants)
+            previous = None
+            db = SessionLocal()
+            try:
+                # Lock do registro: duas fotos dele terminando juntas não se atropelam, e o commit
+                # (que pode esperar pelo banco) não trava enqueue_photo()/get_metrics() no _state
+                with _commit_lock(job["target"]):
+                    with _state:
+                        keep = _is_latest(job)
+                    obj = db.get(model, obj_id) if keep else None
+                    keep = obj is not None
+                    if keep:
+                        previous = obj.foto
+                        obj.foto = url
+                        db.commit()
+            finally:
+                db.close()
+            if not keep:
+                # Registro excluído ou foto mais nova a caminho: não deixa arquivos órfãos
+                for variant in _variant_urls(url):
+                    storage.delete(variant)
+                _count("superseded_total")
+                return
+            if previous and previous != url:
+                # A foto substituída (e suas variantes) não fica esquecida no bucket
+                delete_file(previous)
+            _count("completed_total")
+    except Exception as e:
+        logger.error(f"Erro no upload da foto ({model.__tablename__} {obj_id}): {e}")
+        _count("failed_total")
+    finally:
+        with _state:
+            if _is_latest(job):
+                _latest.pop(job["target"])
+            _metrics["run_seconds_total"] += time.perf_counter() - start
+
+
+def _run_job(job):
+    try:
+        job["context"].run(_process_photo, job)
+    finally:
+        with _state:
+            _metrics["pending"] -= 1
+            _metrics["pending_bytes"] -= job["size"]
+            _state.notify_all()
+
+
+def enqueue_photo(model, obj_id, data: bytes, filename, prefix) -> bool:
+    """
+    Agenda processamento + upload da foto (bytes de read_photo()) e a gravação de `model.foto`.
+    Devolve False quando a fila estava cheia e o upload já rodou nesta chamada.
+    """
+    job = {
+        "model": model, "id": obj_id, "data": data, "size": len(data),
+        "key": photo_base_key(prefix, obj_id, filename),
+        "target": (model.__tablename__, obj_id),
+        # Mantém request_id nos logs e os spans no trace da requisição que enviou a foto
+        "context": contextvars.copy_context(),
+    }
+    with _state:
+        job["sequence"] = next(_sequence)
+        _latest[job["target"]] = job["sequence"]
+        inline = (_metrics["pending"] >= STORAGE_UPLOAD_MAX_QUEUE
+                  or _metrics["pending_bytes"] + job["size"] > STORAGE_UPLOAD_MAX_QUEUE_BYTES)
+        _metrics["pending"] += 1
+        _metrics["pending_bytes"] += job["size"]
+        _metrics["inline_total" if inline else "submitted_total"] += 1
+    if inline:
+        _run_job(job)
+        return False
+    _executor.submit(_run_job, job)
+    return True
+
+
+def drain(timeout=None) -> bool:
+    """Espera os uploads pendentes terminarem (shutdown e scripts). False se estourar o timeout."""
+    deadline = None if timeout is None else time.monotonic() + timeout
+    with _state:
+        while _metrics["pending"]:
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                return False
+            _state.wait(remaining)
+    return True
+
+
+def get_metrics() -> dict:
+    with _state:
+        return {"workers": STORAGE_UPLOAD_WORKERS, "max_queue": STORAGE_UPLOAD_MAX_QUEUE,
+                "max_queue_bytes": STORAGE_UPLOAD_MAX_QUEUE_BYTES, **_metrics}
@@ -0,0 +1,382 @@
+# -*- coding: utf-8 -*-
+"""
+Tracing leve por requisição (sem dependências externas).
+
+Com TRACING_EXPORTER definido, cada requisição amostrada (TRACING_SAMPLE_RATE)
+ganha um trace id (ou continua o do header W3C `traceparent`) e um span raiz.
+Dentro dela são registrados spans filhos para:
+
+- cada comando SQL (listeners da Engine, sync e async);
+- chamadas externas medidas por metrics.external_call(): S3 (upload/delete das
+  fotos de aluno/professor/portal), Mercado Pago e Google OAuth;
+- etapas marcadas com tracing.span("nome"), ex.: processamento do avatar.
+
+Os spans terminados vão para uma fila e uma thread exporta em lote:
+- TRACING_EXPORTER=jsonl: uma linha JSON por span em TRACING_JSONL_PATH;
+- TRACING_EXPORTER=otlp: POST OTLP/HTTP JSON em TRACING_OTLP_ENDPOINT (para
+  testes locais: python -m benchmarks.otlp_stub).
+
+A resposta traz `X-Trace-Id`. Para ver um trace quebrado por etapa:
+
+    python -m src.tracing slowest --limit 10
+    python -m src.tracing show <trace_id>
+"""
+import argparse
+import atexit
+import contextvars
+import json
+import logging
+import os
+import queue
+import random
+import re
+import secrets
+import sys
+import threading
+import time
+import urllib.request
+from contextlib import contextmanager
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from src import logging_config
+
+TRACING_EXPORTER = os.environ.get("TRACING_EXPORTER", "").lower()
+TRACING_SAMPLE_RATE = float(os.environ.get("TRACING_SAMPLE_RATE", "1"))
+TRACING_JSONL_PATH = os.environ.get("TRACING_JSONL_PATH", "./traces/spans.jsonl")
+TRACING_OTLP_ENDPOINT = os.environ.get("TRACING_OTLP_ENDPOINT", "http://localhost:4318/v1/traces")
+TRACING_SERVICE_NAME = os.environ.get("TRACING_SERVICE_NAME", "academia-api")
+TRACING_SQL_MAX_LENGTH = int(os.environ.get("TRACING_SQL_MAX_LENGTH", "300"))
+
+ENABLED = TRACING_EXPORTER in ("jsonl", "otlp")
+
+logger = logging.getLogger("academia.tracing")
+
+_TRACEPARENT_RE = re.compile(r"^00-([0-9a-f]{32})-([0-9a-f]{16})-[0-9a-f]{2}$")
+_OTLP_KINDS = {"internal": 1, "server": 2, "client": 3}
+
+
+class Span:
+    __slots__ = ("trace_id", "span_id", "parent_id", "name", "kind", "start_ns", "end_ns", "attributes", "error")
+
+    def __init__(self, name, trace_id, parent_id=None, kind="internal", attributes=None):
+        self.trace_id = trace_id
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent_id
+        self.name = name
+        self.kind = kind
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self.attributes = attributes or {}
+        self.error = None
+
+    def set_attribute(self, key, value):
+        self.attributes[key] = value
+
+    def to_dict(self):
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "kind": self.kind,
+            "start_ns": self.start_ns,
+            "end_ns": self.end_ns,
+            "duration_ms": round((self.end_ns - self.start_ns) / 1e6, 3),
+            "attributes": self.attributes,
+            "error": self.error,
+        }
+
+
+_current_span = contextvars.ContextVar("trace_current_span", default=None)
+
+
+def current_span():
+    return _current_span.get()
+
+
+def current_trace_id():
+    span = _current_span.get()
+    return span.trace_id if span is not None else None
+
+
+def _finish(span, error=None):
+    span.end_ns = time.time_ns()
+    if error is not None:
+        span.error = f"{type(error).__name__}: {error}"
+    _exporter.submit(span.to_dict())
+
+
+@contextmanager
+def span(name, kind="internal", **attributes):
+    """Span filho do span atual. Fora de uma requisição rastreada não faz nada (devolve None)."""
+    parent = _current_span.get()
+    if parent is None:
+        yield None
+        return
+    child = Span(name, parent.trace_id, parent.span_id, kind, attributes)
+    token = _current_span.set(child)
+    try:
+        yield child
+    except BaseException as e:
+        _current_span.reset(token)
+        _finish(child, e)
+        raise
+    _current_span.reset(token)
+    _finish(child)
+
+
+# --- EXPORTAÇÃO ---
+
+class _Exporter:
+    """Fila + thread que exporta os spans em lote (JSONL ou OTLP/HTTP JSON)."""
+
+    def __init__(self, max_queue=10000, batch_size=256, flush_seconds=1.0):
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self.dropped = 0
+        self.exported = 0
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def submit(self, item):
+        if self._thread is None:
+            self._start()
+        try:
+            self.queue.put_nowait(item)
+        except queue.Full:
+            self.dropped += 1
+
+    def _start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="trace-exporter", daemon=True)
+                self._thread.start()
+                atexit.register(self.flush)
+
+    def _drain(self, first=None):
+        batch = [first] if first is not None else []
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self.queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            try:
+                first = self.queue.get(timeout=self.flush_seconds)
+            except queue.Empty:
+                continue
+            self._export(self._drain(first))
+
+    def flush(self):
+        batch = self._drain()
+        while batch:
+            self._export(batch)
+            batch = self._drain()
+
+    def _export(self, batch):
+        try:
+            if TRACING_EXPORTER == "otlp":
+                _export_otlp(batch)
+            else:
+                _export_jsonl(batch)
+            self.exported += len(batch)
+        except Exception as e:
+            logger.warning(f"Falha ao exportar {len(batch)} spans: {e}")
+
+
+def _export_jsonl(batch):
+    directory = os.path.dirname(TRACING_JSONL_PATH)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(TRACING_JSONL_PATH, "a", encoding="utf-8") as f:
+        for item in batch:
+            f.write(json.dumps(item, ensure_ascii=False, default=str) + "\n")
+
+
+def _otlp_value(value):
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def _export_otlp(batch):
+    spans = []
+    for item in batch:
+        otlp_span = {
+            "traceId": item["trace_id"],
+            "spanId": item["span_id"],
+            "name": item["name"],
+            "kind": _OTLP_KINDS.get(item["kind"], 1),
+            "startTimeUnixNano": str(item["start_ns"]),
+            "endTimeUnixNano": str(item["end_ns"]),
+            "attributes": [{"key": k, "value": _otlp_value(v)} for k, v in item["attributes"].items()],
+            "status": {"code": 2, "message": item["error"]} if item["error"] else {"code": 1},
+        }
+        if item["parent_id"]:
+            otlp_span["parentSpanId"] = item["parent_id"]
+        spans.append(otlp_span)
+    payload = {"resourceSpans": [{
+        "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": TRACING_SERVICE_NAME}}]},
+        "scopeSpans": [{"scope": {"name": "academia.tracing"}, "spans": spans}],
+    }]}
+    request = urllib.request.Request(
+        TRACING_OTLP_ENDPOINT, data=json.dumps(payload).encode("utf-8"),
+        headers={"Content-Type": "application/json"}, method="POST",
+    )
+    with urllib.request.urlopen(request, timeout=5) as response:
+        response.read()
+
+
+_exporter = _Exporter()
+
+
+def flush():
+    """Exporta o que ainda está na fila (chamado no shutdown do lifespan)."""
+    if _exporter._thread is not None:
+        _exporter.flush()
+
+
+def exporter_stats() -> dict:
+    return {"exporter": TRACING_EXPORTER or None, "queued": _exporter.queue.qsize(),
+            "exported": _exporter.exported, "dropped": _exporter.dropped}
+
+
+# --- SQL ---
+
+if ENABLED:
+    @event.listens_for(Engine, "before_cursor_execute")
+    def _trace_before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        parent = _current_span.get()
+        if parent is None:
+            return
+        attributes = {"db.system": conn.dialect.name, "db.statement": statement[:TRACING_SQL_MAX_LENGTH]}
+        if executemany:
+            attributes["db.executemany"] = True
+        conn.info.setdefault("_trace_spans", []).append(
+            Span("db.query", parent.trace_id, parent.span_id, "client", attributes)
+        )
+
+    @event.listens_for(Engine, "after_cursor_execute")
+    def _trace_after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        spans = conn.info.get("_trace_spans")
+        if spans:
+            _finish(spans.pop())
+
+    @event.listens_for(Engine, "handle_error")
+    def _trace_handle_error(exception_context):
+        conn = exception_context.connection
+        spans = conn.info.get("_trace_spans") if conn is not None else None
+        if spans:
+            _finish(spans.pop(), exception_context.original_exception)
+
+
+# --- MIDDLEWARE ---
+
+class TracingMiddleware:
+    """Middleware ASGI: span raiz da requisição (continua o `traceparent` recebido, se houver)."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or random.random() >= TRACING_SAMPLE_RATE:
+            await self.app(scope, receive, send)
+            return
+
+        trace_id, parent_id = secrets.token_hex(16), None
+        for name, value in scope.get("headers") or ():
+            if name == b"traceparent":
+                match = _TRACEPARENT_RE.match(value.decode("latin-1").lower())
+                if match:
+                    trace_id, parent_id = match.group(1), match.group(2)
+                break
+
+        root = Span(f"{scope['method']} {scope['path']}", trace_id, parent_id, "server",
+                    {"http.method": scope["method"], "http.target": scope["path"]})
+        log_context = logging_config.current_context()
+        if log_context is not None:
+            root.attributes["request_id"] = log_context.request_id
+        token = _current_span.set(root)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                root.attributes["http.status_code"] = message["status"]
+                message["headers"] = list(message.get("headers", [])) + [(b"x-trace-id", trace_id.encode("latin-1"))]
+            await send(message)
+
+        error = None
+        try:
+            await self.app(scope, receive, send_wrapper)
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            _current_span.reset(token)
+            route = getattr(scope.get("route"), "path", None)
+            if route:
+                root.name = f"{scope['method']} {route}"
+                root.attributes["http.route"] = route
+            _finish(root, error)
+
+
+# --- CLI: leitura do JSONL ---
+
+def _load_spans(path):
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Consulta os spans exportados em JSONL")
+    sub = parser.add_subparsers(dest="command", required=True)
+    slowest = sub.add_parser("slowest", help="requisições mais lentas")
+    slowest.add_argument("--limit", type=int, default=10)
+    slowest.add_argument("--name", default="", help="filtra pelo início do nome (ex.: 'POST /api/v1/pagamentos')")
+    show = sub.add_parser("show", help="árvore de spans de um trace, com a duração de cada etapa")
+    show.add_argument("trace_id")
+    parser.add_argument("--path", default=TRACING_JSONL_PATH)
+    args = parser.parse_args(argv)
+
+    if args.command == "slowest":
+        roots = [s for s in _load_spans(args.path) if s["kind"] == "server" and s["name"].startswith(args.name)]
+        for s in sorted(roots, key=lambda s: -s["duration_ms"])[:args.limit]:
+            print(f"{s['duration_ms']:10.1f}ms  {s['trace_id']}  {s['name']}  {s['attributes'].get('http.status_code', '')}")
+        return 0
+
+    spans = [s for s in _load_spans(args.path) if s["trace_id"] == args.trace_id]
+    if not spans:
+        print(f"Trace {args.trace_id} não encontrado em {args.path}")
+        return 1
+    children = {}
+    ids = {s["span_id"] for s in spans}
+    for s in sorted(spans, key=lambda s: s["start_ns"]):
+        children.setdefault(s["parent_id"] if s["parent_id"] in ids else None, []).append(s)
+    origin = min(s["start_ns"] for s in spans)
+
+    def walk(parent_id, depth):
+        for s in children.get(parent_id, []):
+            detail = " ".join(s["attributes"].get("db.statement", "").split())[:80]
+            offset = (s["start_ns"] - origin) / 1e6
+            print(f"{offset:9.1f}ms {s['duration_ms']:9.1f}ms  {'  ' * depth}{s['name']}"
+                  f"{'  ' + detail if detail else ''}{'  [' + s['error'] + ']' if s['error'] else ''}")
+            walk(s["span_id"], depth + 1)
+
+    print(f"{'início':>11} {'duração':>11}  span")
+    walk(None, 0)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())